@@ -0,0 +1,46 @@
+import click
+from flask.cli import AppGroup
+
+products_cli = AppGroup("products", help="Comandos do catálogo de produtos.")
+
+
+@products_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]),
+              help="Padrão: pela extensão (.csv, .ndjson/.jsonl, .gz).")
+@click.option("--batch-size", default=10000, show_default=True,
+              help="Linhas por transação.")
+@click.option("--defer-indexes", is_flag=True,
+              help="Remove índices secundários durante a carga e recria "
+                   "no fim.")
+@click.option("--checkpoint", "checkpoint_path",
+              help="Arquivo de checkpoint (padrão: PATH.checkpoint).")
+@click.option("--rejects", "rejects_path",
+              help="Linhas inválidas em NDJSON "
+                   "(padrão: PATH.rejects.ndjson).")
+@click.option("--restart", is_flag=True,
+              help="Ignora o checkpoint e recomeça do início.")
+@click.option("--delimiter", default=",", show_default=True,
+              help="Separador do CSV.")
+@click.option("--progress-every", default=5.0, show_default=True,
+              help="Segundos entre linhas de progresso.")
+def import_products(path, fmt, batch_size, defer_indexes, checkpoint_path,
+                    rejects_path, restart, delimiter, progress_every):
+    """Importa produtos de um arquivo CSV ou NDJSON."""
+    from app.models.import_models import ProductImporter, ProductImportError
+
+    try:
+        importer = ProductImporter(
+            path, fmt=fmt, batch_size=batch_size,
+            checkpoint_path=checkpoint_path, rejects_path=rejects_path,
+            defer_indexes=defer_indexes, resume=not restart,
+            delimiter=delimiter, progress_interval=progress_every,
+            report=lambda line: click.echo(line, err=True))
+        result = importer.run()
+    except ProductImportError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"{result['imported']} produtos importados, "
+               f"{result['rejected']} rejeitados em {result['seconds']}s.")
+    if result["rejects_file"]:
+        click.echo(f"Rejeitados: {result['rejects_file']}")
@@ -1,6 +1,17 @@
 # app/domain_services.py
-from dataclasses import dataclass
-from typing import Protocol
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Iterable, Protocol
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_DISCOUNT = 0.95
 
 
 @dataclass
@@ -17,15 +28,82 @@ class PriceRulesProvider(Protocol):
         ...
 
 
+def _clamp(d: float) -> float:
+    return max(0.0, min(d, MAX_DISCOUNT))  # sanidade
+
+
+@dataclass
+class CachedPriceRules:
+    # Memoiza discount_for por nome. A fonte de regras pode ser cara (banco,
+    # serviço de promoções); quando uma promoção muda, quem alterou chama
+    # invalidate() (um nome ou tudo).
+    rules: PriceRulesProvider
+    _cache: dict[str, float] = field(default_factory=dict, repr=False)
+
+    def discount_for(self, product_name: str) -> float:
+        try:
+            return self._cache[product_name]
+        except KeyError:
+            d = self._cache[product_name] = \
+                self.rules.discount_for(product_name)
+            return d
+
+    def discounts_for(self, names: Iterable[str]) -> dict[str, float]:
+        return {name: self.discount_for(name) for name in set(names)}
+
+    def invalidate(self, product_name: str | None = None) -> None:
+        if product_name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(product_name, None)
+
+
 @dataclass
 class PriceCalculator:
     rules: PriceRulesProvider
 
     def final_price(self, product: ProductDTO) -> float:
-        d = self.rules.discount_for(product.name)
-        d = max(0.0, min(d, 0.95))  # sanidade
+        d = _clamp(self.rules.discount_for(product.name))
         return round(product.price * (1.0 - d), 2)
 
+    def _factors(self, names: Iterable[str]) -> dict[str, float]:
+        # uma consulta de regra por nome distinto, não por produto
+        return {name: 1.0 - _clamp(self.rules.discount_for(name))
+                for name in set(names)}
+
+    def final_prices(self, products: Iterable[ProductDTO]) -> list[float]:
+        # Mesmo resultado de final_price para cada produto, na mesma ordem.
+        products = list(products)
+        factors = self._factors(p.name for p in products)
+        if np is None or not products:
+            return [round(p.price * factors[p.name], 2) for p in products]
+
+        index = {name: i for i, name in enumerate(factors)}
+        table = np.fromiter(factors.values(), dtype=np.float64,
+                            count=len(factors))
+        codes = np.fromiter((index[p.name] for p in products),
+                            dtype=np.intp, count=len(products))
+        prices = np.fromiter((p.price for p in products),
+                             dtype=np.float64, count=len(products))
+        return _round2(prices * table[codes]).tolist()
+
+
+def _round2(values):
+    # np.round(x, 2) faz rint(x * 100) / 100; x * 100 tem erro de até meio
+    # ulp, então perto de ,5 pode escolher outro centavo que o round() do
+    # Python (que arredonda o valor exato). Esses casos, e os não finitos ou
+    # grandes demais, voltam para round().
+    scaled = values * 100.0
+    result = np.rint(scaled) / 100.0
+    magnitude = np.abs(scaled)
+    with np.errstate(invalid="ignore"):
+        frac = magnitude - np.trunc(magnitude)
+        suspect = ~np.isfinite(scaled) | (magnitude >= 2.0 ** 52) \
+            | (np.abs(frac - 0.5) <= 2 * np.spacing(magnitude))
+    for i in np.flatnonzero(suspect).tolist():
+        result[i] = round(float(values[i]), 2)
+    return result
+
 
 class ProductRepo(Protocol):
     def next_id(self) -> int: ...
@@ -37,19 +115,282 @@ class Notifier(Protocol):
     def send(self, subject: str, body: str) -> None: ...
 
 
+@dataclass
+class OutboxMessage:
+    subject: str
+    body: str
+    # mensagens com a mesma chave num lote são entregues uma vez só (a última)
+    key: str | None = None
+    id: int | None = None
+    attempts: int = 0
+    available_at: float = 0.0
+
+
+class Outbox(Protocol):
+    # add() é chamado depois do save, dentro do unit_of_work() do repo
+    # quando ele existe (outbox persistente: mesma transação); o resto é
+    # usado pelo OutboxDispatcher.
+    def add(self, message: OutboxMessage) -> None: ...
+    def claim(self, limit: int) -> list[OutboxMessage]: ...
+    def ack(self, messages: list[OutboxMessage]) -> None: ...
+    def retry(self, messages: list[OutboxMessage], delay: float,
+              error: str) -> None: ...
+    def dead(self, messages: list[OutboxMessage], error: str) -> None: ...
+    def depth(self) -> int: ...
+
+
+class InMemoryOutbox:
+    # Fila do próprio processo: tira o notifier da latência, mas o que está
+    # pendente se perde se o processo cair. Durável: SqlAlchemyOutbox.
+
+    def __init__(self):
+        self._pending: deque[OutboxMessage] = deque()
+        self._in_flight: dict[int, OutboxMessage] = {}
+        self.failed: list[OutboxMessage] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, message: OutboxMessage) -> None:
+        with self._lock:
+            self._seq += 1
+            message.id = self._seq
+            self._pending.append(message)
+
+    def claim(self, limit: int) -> list[OutboxMessage]:
+        now = time.time()
+        claimed, waiting = [], []
+        with self._lock:
+            while self._pending and len(claimed) < limit:
+                message = self._pending.popleft()
+                if message.available_at <= now:
+                    claimed.append(message)
+                    self._in_flight[message.id] = message
+                else:
+                    waiting.append(message)
+            self._pending.extendleft(reversed(waiting))
+        return claimed
+
+    def ack(self, messages: list[OutboxMessage]) -> None:
+        with self._lock:
+            for message in messages:
+                self._in_flight.pop(message.id, None)
+
+    def retry(self, messages: list[OutboxMessage], delay: float,
+              error: str) -> None:
+        available_at = time.time() + delay
+        with self._lock:
+            for message in messages:
+                self._in_flight.pop(message.id, None)
+                message.attempts += 1
+                message.available_at = available_at
+                self._pending.append(message)
+
+    def dead(self, messages: list[OutboxMessage], error: str) -> None:
+        with self._lock:
+            for message in messages:
+                self._in_flight.pop(message.id, None)
+                self.failed.append(message)
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._in_flight)
+
+
+class OutboxDispatcher:
+    # Entrega o outbox em segundo plano: lotes de até batch_size mensagens,
+    # coalescidas numa única chamada ao notifier (send_batch quando existe,
+    # senão um send com o resumo do lote). Falha devolve o lote com backoff
+    # exponencial; depois de max_attempts as mensagens vão para dead().
+
+    def __init__(self, outbox: Outbox, notifier: Notifier,
+                 batch_size: int = 100, poll_interval: float = 0.2,
+                 max_attempts: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 300.0):
+        self.outbox = outbox
+        self.notifier = notifier
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.delivered = 0
+        self.deliveries = 0
+        self.retries = 0
+        self.dead = 0
+        self.last_error: str | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _deliver(self, batch: list[OutboxMessage]) -> None:
+        send_batch = getattr(self.notifier, "send_batch", None)
+        if send_batch is not None:
+            send_batch(batch)
+        elif len(batch) == 1:
+            self.notifier.send(subject=batch[0].subject, body=batch[0].body)
+        else:
+            self.notifier.send(
+                subject=f"{len(batch)} notificações",
+                body="\n".join(f"{m.subject}: {m.body}" for m in batch))
+
+    @staticmethod
+    def _coalesce(messages: list[OutboxMessage]):
+        latest: dict[str, OutboxMessage] = {}
+        for message in messages:
+            if message.key is not None:
+                latest[message.key] = message
+        batch = [m for m in messages
+                 if m.key is None or latest[m.key] is m]
+        return batch, [m for m in messages if m not in batch]
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * 2 ** attempts, self.backoff_max)
+
+    def dispatch_once(self) -> int:
+        messages = self.outbox.claim(self.batch_size)
+        if not messages:
+            return 0
+        batch, superseded = self._coalesce(messages)
+        try:
+            self._deliver(batch)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print("[OUTBOX] falha na entrega:", self.last_error, flush=True)
+            exhausted = [m for m in messages
+                         if m.attempts + 1 >= self.max_attempts]
+            pending = [m for m in messages if m not in exhausted]
+            if exhausted:
+                self.outbox.dead(exhausted, self.last_error)
+                self.dead += len(exhausted)
+            if pending:
+                self.outbox.retry(
+                    pending, self._backoff(pending[0].attempts),
+                    self.last_error)
+                self.retries += len(pending)
+            return 0
+        self.outbox.ack(messages)
+        self.deliveries += 1
+        self.delivered += len(batch)
+        return len(messages)
+
+    def drain(self) -> int:
+        # entrega tudo que já está disponível (testes, shutdown)
+        total = 0
+        while True:
+            done = self.dispatch_once()
+            if not done:
+                return total
+            total += done
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                done = self.dispatch_once()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print("[OUTBOX] erro no dispatcher:", self.last_error,
+                      flush=True)
+                done = 0
+            if done < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {"depth": self.outbox.depth(), "delivered": self.delivered,
+                "deliveries": self.deliveries, "retries": self.retries,
+                "dead": self.dead}
+
+
 @dataclass
 class CreateProductUseCase:
     repo: ProductRepo
     notifier: Notifier
+    # com outbox a notificação é gravada depois do save, na mesma unidade
+    # de trabalho, e entregue pelo OutboxDispatcher; sem outbox,
+    # notifier.send síncrono como antes
+    outbox: Outbox | None = None
 
     def execute(self, name: str, price: float,
                 description: str | None = None) -> ProductDTO:
         product = ProductDTO(id=None, name=name,
                              price=price, description=description)
         product.id = self.repo.next_id()
-        saved = self.repo.save(product)
-        self.notifier.send(
-            subject=f"Produto #{saved.id} criado",
-            body=f"{saved.name} cadastrado por R$ {saved.price:.2f}"
-        )
+        if self.outbox is None:
+            saved = self.repo.save(product)
+            message = self._message(saved)
+            self.notifier.send(subject=message.subject, body=message.body)
+            return saved
+
+        with self._unit_of_work():
+            saved = self.repo.save(product)
+            self.outbox.add(self._message(saved))
         return saved
+
+    def _unit_of_work(self):
+        # repos transacionais expõem unit_of_work(): os saves dentro do
+        # bloco e o add do outbox vão no mesmo commit
+        unit_of_work = getattr(self.repo, "unit_of_work", None)
+        return unit_of_work() if unit_of_work is not None else nullcontext()
+
+    @staticmethod
+    def _message(product: ProductDTO) -> OutboxMessage:
+        return OutboxMessage(
+            subject=f"Produto #{product.id} criado",
+            body=f"{product.name} cadastrado por R$ {product.price:.2f}",
+            key=f"produto:{product.id}:criado")
+
+    def execute_many(self, items: Iterable[dict]) -> list[ProductDTO]:
+        # cadastro em lote: um save_many quando o repo oferece, senão save
+        # por item. Sem outbox, ainda uma notificação por produto.
+        products = [ProductDTO(id=None, name=item["name"],
+                               price=item["price"],
+                               description=item.get("description"))
+                    for item in items]
+        # next_ids(n), quando o repo tem, reserva os IDs de uma vez
+        next_ids = getattr(self.repo, "next_ids", None)
+        ids = next_ids(len(products)) if next_ids is not None \
+            else [self.repo.next_id() for _ in products]
+        for product, pid in zip(products, ids):
+            product.id = pid
+        if self.outbox is None:
+            saved = self._save_all(products)
+            for product in saved:
+                message = self._message(product)
+                self.notifier.send(subject=message.subject,
+                                   body=message.body)
+            return saved
+
+        with self._unit_of_work():
+            saved = self._save_all(products)
+            messages = [self._message(product) for product in saved]
+            add_many = getattr(self.outbox, "add_many", None)
+            if add_many is not None:
+                add_many(messages)
+            else:
+                for message in messages:
+                    self.outbox.add(message)
+        return saved
+
+    def _save_all(self, products: list[ProductDTO]) -> list[ProductDTO]:
+        save_many = getattr(self.repo, "save_many", None)
+        if save_many is not None:
+            return save_many(products)
+        return [self.repo.save(product) for product in products]
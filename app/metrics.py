@@ -0,0 +1,289 @@
+import hmac
+import ipaddress
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+from typing import Callable, Dict, Iterable, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+PREFIX = "prodmanager_"
+
+
+def _labels_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_labels(key, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Dict[str, str]) -> None:
+        key = _labels_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [contagem por bucket..., +Inf, soma]
+                series = self._series[key] = [0] * (len(self.buckets) + 1)
+                series.append(0.0)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self, base=()) -> Iterable[str]:
+        with self._lock:
+            items = [(base + k, list(v)) for k, v in self._series.items()]
+        for key, series in items:
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),),
+                                    series[:-1]):
+                total += count
+                yield (f"{self.name}_bucket"
+                       f"{_format_labels(key, (('le', _format_value(bound)),))}"
+                       f" {total}")
+            yield f"{self.name}_sum{_format_labels(key)} {series[-1]!r}"
+            yield f"{self.name}_count{_format_labels(key)} {total}"
+
+
+class Counter:
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._series: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Dict[str, str], amount: float = 1) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def render(self, base=()) -> Iterable[str]:
+        with self._lock:
+            items = [(base + k, v) for k, v in self._series.items()]
+        for key, value in items:
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Metrics:
+    # Desligado (METRICS_ENABLED=false) nenhum hook é registrado e observe/inc
+    # retornam na primeira linha. Os valores são do processo: toda série leva
+    # o label pid, para que workers diferentes não pareçam o mesmo contador
+    # reiniciando. /metrics exige METRICS_TOKEN ou um IP de
+    # METRICS_ALLOWED_NETWORKS.
+
+    def __init__(self):
+        self.enabled = False
+        self.n_plus_one_threshold = 10
+        self.token = None
+        self.allowed_networks = ()
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Tuple[str, Callable]] = {}
+        self._define()
+
+    def _define(self) -> None:
+        for metric in (
+            Histogram(PREFIX + "http_request_duration_seconds",
+                      "Latência das requisições por endpoint."),
+            Counter(PREFIX + "http_requests_total",
+                    "Requisições por endpoint e status."),
+            Histogram(PREFIX + "db_queries_per_request",
+                      "Consultas SQL por requisição.", QUERY_COUNT_BUCKETS),
+            Histogram(PREFIX + "db_time_per_request_seconds",
+                      "Tempo gasto em SQL por requisição."),
+            Counter(PREFIX + "db_n_plus_one_total",
+                    "Requisições que repetiram a mesma consulta acima do "
+                    "limite de N+1."),
+            Histogram(PREFIX + "jwt_verify_duration_seconds",
+                      "Tempo de validação do bearer token.",
+                      (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05,
+                       0.1, 0.5, 1.0)),
+            Counter(PREFIX + "jwks_fetches_total",
+                    "Buscas do JWKS no provedor OIDC."),
+            Histogram(PREFIX + "template_render_duration_seconds",
+                      "Tempo de renderização por template."),
+        ):
+            self._metrics[metric.name[len(PREFIX):]] = metric
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        self._metrics[name].observe(value, labels)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        self._metrics[name].inc(labels, amount)
+
+    def add_collector(self, name: str, help: str,
+                      fn: Callable[[], Iterable[Tuple[Dict, float]]]) -> None:
+        # gauges lidos na hora do scrape (ex.: estatísticas de cache)
+        self._collectors[PREFIX + name] = (help, fn)
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("METRICS_ENABLED", False)
+        self.n_plus_one_threshold = app.config.get(
+            "METRICS_N_PLUS_ONE_THRESHOLD", self.n_plus_one_threshold)
+        self.token = app.config.get("METRICS_TOKEN") or None
+        self.allowed_networks = tuple(
+            ipaddress.ip_network(net.strip(), strict=False)
+            for net in app.config.get("METRICS_ALLOWED_NETWORKS",
+                                      "127.0.0.0/8,::1/128").split(",")
+            if net.strip())
+        if not self.enabled:
+            return
+
+        from flask import before_render_template, template_rendered
+        from app.utils import db
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute",
+                             self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute",
+                             self._after_cursor_execute)
+
+    # --- requisições ---
+
+    @staticmethod
+    def _endpoint() -> str:
+        return request.endpoint or "unmatched"
+
+    def _before_request(self) -> None:
+        g._metrics_started = time.perf_counter()
+        g._metrics_sql = _Tally()
+        g._metrics_sql_time = 0.0
+
+    def _after_request(self, response):
+        self._finish(response.status_code)
+        return response
+
+    def _teardown_request(self, exc) -> None:
+        if getattr(g, "_metrics_started", None) is not None:
+            self._finish(500)
+
+    def _finish(self, status: int) -> None:
+        started = getattr(g, "_metrics_started", None)
+        if started is None:
+            return
+        g._metrics_started = None
+        endpoint = self._endpoint()
+        method = request.method
+        self.observe("http_request_duration_seconds",
+                     time.perf_counter() - started,
+                     endpoint=endpoint, method=method)
+        self.inc("http_requests_total", endpoint=endpoint, method=method,
+                 status=str(status))
+
+        statements = g._metrics_sql
+        queries = sum(statements.values())
+        self.observe("db_queries_per_request", queries, endpoint=endpoint)
+        self.observe("db_time_per_request_seconds", g._metrics_sql_time,
+                     endpoint=endpoint)
+        if statements:
+            statement, repeats = statements.most_common(1)[0]
+            if repeats >= self.n_plus_one_threshold:
+                self.inc("db_n_plus_one_total", endpoint=endpoint)
+                print(f"[METRICS] possível N+1 em {endpoint}: {repeats}x "
+                      f"{' '.join(statement.split())[:200]}", flush=True)
+
+    # --- SQL ---
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None or not has_request_context():
+            return
+        statements = getattr(g, "_metrics_sql", None)
+        if statements is None:
+            return
+        statements[statement] += 1
+        g._metrics_sql_time += time.perf_counter() - started
+
+    # --- templates ---
+
+    def _before_render(self, sender, template, context, **extra):
+        g.setdefault("_metrics_templates", []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stack = g.get("_metrics_templates")
+        if stack:
+            self.observe("template_render_duration_seconds",
+                         time.perf_counter() - stack.pop(),
+                         template=template.name or "inline")
+
+    # --- exposição ---
+
+    def allowed(self) -> bool:
+        # bearer METRICS_TOKEN, ou cliente numa rede de
+        # METRICS_ALLOWED_NETWORKS
+        auth = request.headers.get("Authorization", "")
+        if self.token and auth.startswith("Bearer "):
+            return hmac.compare_digest(auth[7:].encode(), self.token.encode())
+        try:
+            address = ipaddress.ip_address(request.remote_addr or "")
+        except ValueError:
+            return False
+        return any(address in net for net in self.allowed_networks)
+
+    def render(self) -> str:
+        base = (("pid", str(os.getpid())),)
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render(base))
+        for name, (help, fn) in self._collectors.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in fn():
+                key = base + _labels_key(labels)
+                lines.append(f"{name}{_format_labels(key)} "
+                             f"{_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,400 @@
+import csv
+import gzip
+import json
+import os
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, exists, insert, select, text
+
+from app.models.models import Product, ProductChange, _utcnow
+from app.models.product_models import (
+    _clean_description, _clean_name, _clean_price, _notify_changes
+)
+from app.utils import db
+from app.utils.cache import product_cache
+from app.utils.ids import product_ids
+
+IMPORT_BATCH_SIZE = 10000
+FORMATS = ("csv", "ndjson")
+
+# pragmas da conexão de carga no SQLite; os valores anteriores voltam no fim
+SQLITE_LOAD_PRAGMAS = (
+    ("synchronous", "OFF"),
+    ("cache_size", -262144),
+    ("temp_store", "MEMORY"),
+)
+
+
+class ProductImportError(Exception):
+    pass
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(name)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ProductImportError(
+        f"Formato não reconhecido para {path}; use --format csv|ndjson.")
+
+
+def _open_binary(path: str):
+    raw = open(path, "rb")
+    stream = gzip.GzipFile(fileobj=raw) if path.endswith(".gz") else raw
+    return raw, stream
+
+
+class LineReader:
+    # Linhas decodificadas de um arquivo binário, contando os bytes lidos:
+    # depois de cada registro, offset é a posição (descomprimida) onde o
+    # próximo começa. É o que vai para o checkpoint e para o seek().
+
+    def __init__(self, stream, offset: int = 0):
+        self.stream = stream
+        self.offset = offset
+
+    def __iter__(self) -> Iterator[str]:
+        for raw in self.stream:
+            encoding = "utf-8-sig" if self.offset == 0 else "utf-8"
+            self.offset += len(raw)
+            yield raw.decode(encoding)
+
+
+def iter_records(lines, fmt: str, delimiter: str = ",",
+                 fieldnames: Optional[List[str]] = None,
+                 start: int = 0) -> Iterator[Tuple[int, object]]:
+    # (número do registro, dict | mensagem de erro), sem carregar o arquivo.
+    # Na retomada o CSV recebe o cabeçalho já lido (fieldnames) e a
+    # numeração continua de start.
+    if fmt == "csv":
+        reader = csv.DictReader(lines, fieldnames=fieldnames,
+                                delimiter=delimiter)
+        missing = {"name", "price"} - set(reader.fieldnames or ())
+        if missing:
+            raise ProductImportError(
+                "Colunas obrigatórias ausentes no CSV: "
+                + ", ".join(sorted(missing)) + ".")
+        for number, record in enumerate(reader, start + 1):
+            yield number, record
+        return
+    for number, line in enumerate(lines, start + 1):
+        if not line.strip():
+            yield number, "Linha vazia."
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f"JSON inválido: {e}"
+            continue
+        yield number, record if isinstance(record, dict) \
+            else "Registro deve ser um objeto JSON."
+
+
+def clean_record(record) -> Dict:
+    # mesmas regras de create_product; str = erro de leitura do registro
+    if isinstance(record, str):
+        raise ValueError(record)
+    description = _clean_description(record.get("description"))
+    return {"name": _clean_name(record.get("name")),
+            "price": _clean_price(record.get("price")),
+            "description": description or None}
+
+
+class ProductImporter:
+    # Carga em massa de produtos a partir de CSV/NDJSON (também .gz):
+    # - lê em streaming e grava um executemany + commit a cada batch_size;
+    # - linhas inválidas vão para o arquivo de rejeitados (NDJSON);
+    # - o checkpoint registra o lote em andamento antes do commit e o lote
+    #   confirmado depois, com o offset em bytes do fim do lote; na
+    #   retomada, o último ID do lote diz se o commit aconteceu (nenhum lote
+    #   é gravado duas vezes) e a leitura continua com seek() no offset, sem
+    #   reler o que já foi importado;
+    # - com defer_indexes, índices secundários (e o trigger de FTS no
+    #   SQLite) saem durante a carga e são recriados no fim.
+
+    def __init__(self, path: str, fmt: Optional[str] = None,
+                 batch_size: int = IMPORT_BATCH_SIZE,
+                 checkpoint_path: Optional[str] = None,
+                 rejects_path: Optional[str] = None,
+                 defer_indexes: bool = False, resume: bool = True,
+                 delimiter: str = ",", progress_interval: float = 5.0,
+                 report: Callable[[str], None] = print):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        if self.fmt not in FORMATS:
+            raise ProductImportError(f"Formato inválido: {self.fmt}.")
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_path = checkpoint_path or path + ".checkpoint"
+        self.rejects_path = rejects_path or path + ".rejects.ndjson"
+        self.defer_indexes = defer_indexes
+        self.resume = resume
+        self.delimiter = delimiter
+        self.progress_interval = progress_interval
+        self.report = report
+        self.state: Dict = {}
+
+    # --- checkpoint ---
+
+    def _source_info(self) -> Dict:
+        stat = os.stat(self.path)
+        return {"source": os.path.abspath(self.path), "size": stat.st_size,
+                "mtime": int(stat.st_mtime)}
+
+    def _new_state(self) -> Dict:
+        return {**self._source_info(), "records": 0, "offset": 0,
+                "imported": 0, "rejected": 0, "rejects_size": 0,
+                "pending": None,
+                "deferred": [], "done": False}
+
+    def _save_state(self) -> None:
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _load_state(self, conn) -> None:
+        state = None
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                state = json.load(f)
+        if state is None or state.get("done") or not self.resume:
+            # recomeço: só os índices adiados de uma carga interrompida
+            # sobrevivem, para serem recriados no fim desta
+            deferred = (state or {}).get("deferred") or []
+            self.state = {**self._new_state(), "deferred": deferred}
+            if os.path.exists(self.rejects_path):
+                os.remove(self.rejects_path)
+            return
+        if any(state.get(k) != v for k, v in self._source_info().items()):
+            raise ProductImportError(
+                "O arquivo mudou desde o checkpoint "
+                f"{self.checkpoint_path}; use --restart.")
+        if "offset" not in state:
+            raise ProductImportError(
+                f"Checkpoint {self.checkpoint_path} sem offset (versão "
+                "anterior); use --restart.")
+
+        pending = state.get("pending")
+        if pending is not None:
+            committed = conn.scalar(select(exists().where(
+                Product.id == pending["last_id"])))
+            if committed:
+                state.update({k: pending[k] for k in
+                              ("records", "offset", "imported", "rejected",
+                               "rejects_size")})
+            state["pending"] = None
+        self.state = state
+        # rejeitados de um lote que não chegou ao commit serão regravados
+        if os.path.exists(self.rejects_path):
+            with open(self.rejects_path, "r+b") as f:
+                f.truncate(state["rejects_size"])
+        self.report(f"Retomando após o registro {state['records']} "
+                    f"({state['imported']} importados, "
+                    f"{state['rejected']} rejeitados).")
+
+    # --- banco ---
+
+    def _dialect(self, conn) -> str:
+        return conn.dialect.name
+
+    def _apply_pragmas(self, conn) -> List[Tuple[str, object]]:
+        if self._dialect(conn) != "sqlite":
+            return []
+        previous = []
+        for name, value in SQLITE_LOAD_PRAGMAS:
+            previous.append((name, conn.exec_driver_sql(
+                f"PRAGMA {name}").scalar()))
+            conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+        return previous
+
+    def _restore_pragmas(self, conn, previous) -> None:
+        for name, value in previous:
+            conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+
+    def _secondary_indexes(self, conn) -> List[Dict]:
+        # DDL de índices secundários de produtos (e do trigger de FTS)
+        dialect = self._dialect(conn)
+        if dialect == "sqlite":
+            rows = conn.execute(text(
+                "SELECT type, name, sql FROM sqlite_master "
+                "WHERE tbl_name = 'produtos' AND sql IS NOT NULL AND "
+                "(type = 'index' OR name = 'produtos_fts_ai')")).all()
+            return [{"kind": row.type, "name": row.name, "sql": row.sql}
+                    for row in rows]
+        if dialect == "postgresql":
+            rows = conn.execute(text(
+                "SELECT indexname, indexdef FROM pg_indexes "
+                "WHERE schemaname = current_schema() "
+                "AND tablename = 'produtos' AND indexname NOT IN "
+                "(SELECT conname FROM pg_constraint)")).all()
+            return [{"kind": "index", "name": row.indexname,
+                     "sql": row.indexdef} for row in rows]
+        self.report(f"--defer-indexes não suportado em {dialect}; "
+                    "índices mantidos.")
+        return []
+
+    def _drop_indexes(self, conn) -> None:
+        with conn.begin():
+            deferred = self.state["deferred"] or self._secondary_indexes(conn)
+            for item in deferred:
+                conn.execute(text(
+                    f'DROP {item["kind"].upper()} IF EXISTS "{item["name"]}"'))
+            # checkpoint antes do commit: a DDL nunca se perde
+            self.state["deferred"] = deferred
+            self._save_state()
+        if deferred:
+            self.report(f"{len(deferred)} índices adiados: " + ", ".join(
+                item["name"] for item in deferred))
+
+    def _restore_indexes(self, conn) -> None:
+        deferred = self.state.get("deferred") or []
+        if not deferred:
+            return
+        started = time.perf_counter()
+        with conn.begin():
+            present = {item["name"] for item in self._secondary_indexes(conn)}
+            for item in deferred:
+                if item["name"] not in present:
+                    conn.execute(text(item["sql"]))
+            if any(item["name"] == "produtos_fts_ai"
+                   and item["name"] not in present for item in deferred):
+                # o trigger ficou fora durante a carga: reconstrói o FTS
+                conn.execute(text(
+                    "INSERT INTO produtos_fts(produtos_fts) "
+                    "VALUES ('rebuild')"))
+        self.state["deferred"] = []
+        self._save_state()
+        self.report(f"Índices recriados em "
+                    f"{time.perf_counter() - started:.1f}s.")
+
+    def _write_batch(self, conn, rows: List[Dict], after: Dict) -> None:
+        # IDs reservados antes do DML (ver IdBlockAllocator)
+        ids = product_ids.take(len(rows))
+        for row, pid in zip(rows, ids):
+            row["id"] = pid
+        self.state["pending"] = {**after, "last_id": ids[-1]}
+        self._save_state()
+        with conn.begin():
+            if self._dialect(conn) == "postgresql":
+                conn.execute(text("SET LOCAL synchronous_commit = off"))
+            self._insert(conn, rows, ids)
+        self.state.update(after)
+        self.state["pending"] = None
+        self._save_state()
+
+    @staticmethod
+    def _insert(conn, rows: List[Dict], ids: List[int]) -> None:
+        mark = {"qmark": "?", "format": "%s",
+                "pyformat": "%s"}.get(conn.dialect.paramstyle)
+        if mark is None:
+            conn.execute(insert(Product), rows)
+            conn.execute(insert(ProductChange), [
+                {"product_id": pid, "op": "upsert"} for pid in ids])
+            return
+        # executemany direto no driver: sem defaults e conversão de tipos do
+        # SQLAlchemy por linha; o timestamp é convertido uma vez por lote
+        process = DateTime().bind_processor(conn.dialect)
+        now = process(_utcnow()) if process else _utcnow()
+        conn.exec_driver_sql(
+            "INSERT INTO produtos (id, name, price, description, version, "
+            f"updated_at) VALUES ({mark}, {mark}, {mark}, {mark}, 1, {mark})",
+            [(row["id"], row["name"], row["price"], row["description"], now)
+             for row in rows])
+        conn.exec_driver_sql(
+            "INSERT INTO produtos_changes (product_id, op, changed_at) "
+            f"VALUES ({mark}, 'upsert', {mark})",
+            [(pid, now) for pid in ids])
+
+    # --- carga ---
+
+    def run(self) -> Dict:
+        started = time.perf_counter()
+        with db.engine.connect() as conn:
+            self._load_state(conn)
+            previous = self._apply_pragmas(conn)
+            conn.commit()
+            try:
+                if self.defer_indexes:
+                    self._drop_indexes(conn)
+                self._load(conn, started)
+            finally:
+                # índices voltam mesmo se a carga falhar no meio
+                self._restore_indexes(conn)
+                self._restore_pragmas(conn, previous)
+                conn.commit()
+        product_cache.invalidate()
+        _notify_changes()
+        self.state["done"] = True
+        self._save_state()
+        elapsed = time.perf_counter() - started
+        return {"records": self.state["records"],
+                "imported": self.state["imported"],
+                "rejected": self.state["rejected"],
+                "seconds": round(elapsed, 3),
+                "rejects_file": self.rejects_path
+                if self.state["rejected"] else None}
+
+    def _open_at(self, stream, offset: int):
+        # (linhas a partir de offset, cabeçalho do CSV quando retomando)
+        fieldnames = None
+        if offset:
+            if self.fmt == "csv":
+                fieldnames = next(csv.reader(LineReader(stream),
+                                             delimiter=self.delimiter), None)
+            stream.seek(offset)
+        return LineReader(stream, offset), fieldnames
+
+    def _load(self, conn, started: float) -> None:
+        counters = {k: self.state[k] for k in
+                    ("records", "imported", "rejected")}
+        batch: List[Dict] = []
+        last_report = time.monotonic()
+        raw, stream = _open_binary(self.path)
+        with raw, stream, open(self.rejects_path, "ab") as rejects:
+            total = os.fstat(raw.fileno()).st_size or 1
+            lines, fieldnames = self._open_at(stream, self.state["offset"])
+            for number, record in iter_records(
+                    lines, self.fmt, self.delimiter, fieldnames=fieldnames,
+                    start=self.state["records"]):
+                counters["records"] = number
+                try:
+                    batch.append(clean_record(record))
+                except ValueError as e:
+                    counters["rejected"] += 1
+                    rejects.write(json.dumps(
+                        {"record": number, "error": str(e),
+                         "data": record if isinstance(record, dict)
+                         else None}, ensure_ascii=False).encode() + b"\n")
+                if len(batch) >= self.batch_size:
+                    counters["imported"] += len(batch)
+                    rejects.flush()
+                    self._write_batch(conn, batch, {
+                        **counters, "offset": lines.offset,
+                        "rejects_size": rejects.tell()})
+                    batch = []
+                    if time.monotonic() - last_report \
+                            >= self.progress_interval:
+                        last_report = time.monotonic()
+                        self._progress(raw.tell() / total, started)
+            rejects.flush()
+            after = {**counters, "offset": lines.offset,
+                     "rejects_size": rejects.tell()}
+            if batch:
+                after["imported"] += len(batch)
+                self._write_batch(conn, batch, after)
+            else:
+                self.state.update(after)
+                self._save_state()
+        self._progress(1.0, started)
+
+    def _progress(self, fraction: float, started: float) -> None:
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        state = self.state
+        self.report(f"{min(fraction, 1.0) * 100:5.1f}%  "
+                    f"{state['records']} registros, "
+                    f"{state['imported']} importados, "
+                    f"{state['rejected']} rejeitados, "
+                    f"{state['imported'] / elapsed:,.0f} linhas/s")
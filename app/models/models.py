@@ -1,14 +1,107 @@
+from datetime import datetime, timezone
 from flask_login import UserMixin
+from sqlalchemy import DDL, event
 from app.utils import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.hashing import password_hasher
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 class Product(db.Model):
     __tablename__ = 'produtos'
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    price = db.Column(db.Float, nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1,
+                        server_default="1")
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=_utcnow, onupdate=_utcnow,
+                           server_default=db.func.current_timestamp())
+
+
+class ProductChange(db.Model):
+    __tablename__ = 'produtos_changes'
+    # AUTOINCREMENT no SQLite: seq nunca é reutilizado
+    __table_args__ = {'sqlite_autoincrement': True}
+    seq = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    op = db.Column(db.String(10), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+
+
+class IdBlock(db.Model):
+    __tablename__ = 'id_blocks'
+    # próximo ID livre de cada sequência hi/lo (ver app/utils/ids.py)
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+
+
+class OutboxEntry(db.Model):
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        db.Index('ix_outbox_status_available_at', 'status', 'available_at'),
+        {'sqlite_autoincrement': True},
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    key = db.Column(db.String(200), nullable=True)
+    # pending -> (entregue: apagada) | dead
+    status = db.Column(db.String(10), nullable=False, default="pending",
+                       server_default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0,
+                         server_default="0")
+    available_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    # token do último claim: o dispatcher relê só as linhas que o UPDATE
+    # dele marcou
+    claimed_by = db.Column(db.String(32), nullable=True, index=True)
+
+
+class ServerSession(db.Model):
+    __tablename__ = 'sessions'
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+# Índice de busca: FTS5 (external content) sincronizado por triggers no
+# SQLite; índice GIN de tsvector no PostgreSQL.
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5("
+    "name, description, content='produtos', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos "
+    "BEGIN INSERT INTO produtos_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos "
+    "BEGIN INSERT INTO produtos_fts(produtos_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_fts_au "
+    "AFTER UPDATE OF name, description ON produtos "
+    "BEGIN INSERT INTO produtos_fts(produtos_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO produtos_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+]
+POSTGRES_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_produtos_search ON produtos USING gin "
+    "(to_tsvector('simple', name || ' ' || coalesce(description, '')))",
+]
+
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Product.__table__, "after_create",
+                 DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_SEARCH_DDL:
+    event.listen(Product.__table__, "after_create",
+                 DDL(_statement).execute_if(dialect="postgresql"))
+event.listen(Product.__table__, "after_drop",
+             DDL("DROP TABLE IF EXISTS produtos_fts")
+             .execute_if(dialect="sqlite"))
 
 
 class User(UserMixin, db.Model):
@@ -18,8 +111,10 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
 
+    # mesmo caminho de /login e /cadastro: pool de processos e método
+    # configurado (PASSWORD_HASH_METHOD)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
@@ -0,0 +1,165 @@
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from flask import has_app_context
+from sqlalchemy import delete, func, insert, select, update
+
+from app.domain_services import OutboxDispatcher, OutboxMessage
+from app.metrics import metrics
+from app.models.models import OutboxEntry
+from app.utils import db
+
+# mensagens reservadas por um dispatcher voltam a ficar disponíveis depois
+# deste prazo se ele morrer antes do ack
+CLAIM_LEASE_SECONDS = 60
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _to_message(entry: OutboxEntry) -> OutboxMessage:
+    return OutboxMessage(subject=entry.subject, body=entry.body,
+                         key=entry.key, id=entry.id, attempts=entry.attempts,
+                         available_at=entry.available_at.replace(
+                             tzinfo=timezone.utc).timestamp())
+
+
+class SqlAlchemyOutbox:
+    # Outbox na tabela `outbox`. add() só coloca a linha na sessão atual:
+    # chamado dentro do unit_of_work() do repo, o commit que grava o produto
+    # grava a notificação (ou o rollback descarta as duas). Os demais métodos
+    # são do dispatcher, que roda numa thread própria e abre um app context
+    # por chamada.
+
+    def __init__(self, app=None, lease: int = CLAIM_LEASE_SECONDS):
+        self.app = app
+        self.lease = lease
+
+    @contextmanager
+    def _session(self):
+        if has_app_context():
+            yield db.session
+            return
+        with self.app.app_context():
+            yield db.session
+
+    def add(self, message: OutboxMessage) -> None:
+        db.session.add(OutboxEntry(subject=message.subject, body=message.body,
+                                   key=message.key))
+
+    def add_many(self, messages: List[OutboxMessage]) -> None:
+        # executemany na transação da sessão (lotes grandes sem objetos ORM)
+        if messages:
+            db.session.execute(insert(OutboxEntry), [
+                {"subject": m.subject, "body": m.body, "key": m.key}
+                for m in messages])
+
+    def claim(self, limit: int) -> List[OutboxMessage]:
+        # um único UPDATE marca as linhas com o token deste claim; o WHERE de
+        # fora é reavaliado linha a linha, então dois dispatchers nunca
+        # levam a mesma mensagem. Depois relê só o que tem o token.
+        now = _utcnow()
+        token = uuid.uuid4().hex
+        with self._session() as session:
+            try:
+                available = (OutboxEntry.status == "pending",
+                             OutboxEntry.available_at <= now)
+                ids = (select(OutboxEntry.id).where(*available)
+                       .order_by(OutboxEntry.id).limit(limit))
+                if session.get_bind().dialect.name == "postgresql":
+                    ids = ids.with_for_update(skip_locked=True)
+                session.execute(
+                    update(OutboxEntry)
+                    .where(OutboxEntry.id.in_(ids.scalar_subquery()),
+                           *available)
+                    .values(claimed_by=token,
+                            available_at=now
+                            + timedelta(seconds=self.lease)),
+                    execution_options={"synchronize_session": False})
+                entries = session.scalars(
+                    select(OutboxEntry).where(OutboxEntry.claimed_by == token)
+                    .order_by(OutboxEntry.id)).all()
+                messages = [_to_message(entry) for entry in entries]
+                session.commit()
+                return messages
+            except Exception:
+                session.rollback()
+                raise
+
+    def _write(self, statement) -> None:
+        with self._session() as session:
+            try:
+                session.execute(statement)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+    def ack(self, messages: List[OutboxMessage]) -> None:
+        self._write(delete(OutboxEntry).where(
+            OutboxEntry.id.in_([m.id for m in messages])))
+
+    def retry(self, messages: List[OutboxMessage], delay: float,
+              error: str) -> None:
+        self._write(update(OutboxEntry)
+                    .where(OutboxEntry.id.in_([m.id for m in messages]))
+                    .values(attempts=OutboxEntry.attempts + 1,
+                            available_at=_utcnow()
+                            + timedelta(seconds=delay),
+                            claimed_by=None, last_error=error))
+
+    def dead(self, messages: List[OutboxMessage], error: str) -> None:
+        self._write(update(OutboxEntry)
+                    .where(OutboxEntry.id.in_([m.id for m in messages]))
+                    .values(status="dead",
+                            attempts=OutboxEntry.attempts + 1,
+                            last_error=error))
+
+    def depth(self, status: str = "pending") -> int:
+        with self._session() as session:
+            return session.scalar(select(func.count())
+                                  .select_from(OutboxEntry)
+                                  .where(OutboxEntry.status == status))
+
+
+class LogNotifier:
+    # notifier padrão do dispatcher da aplicação: registra no log. Troque por
+    # um de verdade em app.extensions["outbox_dispatcher"].notifier
+
+    def send(self, subject: str, body: str) -> None:
+        print(f"[NOTIFY] {subject}: {body}", flush=True)
+
+
+def register_outbox_metrics(dispatcher: OutboxDispatcher,
+                            name: str = "products") -> None:
+    # profundidade da fila e contadores do dispatcher em /metrics
+    metrics.add_collector(
+        "outbox_depth", "Notificações pendentes no outbox.",
+        lambda: [({"outbox": name}, dispatcher.outbox.depth())])
+    for stat in ("delivered", "deliveries", "retries", "dead"):
+        metrics.add_collector(
+            f"outbox_{stat}", f"Estatística '{stat}' do dispatcher do outbox.",
+            lambda stat=stat: [({"outbox": name},
+                                getattr(dispatcher, stat))])
+
+
+def init_outbox(app) -> Optional[OutboxDispatcher]:
+    # dispatcher do outbox da aplicação (OUTBOX_DISPATCHER_ENABLED). Com
+    # OUTBOX_AUTOSTART desligado (gunicorn com preload) a thread não sobe no
+    # master: cada worker a inicia no warm_up
+    if not app.config.get("OUTBOX_DISPATCHER_ENABLED", False):
+        return None
+    dispatcher = OutboxDispatcher(
+        SqlAlchemyOutbox(app), LogNotifier(),
+        batch_size=app.config.get("OUTBOX_BATCH_SIZE", 100),
+        poll_interval=app.config.get("OUTBOX_POLL_INTERVAL", 1.0),
+        max_attempts=app.config.get("OUTBOX_MAX_ATTEMPTS", 5))
+    app.extensions["outbox_dispatcher"] = dispatcher
+    if metrics.enabled:
+        register_outbox_metrics(dispatcher)
+    if app.config.get("OUTBOX_AUTOSTART", True):
+        dispatcher.start()
+    return dispatcher
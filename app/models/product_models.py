@@ -1,6 +1,37 @@
-from typing import Dict, List
+import base64
+import csv
+import io
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import (
+    Float, bindparam, column, delete, func, insert, or_, select,
+    text, tuple_, update
+)
+from sqlalchemy.orm import aliased
 from app.utils import db
-from app.models.models import Product
+from app.utils.cache import product_cache
+from app.utils.engine import use_replica
+from app.utils.fastjson import encode_value, rows_encoder
+from app.utils.ids import product_ids
+from app.models.models import Product, ProductChange
+from app.domain_services import ProductDTO
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FIELDS = ("id", "name", "price", "description")
+BULK_BATCH_SIZE = 1000
+MAX_CHANGES_WAIT = 30
+CHANGES_POLL_INTERVAL = 1.0
+
+# acorda long-polls deste processo logo após um commit; escritas de outros
+# processos são vistas pelo polling a cada CHANGES_POLL_INTERVAL
+_changes_signal = threading.Condition()
 
 
 def _to_dict(p: Product) -> Dict:
@@ -9,43 +40,433 @@ def _to_dict(p: Product) -> Dict:
         "name": p.name,
         "price": float(p.price) if p.price is not None else None,
         "description": p.description,
+        "version": p.version,
+        "updated_at": p.updated_at.isoformat() if p.updated_at else None,
     }
 
 
-def list_products() -> List[Dict]:
-    products = Product.query.all()
-    result = [_to_dict(p) for p in products]
+@use_replica
+def products_fingerprint() -> Tuple[int, Optional[datetime]]:
+    # count + instante da última escrita. max(updated_at) não anda num
+    # delete, então vale o changed_at mais recente do feed (busca pela PK)
+    last_change = (select(ProductChange.changed_at)
+                   .order_by(ProductChange.seq.desc()).limit(1)
+                   .scalar_subquery())
+    count, last_updated, last_changed = db.session.execute(
+        select(func.count(Product.id), func.max(Product.updated_at),
+               last_change)).one()
+    return count, max(filter(None, (last_updated, last_changed)),
+                      default=None)
+
+
+PRODUCT_FIELDS = ("id", "name", "price", "description", "version",
+                  "updated_at")
+SORT_KEYS = ("id", "price", "name")
+
+
+def _row_to_dict(row, fields) -> Dict:
+    result = {}
+    for field in fields:
+        value = getattr(row, field)
+        if field == "price" and value is not None:
+            value = float(value)
+        elif field == "updated_at" and value is not None:
+            value = value.isoformat()
+        result[field] = value
+    return result
+
+
+def _parse_fields(fields) -> Tuple[str, ...]:
+    if not fields:
+        return PRODUCT_FIELDS
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(",") if f.strip()]
+    for field in fields:
+        if field not in PRODUCT_FIELDS:
+            raise ValueError(f"Campo inválido: {field}.")
+    return ("id",) + tuple(f for f in fields if f != "id")
+
+
+def _parse_price(value, label: str) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{label} inválido.")
+
+
+@use_replica
+def list_products(fields=None) -> List[Dict]:
+    fields = _parse_fields(fields)
+    generation = product_cache.generation()
+    cached = product_cache.get_list("all", ",".join(fields),
+                                    generation=generation)
+    if cached is not None:
+        return cached
+    rows = db.session.execute(
+        select(*[getattr(Product, f) for f in fields]).order_by(Product.id))
+    result = [_row_to_dict(row, fields) for row in rows]
+    product_cache.set_list(result, "all", ",".join(fields),
+                           generation=generation)
     return result
 
 
+def _encode_token(data: Dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode_token(token: str) -> Dict:
+    try:
+        pad = "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(token + pad))
+    except ValueError:
+        raise ValueError("Cursor inválido.")
+    if not isinstance(data, dict):
+        raise ValueError("Cursor inválido.")
+    return data
+
+
+def encode_cursor(id_product: int, sort: str = "id", key=None) -> str:
+    if sort == "id":
+        return _encode_token({"id": id_product})
+    return _encode_token({"id": id_product, "s": sort, "k": key})
+
+
+def decode_cursor(cursor: str, sort: str = "id") -> Tuple[int, object]:
+    data = _decode_token(cursor)
+    try:
+        id_product = int(data["id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Cursor inválido.")
+    if data.get("s", "id") != sort:
+        raise ValueError("Cursor não corresponde à ordenação.")
+    return id_product, data.get("k")
+
+
+def _page_args(limit, after, before, min_price, max_price, name_prefix,
+               sort, fields) -> Tuple:
+    if after and before:
+        raise ValueError("Informe apenas um dos cursores: after ou before.")
+    if not limit or limit < 1:
+        limit = DEFAULT_PAGE_SIZE
+    limit = min(limit, MAX_PAGE_SIZE)
+    sort = sort or "id"
+    if sort not in SORT_KEYS:
+        raise ValueError("Ordenação inválida. Use id, price ou name.")
+    return (limit, after, before, _parse_price(min_price, "Preço mínimo"),
+            _parse_price(max_price, "Preço máximo"), name_prefix, sort,
+            _parse_fields(fields))
+
+
+def _fetch_page(limit, after, before, min_price, max_price, name_prefix,
+                sort, fields):
+    # SELECT só das colunas pedidas (+ id e a chave de ordenação, usados no
+    # cursor); description não é lida se ninguém pediu
+    sort_column = getattr(Product, sort)
+    columns = list(fields)
+    if sort not in columns:
+        columns.append(sort)
+    stmt = select(*[getattr(Product, c) for c in columns])
+    if min_price is not None:
+        stmt = stmt.where(Product.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(Product.price <= max_price)
+    if name_prefix:
+        # faixa [prefixo, prefixo + U+10FFFF): usa o índice de name
+        stmt = stmt.where(Product.name >= name_prefix,
+                          Product.name < name_prefix + "\U0010ffff")
+
+    def keyset(cursor):
+        id_product, key = decode_cursor(cursor, sort)
+        if sort == "id":
+            return (Product.id,), (id_product,)
+        return (sort_column, Product.id), (key, id_product)
+
+    # keyset em (chave de ordenação, id): custo constante por página
+    if before:
+        cols, values = keyset(before)
+        rows = db.session.execute(
+            stmt.where(tuple_(*cols) < tuple_(*values))
+            .order_by(*[c.desc() for c in cols])
+            .limit(limit + 1)).all()
+        has_prev = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_next = True
+    else:
+        if after:
+            cols, values = keyset(after)
+            stmt = stmt.where(tuple_(*cols) > tuple_(*values))
+        order = [Product.id] if sort == "id" else [sort_column, Product.id]
+        rows = db.session.execute(
+            stmt.order_by(*order).limit(limit + 1)).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = bool(after)
+
+    def cursor_for(row):
+        return encode_cursor(row.id, sort, getattr(row, sort))
+
+    next_cursor = cursor_for(rows[-1]) if rows and has_next else None
+    prev_cursor = cursor_for(rows[0]) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+@use_replica
+def list_products_page(limit: Optional[int] = None,
+                       after: Optional[str] = None,
+                       before: Optional[str] = None,
+                       min_price=None,
+                       max_price=None,
+                       name_prefix: Optional[str] = None,
+                       sort: Optional[str] = None,
+                       fields=None) -> Dict:
+    args = _page_args(limit, after, before, min_price, max_price,
+                      name_prefix, sort, fields)
+    cache_key = ("page",) + args[:-1] + (",".join(args[-1]),)
+    generation = product_cache.generation()
+    cached = product_cache.get_list(*cache_key, generation=generation)
+    if cached is not None:
+        return cached
+    rows, next_cursor, prev_cursor = _fetch_page(*args)
+    page = {
+        "items": [_row_to_dict(row, args[-1]) for row in rows],
+        "limit": args[0],
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+    product_cache.set_list(page, *cache_key, generation=generation)
+    return page
+
+
+@use_replica
+def list_products_page_json(limit: Optional[int] = None,
+                            after: Optional[str] = None,
+                            before: Optional[str] = None,
+                            min_price=None,
+                            max_price=None,
+                            name_prefix: Optional[str] = None,
+                            sort: Optional[str] = None,
+                            fields=None) -> bytes:
+    # mesma página de list_products_page, já serializada (linhas -> bytes)
+    args = _page_args(limit, after, before, min_price, max_price,
+                      name_prefix, sort, fields)
+    cache_key = ("page-json",) + args[:-1] + (",".join(args[-1]),)
+    generation = product_cache.generation()
+    cached = product_cache.get_list(*cache_key, generation=generation)
+    if cached is not None:
+        return cached
+    rows, next_cursor, prev_cursor = _fetch_page(*args)
+    body = b'{"items":%b,"limit":%d,"next_cursor":%b,"prev_cursor":%b}' % (
+        rows_encoder(args[-1])(rows), args[0], encode_value(next_cursor),
+        encode_value(prev_cursor))
+    product_cache.set_list(body, *cache_key, generation=generation)
+    return body
+
+
+def _search_hits(dialect: str, terms: List[str]):
+    # subconsulta com as colunas de produtos + score, onde ordem crescente de
+    # (score, id) = ordem de relevância; a paginação é keyset nesse par
+    table = Product.__table__
+    columns = ", ".join(f"produtos.{c.name}" for c in table.c)
+    if dialect == "sqlite":
+        # termos com prefixo: "note"* "avm"* (AND implícito), ranking BM25
+        # (menor = melhor) com peso maior para o nome
+        match = " ".join('"{}"*'.format(t.replace('"', '""')) for t in terms)
+        stmt = text(
+            f"SELECT {columns}, bm25(produtos_fts, 10.0, 1.0) AS score "
+            f"FROM produtos_fts "
+            f"JOIN produtos ON produtos.id = produtos_fts.rowid "
+            f"WHERE produtos_fts MATCH :match")
+    elif dialect == "postgresql":
+        document = ("to_tsvector('simple', produtos.name || ' ' || "
+                    "coalesce(produtos.description, ''))")
+        stmt = text(
+            f"SELECT {columns}, "
+            f"-ts_rank({document}, to_tsquery('simple', :match)) AS score "
+            f"FROM produtos "
+            f"WHERE {document} @@ to_tsquery('simple', :match)")
+        match = " & ".join(f"{t}:*" for t in terms)
+    else:
+        # demais bancos: prefixo no nome (usa o índice de produtos.name)
+        return select(*table.c, Product.name.label("score")).where(
+            or_(*[Product.name.startswith(t, autoescape=True)
+                  for t in terms])).subquery("hits")
+    return (stmt.bindparams(match=match)
+            .columns(*table.c, column("score", Float))
+            .subquery("hits"))
+
+
+def _search_cursor(row, direction: str) -> str:
+    return _encode_token({"r": row.score, "id": row[0].id, "d": direction})
+
+
+@use_replica
+def search_products(q: str, limit: Optional[int] = None,
+                    cursor: Optional[str] = None) -> Dict:
+    terms = re.findall(r"\w+", q or "")
+    if not terms:
+        raise ValueError("Informe um termo de busca.")
+    if not limit or limit < 1:
+        limit = DEFAULT_PAGE_SIZE
+    limit = min(limit, MAX_PAGE_SIZE)
+    key = None
+    if cursor:
+        data = _decode_token(cursor)
+        try:
+            key = (data["r"], int(data["id"]), data.get("d", "a"))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Cursor inválido.")
+
+    generation = product_cache.generation()
+    cached = product_cache.get_list("search", " ".join(terms), limit, cursor,
+                                    generation=generation)
+    if cached is not None:
+        return cached
+
+    hits = _search_hits(db.engine.dialect.name, terms)
+    stmt = select(aliased(Product, hits), hits.c.score)
+    backward = key is not None and key[2] == "b"
+    if key is not None:
+        # o score (BM25/ts_rank) muda quando o catálogo muda: a fronteira é
+        # o score atual da última linha vista, e o do cursor só se ela não
+        # casar mais com a busca
+        stored, id_product = key[:2]
+        score = func.coalesce(
+            select(hits.c.score).where(hits.c.id == id_product)
+            .scalar_subquery(), stored)
+        if backward:
+            stmt = stmt.where(or_(hits.c.score < score,
+                                  (hits.c.score == score)
+                                  & (hits.c.id < id_product)))
+        else:
+            stmt = stmt.where(or_(hits.c.score > score,
+                                  (hits.c.score == score)
+                                  & (hits.c.id > id_product)))
+    order = [hits.c.score.desc(), hits.c.id.desc()] if backward \
+        else [hits.c.score, hits.c.id]
+    rows = db.session.execute(stmt.order_by(*order).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, key is not None
+    page = {
+        "items": [_to_dict(row[0]) for row in rows],
+        "limit": limit,
+        "query": q,
+        "next_cursor": _search_cursor(rows[-1], "a")
+        if rows and has_next else None,
+        "prev_cursor": _search_cursor(rows[0], "b")
+        if rows and has_prev else None,
+    }
+    product_cache.set_list(page, "search", " ".join(terms), limit, cursor,
+                           generation=generation)
+    return page
+
+
+def iter_products(chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Dict]:
+    # yield_per => cursor em streaming, busca em blocos de chunk_size linhas
+    stmt = (
+        select(Product.id, Product.name, Product.price, Product.description)
+        .order_by(Product.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for row in db.session.execute(stmt):
+        yield {
+            "id": row.id,
+            "name": row.name,
+            "price": float(row.price) if row.price is not None else None,
+            "description": row.description,
+        }
+
+
+def export_products_ndjson(
+        chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    encode_row = rows_encoder(EXPORT_FIELDS).row
+    stmt = (
+        select(*[getattr(Product, f) for f in EXPORT_FIELDS])
+        .order_by(Product.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for rows in db.session.execute(stmt).partitions():
+        yield b"\n".join([encode_row(row) for row in rows]) + b"\n"
+
+
+def export_products_csv(
+        chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    count = 0
+    for item in iter_products(chunk_size):
+        writer.writerow(item)
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+@use_replica
 def product_by_id(id_product: int) -> Dict:
+    generation = product_cache.generation()
+    cached = product_cache.get_product(id_product)
+    if cached is not None:
+        return cached
     product = Product.query.get(id_product)
     if not product:
         raise ValueError("Produto não encontrado.")
-    return _to_dict(product)
+    result = _to_dict(product)
+    product_cache.set_product(id_product, result, generation=generation)
+    return result
 
 
-def create_product(data: Dict) -> Dict:
-    name = (data.get("name") or "").strip()
+def _clean_name(value) -> str:
+    if value is not None and not isinstance(value, str):
+        raise ValueError("Nome inválido.")
+    name = (value or "").strip()
     if not name:
         raise ValueError("O nome do produto é obrigatório.")
+    return name
+
+
+def _clean_description(value) -> Optional[str]:
+    if value is not None and not isinstance(value, str):
+        raise ValueError("Descrição inválida.")
+    return value
 
+
+def _clean_price(value) -> float:
     try:
-        price = float(data.get("price"))
+        price = float(value)
     except (TypeError, ValueError):
         raise ValueError("Preço inválido.")
-
     if price <= 0:
         raise ValueError("O valor do produto deve ser positivo.")
+    return price
+
+
+def create_product(data: Dict) -> Dict:
+    name = _clean_name(data.get("name"))
+    price = _clean_price(data.get("price"))
 
     new_product = Product(
+        id=product_ids.next_id(),
         name=name,
         price=price,
         description=data.get("description"),
     )
     try:
         db.session.add(new_product)
+        db.session.add(ProductChange(product_id=new_product.id, op="upsert"))
         db.session.commit()
+        product_cache.invalidate()
+        _notify_changes()
         return _to_dict(new_product)
     except Exception as e:
         db.session.rollback()
@@ -59,24 +480,19 @@ def update_product(id_product: int, new_data: Dict) -> Dict:
         raise ValueError("Produto não encontrado.")
 
     if "name" in new_data:
-        name = (new_data.get("name") or "").strip()
-        if not name:
-            raise ValueError("O nome do produto é obrigatório.")
-        product.name = name
+        product.name = _clean_name(new_data.get("name"))
 
     if "price" in new_data:
-        try:
-            price = float(new_data.get("price"))
-        except (TypeError, ValueError):
-            raise ValueError("Preço inválido.")
-        if price <= 0:
-            raise ValueError("O valor do produto deve ser positivo.")
-        product.price = price
+        product.price = _clean_price(new_data.get("price"))
 
     if "description" in new_data:
         product.description = new_data.get("description")
 
+    product.version = Product.version + 1
+    db.session.add(ProductChange(product_id=id_product, op="upsert"))
     db.session.commit()
+    product_cache.invalidate(id_product)
+    _notify_changes()
     return _to_dict(product)
 
 
@@ -87,9 +503,363 @@ def delete_product(id_product: int) -> Dict:
     try:
         as_dict = _to_dict(product)
         db.session.delete(product)
+        db.session.add(ProductChange(product_id=id_product, op="delete"))
         db.session.commit()
+        product_cache.invalidate(id_product)
+        _notify_changes()
         return as_dict
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao deletar produto: {e}")
         raise
+
+
+def _parse_bulk_item(item) -> Dict:
+    if not isinstance(item, dict):
+        raise ValueError("Item inválido.")
+    op = item.get("op") or "upsert"
+    if not isinstance(op, str):
+        raise ValueError("Operação inválida.")
+    op = op.lower()
+    id_product = item.get("id")
+    if id_product is not None:
+        try:
+            id_product = int(id_product)
+        except (TypeError, ValueError):
+            raise ValueError("ID inválido.")
+    if op == "delete":
+        if id_product is None:
+            raise ValueError("O ID é obrigatório para exclusão.")
+        return {"op": "delete", "id": id_product}
+    if op != "upsert":
+        raise ValueError(f"Operação inválida: {op}.")
+
+    values = {}
+    if "name" in item:
+        values["name"] = _clean_name(item.get("name"))
+    if "price" in item:
+        values["price"] = _clean_price(item.get("price"))
+    if "description" in item:
+        values["description"] = _clean_description(item.get("description"))
+    return {"op": "upsert", "id": id_product, "values": values}
+
+
+def _bulk_update(rows: List[Dict]) -> None:
+    # executemany por conjunto de colunas; version é incrementada no banco
+    groups: Dict[Tuple, List[Dict]] = {}
+    for row in rows:
+        columns = tuple(sorted(k for k in row if k != "id"))
+        params = {"b_id": row["id"], **{k: row[k] for k in columns}}
+        groups.setdefault(columns, []).append(params)
+    table = Product.__table__
+    for params in groups.values():
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(version=table.c.version + 1),
+            params)
+
+
+def _apply_bulk_batch(batch: List, results: List) -> None:
+    ids = {parsed["id"] for _, parsed in batch if parsed["id"] is not None}
+    existing = set()
+    if ids:
+        existing = set(db.session.scalars(
+            select(Product.id).where(Product.id.in_(ids))))
+
+    inserts, updates, deletes = [], [], []
+    seen = set()
+    for index, parsed in batch:
+        id_product = parsed["id"]
+        if id_product is not None:
+            if id_product in seen:
+                results[index] = {"index": index, "status": "error",
+                                  "error": "ID repetido no lote."}
+                continue
+            seen.add(id_product)
+
+        if parsed["op"] == "delete":
+            if id_product not in existing:
+                results[index] = {"index": index, "status": "error",
+                                  "error": "Produto não encontrado."}
+                continue
+            deletes.append((index, id_product))
+        elif id_product in existing:
+            if not parsed["values"]:
+                # só o id: nada a gravar e nenhum evento no feed
+                results[index] = {"index": index, "status": "unchanged",
+                                  "id": id_product}
+                continue
+            updates.append((index, {"id": id_product, **parsed["values"]}))
+        elif id_product is not None:
+            # IDs novos só saem do product_ids: um ID escolhido pelo cliente
+            # pode estar no bloco já reservado por outro processo
+            results[index] = {"index": index, "status": "error",
+                              "error": "Produto não encontrado."}
+        else:
+            values = parsed["values"]
+            if "name" not in values:
+                results[index] = {"index": index, "status": "error",
+                                  "error": "O nome do produto é obrigatório."}
+                continue
+            if "price" not in values:
+                results[index] = {"index": index, "status": "error",
+                                  "error": "Preço inválido."}
+                continue
+            inserts.append((index, {"name": values["name"],
+                                    "price": values["price"],
+                                    "description": values.get("description")}))
+
+    try:
+        # IDs reservados antes do primeiro DML do lote
+        new_ids = product_ids.take(len(inserts))
+        _bulk_update([row for _, row in updates])
+        if deletes:
+            db.session.execute(
+                delete(Product).where(
+                    Product.id.in_([pid for _, pid in deletes])),
+                execution_options={"synchronize_session": False})
+        if inserts:
+            db.session.execute(insert(Product), [
+                {"id": pid, **row}
+                for (_, row), pid in zip(inserts, new_ids)])
+        changes = (
+            [{"product_id": row["id"], "op": "upsert"}
+             for _, row in updates]
+            + [{"product_id": pid, "op": "upsert"} for pid in new_ids]
+            + [{"product_id": pid, "op": "delete"} for _, pid in deletes]
+        )
+        if changes:
+            db.session.execute(insert(ProductChange), changes)
+        db.session.commit()
+        product_cache.invalidate(
+            *[row["id"] for _, row in updates], *[pid for _, pid in deletes])
+        _notify_changes()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao gravar lote de produtos: {e}")
+        for index, _ in updates + deletes + inserts:
+            results[index] = {"index": index, "status": "error",
+                              "error": "Falha ao gravar o lote."}
+        return
+
+    for index, row in updates:
+        results[index] = {"index": index, "status": "updated",
+                          "id": row["id"]}
+    for index, pid in deletes:
+        results[index] = {"index": index, "status": "deleted", "id": pid}
+    for (index, _), pid in zip(inserts, new_ids):
+        results[index] = {"index": index, "status": "created", "id": pid}
+
+
+def bulk_upsert_products(items: List[Dict],
+                         batch_size: int = BULK_BATCH_SIZE) -> Dict:
+    batch_size = max(1, batch_size)
+    results: List[Optional[Dict]] = [None] * len(items)
+    batch = []
+    for index, item in enumerate(items):
+        try:
+            batch.append((index, _parse_bulk_item(item)))
+        except ValueError as e:
+            results[index] = {"index": index, "status": "error",
+                              "error": str(e)}
+        if len(batch) >= batch_size:
+            _apply_bulk_batch(batch, results)
+            batch = []
+    if batch:
+        _apply_bulk_batch(batch, results)
+
+    summary = {"created": 0, "updated": 0, "unchanged": 0, "deleted": 0,
+               "error": 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return {
+        "created": summary["created"],
+        "updated": summary["updated"],
+        "unchanged": summary["unchanged"],
+        "deleted": summary["deleted"],
+        "errors": summary["error"],
+        "results": results,
+    }
+
+
+class SqlAlchemyProductRepo:
+    # ProductRepo do domínio sobre a tabela produtos. next_id() sai do bloco
+    # reservado por product_ids (sem ida ao banco na maioria das chamadas);
+    # save_many grava o lote com um executemany por operação e um commit.
+    # get() passa pelo mapa de identidade: um produto lido ou gravado por
+    # este repo não é buscado de novo. Use um repo por unidade de trabalho.
+    # Dentro de unit_of_work() os saves não fazem commit: o que for
+    # adicionado à sessão depois deles (ex.: outbox) entra no mesmo commit.
+
+    def __init__(self, batch_size: int = BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._identity: Dict[int, ProductDTO] = {}
+        self._persisted = set()
+        self._deferred: Optional[List[int]] = None
+
+    @contextmanager
+    def unit_of_work(self):
+        if self._deferred is not None:
+            yield
+            return
+        self._deferred = []
+        try:
+            yield
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # o mapa de identidade pode ter produtos que não foram gravados
+            self.clear()
+            raise
+        finally:
+            updated, self._deferred = self._deferred, None
+        self._after_commit(updated)
+
+    def _after_commit(self, updated: List[int]) -> None:
+        product_cache.invalidate(*updated)
+        _notify_changes()
+
+    def next_id(self) -> int:
+        return product_ids.next_id()
+
+    def next_ids(self, count: int) -> List[int]:
+        return product_ids.take(count)
+
+    def save(self, product: ProductDTO) -> ProductDTO:
+        return self.save_many([product])[0]
+
+    def save_many(self, products: List[ProductDTO]) -> List[ProductDTO]:
+        products = list(products)
+        missing = [p for p in products if p.id is None]
+        for product, pid in zip(missing, product_ids.take(len(missing))):
+            product.id = pid
+        # uma transação para o lote inteiro; executemany em fatias de
+        # batch_size
+        updated = []
+        try:
+            rows = [{"id": p.id, "name": _clean_name(p.name),
+                     "price": _clean_price(p.price),
+                     "description": p.description} for p in products]
+            for start in range(0, len(rows), max(1, self.batch_size)):
+                updated += self._write(rows[start:start + self.batch_size])
+            if self._deferred is None:
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erro ao gravar lote de produtos: {e}")
+            raise
+        if self._deferred is None:
+            self._after_commit(updated)
+        else:
+            self._deferred += updated
+        for product in products:
+            self._identity[product.id] = product
+            self._persisted.add(product.id)
+        return products
+
+    def _write(self, rows: List[Dict]) -> List[int]:
+        unknown = [row["id"] for row in rows
+                   if row["id"] not in self._persisted]
+        existing = self._persisted.intersection(row["id"] for row in rows)
+        if unknown:
+            existing.update(db.session.scalars(
+                select(Product.id).where(Product.id.in_(unknown))))
+        inserts = [row for row in rows if row["id"] not in existing]
+        updates = [row for row in rows if row["id"] in existing]
+        if inserts:
+            db.session.execute(insert(Product), inserts)
+        _bulk_update(updates)
+        db.session.execute(insert(ProductChange), [
+            {"product_id": row["id"], "op": "upsert"} for row in rows])
+        return [row["id"] for row in updates]
+
+    def get(self, pid: int) -> Optional[ProductDTO]:
+        product = self._identity.get(pid)
+        if product is not None:
+            return product
+        row = db.session.execute(
+            select(Product.id, Product.name, Product.price,
+                   Product.description).where(Product.id == pid)).first()
+        if row is None:
+            return None
+        product = self._identity[pid] = ProductDTO(
+            id=row.id, name=row.name, price=row.price,
+            description=row.description)
+        self._persisted.add(pid)
+        return product
+
+    def clear(self) -> None:
+        self._identity.clear()
+        self._persisted.clear()
+
+
+def _notify_changes() -> None:
+    with _changes_signal:
+        _changes_signal.notify_all()
+
+
+def current_change_token() -> str:
+    seq = db.session.scalar(select(func.max(ProductChange.seq))) or 0
+    return _encode_token({"seq": seq})
+
+
+def _decode_change_token(token: Optional[str]) -> int:
+    if not token:
+        return 0
+    try:
+        return max(int(_decode_token(token)["seq"]), 0)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Token de alterações inválido.")
+
+
+def _fetch_changes(since: int, limit: int) -> List:
+    stmt = (
+        select(ProductChange.seq, ProductChange.product_id, ProductChange.op,
+               ProductChange.changed_at, Product.name, Product.price,
+               Product.description, Product.version, Product.updated_at)
+        .outerjoin(Product, Product.id == ProductChange.product_id)
+        .where(ProductChange.seq > since)
+        .order_by(ProductChange.seq)
+        .limit(limit + 1)
+    )
+    return db.session.execute(stmt).all()
+
+
+def list_changes(since: Optional[str] = None, limit: Optional[int] = None,
+                 wait: float = 0) -> Dict:
+    seq = _decode_change_token(since)
+    if not limit or limit < 1:
+        limit = DEFAULT_PAGE_SIZE
+    limit = min(limit, MAX_PAGE_SIZE)
+    deadline = time.monotonic() + min(max(wait or 0, 0), MAX_CHANGES_WAIT)
+
+    rows = _fetch_changes(seq, limit)
+    while not rows and time.monotonic() < deadline:
+        # encerra a transação de leitura para enxergar novos commits
+        db.session.rollback()
+        with _changes_signal:
+            _changes_signal.wait(
+                min(CHANGES_POLL_INTERVAL, deadline - time.monotonic()))
+        rows = _fetch_changes(seq, limit)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = []
+    for row in rows:
+        product = None
+        if row.op != "delete" and row.name is not None:
+            product = _row_to_dict(row, PRODUCT_FIELDS[1:])
+            product = {"id": row.product_id, **product}
+        changes.append({
+            "seq": row.seq,
+            "id": row.product_id,
+            "op": row.op,
+            "changed_at": row.changed_at.isoformat(),
+            "product": product,
+        })
+    return {
+        "changes": changes,
+        "next": _encode_token({"seq": rows[-1].seq if rows else seq}),
+        "has_more": has_more,
+    }
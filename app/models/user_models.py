@@ -1,6 +1,45 @@
+from typing import Optional
+from flask_login import UserMixin
+from sqlalchemy import select
 from app.utils import db
+from app.utils.cache import LRUCache
+from app.utils.hashing import HashingBusy, password_hasher
 from app.models.models import User
 
+# identidades leves (sem password_hash) para o user_loader do Flask-Login
+user_cache = LRUCache(maxsize=10000, ttl=300)
+
+
+class UserIdentity(UserMixin):
+
+    def __init__(self, id: int, username: str, email: str):
+        self.id = id
+        self.username = username
+        self.email = email
+
+
+def load_user_identity(user_id) -> Optional[UserIdentity]:
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    identity = user_cache.get(user_id)
+    if identity is not None:
+        return identity
+    row = db.session.execute(
+        select(User.id, User.username, User.email)
+        .where(User.id == user_id)).first()
+    if row is None:
+        return None
+    identity = UserIdentity(row.id, row.username, row.email)
+    user_cache.set(user_id, identity)
+    return identity
+
+
+def invalidate_user(user_id) -> None:
+    if user_id is not None:
+        user_cache.delete(int(user_id))
+
 
 def register_user(username, password, email):
     if User.query.filter_by(username=username).first():
@@ -8,8 +47,34 @@ def register_user(username, password, email):
     if User.query.filter_by(email=email).first():
         raise ValueError("Email já cadastrado")
 
-    new_user = User(username=username, email=email)
-    new_user.set_password(password)
+    new_user = User(username=username, email=email,
+                    password_hash=password_hasher.hash(password))
     db.session.add(new_user)
     db.session.commit()
+    invalidate_user(new_user.id)
     return new_user
+
+
+def change_password(user_id, password):
+    user = User.query.get(int(user_id))
+    if not user:
+        raise ValueError("Usuário não encontrado.")
+    user.password_hash = password_hasher.hash(password)
+    db.session.commit()
+    invalidate_user(user.id)
+    return user
+
+
+def authenticate_user(username, password) -> Optional[User]:
+    user = User.query.filter_by(username=username).first()
+    if user is None or not password_hasher.verify(user.password_hash,
+                                                  password):
+        return None
+    if password_hasher.needs_rehash(user.password_hash):
+        # método/custo mudou: regrava o hash aproveitando a senha em claro
+        try:
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+        except HashingBusy:
+            pass
+    return user
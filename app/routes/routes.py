@@ -1,34 +1,73 @@
 # app/routes/routes.py
 from flask import (
     Blueprint, jsonify, request, render_template,
-    url_for, flash, redirect, session
+    url_for, flash, redirect, session, Response, stream_with_context,
+    current_app, send_file
+)
+from flask_login import (
+    current_user, login_user, login_required, logout_user
 )
-from flask_login import login_user, login_required, logout_user
 from werkzeug.exceptions import BadRequest
 
 from app.models.product_models import (
-    list_products, create_product, update_product,
-    delete_product, product_by_id
+    list_products, list_products_page, list_products_page_json,
+    create_product, update_product, delete_product, product_by_id,
+    export_products_csv,
+    export_products_ndjson, bulk_upsert_products, products_fingerprint,
+    search_products, list_changes, current_change_token
+)
+from app.utils.engine import use_replica
+from app.utils.http import make_etag, not_modified, set_validators
+from app.models.user_models import (
+    register_user, invalidate_user, authenticate_user
 )
-from app.models.user_models import register_user
-from app.models.models import Product, User
+from app.utils.hashing import HashingBusy
+from app.metrics import metrics
+from app.utils.profiling import TOKEN_HEADER, profiler
+from app.utils.compression import compressor
 from app.security import require_oauth, has_role
 from flask.typing import ResponseReturnValue
+from datetime import datetime
 
 main_bp = Blueprint('main', __name__)
 
+LIST_FILTERS = ("min_price", "max_price", "name_prefix", "sort", "fields")
+
+
+def _list_filters():
+    return {k: request.args[k] for k in LIST_FILTERS if request.args.get(k)}
+
 
 @main_bp.route('/')
 def index():
-    product = Product.query.all()
+    product = list_products(fields=("id", "name", "price"))
     return render_template('index.html', product=product)
 
 
 @main_bp.route('/produtos', methods=['GET'], endpoint='get_products')
 @login_required
 def get_products():
-    products = list_products()
-    return render_template('product/list.html', products=products)
+    q = (request.args.get("q") or "").strip()
+    try:
+        if q:
+            page = search_products(
+                q,
+                limit=request.args.get("limit", type=int),
+                cursor=request.args.get("after") or request.args.get(
+                    "before"),
+            )
+        else:
+            page = list_products_page(
+                limit=request.args.get("limit", type=int),
+                after=request.args.get("after"),
+                before=request.args.get("before"),
+                **_list_filters(),
+            )
+    except ValueError as e:
+        flash(str(e), "product_danger")
+        return redirect(url_for('main.get_products'))
+    return render_template('product/list.html', products=page["items"],
+                           page=page, q=q, filters=_list_filters())
 
 
 @main_bp.route('/produtos/<int:id_product>', methods=["GET"],
@@ -140,10 +179,14 @@ def register_view() -> ResponseReturnValue:
         except ValueError as e:
             flash(f"Erro: {e}", "register_danger")
             return render_template("user/register.html"), 400
+        except HashingBusy:
+            flash("Servidor ocupado, tente novamente em instantes.",
+                  "register_danger")
+            return render_template("user/register.html"), 503
         except Exception as e:
             flash(f"Erro inesperado: {str(e)}", "register_danger")
             return render_template("user/register.html"), 500
-        
+
     return "Method Not Allowed", 405
 
 
@@ -152,8 +195,13 @@ def login():
     if request.method == 'POST':
         username = request.form.get("username")
         password = request.form.get("password")
-        user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            user = authenticate_user(username, password)
+        except HashingBusy:
+            flash("Servidor ocupado, tente novamente em instantes.",
+                  "auth_danger")
+            return render_template("user/login.html"), 503
+        if user:
             login_user(user)
             flash("Login bem-sucedido!", "auth_success")
             return redirect(url_for('main.index'))
@@ -165,16 +213,99 @@ def login():
 @main_bp.route('/logout', methods=['GET', 'POST'], endpoint='logout')
 @login_required
 def logout():
+    invalidate_user(current_user.get_id())
     logout_user()
     session.clear()
     flash("Logout realizado com sucesso.", "auth_success")
     return redirect(url_for('main.index'))
 
 
+@main_bp.get('/metrics')
+def metrics_view():
+    if not metrics.enabled:
+        return "Not Found", 404
+    if not metrics.allowed():
+        return "Forbidden", 403
+    return Response(metrics.render(),
+                    mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
 @main_bp.get('/api/produtos')
 @require_oauth()
+@use_replica
 def api_list_products():
-    return jsonify(list_products()), 200
+    # fingerprint e página no mesmo banco: ETag e corpo sempre batem
+    count, last_modified = products_fingerprint()
+    etag = make_etag("produtos", count, last_modified,
+                     request.query_string.decode())
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    cached = compressor.cached_response(etag, "application/json")
+    if cached is not None:
+        # o ETag fraco da versão comprimida já vem do compressor
+        return set_validators(cached, None, last_modified), 200
+    try:
+        body = list_products_page_json(
+            limit=request.args.get("limit", type=int),
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            **_list_filters(),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    resp = current_app.response_class(body + b"\n",
+                                      mimetype="application/json")
+    return set_validators(resp, etag, last_modified), 200
+
+
+@main_bp.get('/api/produtos/export')
+@require_oauth()
+def api_export_products():
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt == "ndjson":
+        body, mimetype = export_products_ndjson(), "application/x-ndjson"
+    elif fmt == "csv":
+        body, mimetype = export_products_csv(), "text/csv"
+    else:
+        return jsonify({"error": "Formato inválido. Use ndjson ou csv."}), 400
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=produtos.{fmt}",
+            # ponto de partida para /api/produtos/changes após a exportação
+            "X-Change-Token": current_change_token(),
+        },
+    )
+
+
+@main_bp.get('/api/produtos/changes')
+@require_oauth()
+def api_product_changes():
+    try:
+        feed = list_changes(
+            since=request.args.get("since"),
+            limit=request.args.get("limit", type=int),
+            wait=request.args.get("wait", default=0, type=float),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(feed), 200
+
+
+@main_bp.get('/api/produtos/search')
+@require_oauth()
+def api_search_products():
+    try:
+        page = search_products(
+            request.args.get("q", ""),
+            limit=request.args.get("limit", type=int),
+            cursor=request.args.get("after") or request.args.get("before"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page), 200
 
 
 @main_bp.get('/api/produtos/<int:id_product>')
@@ -182,9 +313,15 @@ def api_list_products():
 def api_get_product(id_product: int):
     try:
         prod = product_by_id(id_product)
-        return jsonify(prod), 200
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
+    etag = make_etag("produto", prod["id"], prod["version"])
+    last_modified = datetime.fromisoformat(prod["updated_at"]) \
+        if prod["updated_at"] else None
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    return set_validators(jsonify(prod), etag, last_modified), 200
 
 
 @main_bp.post('/api/produtos')
@@ -206,6 +343,20 @@ def api_create_product():
         return jsonify({"error": str(e)}), 500
 
 
+@main_bp.post('/api/produtos/bulk')
+@require_oauth()
+def api_bulk_products():
+    if not has_role("products:write"):
+        return jsonify({"error": "forbidden"}), 403
+    data = request.get_json(force=True, silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({"error": "Envie uma lista de itens em 'items'."}), 400
+    result = bulk_upsert_products(
+        items, batch_size=current_app.config["BULK_BATCH_SIZE"])
+    return jsonify(result), 200
+
+
 @main_bp.put('/api/produtos/<int:id_product>')
 @require_oauth()
 def api_update_product(id_product: int):
@@ -235,3 +386,64 @@ def api_delete_product(id_product: int):
         return "", 204
     except ValueError as e:
         return jsonify({"error": str(e)}), 404
+
+
+@main_bp.get('/api/admin/profiles')
+@require_oauth()
+def api_list_profiles():
+    if not has_role("admin"):
+        return jsonify({"error": "forbidden"}), 403
+    if not profiler.enabled:
+        return jsonify({"error": "profiling desabilitado"}), 404
+    return jsonify({**profiler.status(), "items": profiler.list()}), 200
+
+
+@main_bp.get('/api/admin/profiles/<profile_id>')
+@require_oauth()
+def api_get_profile(profile_id: str):
+    if not has_role("admin"):
+        return jsonify({"error": "forbidden"}), 403
+    meta = profiler.load(profile_id) if profiler.enabled else None
+    if meta is None:
+        return jsonify({"error": "Perfil não encontrado."}), 404
+    return jsonify(meta), 200
+
+
+@main_bp.get('/api/admin/profiles/<profile_id>/pstats')
+@require_oauth()
+def api_download_profile(profile_id: str):
+    if not has_role("admin"):
+        return jsonify({"error": "forbidden"}), 403
+    path = profiler.stats_path(profile_id) if profiler.enabled else None
+    if path is None:
+        return jsonify({"error": "Perfil não encontrado."}), 404
+    return send_file(path, mimetype="application/octet-stream",
+                     as_attachment=True,
+                     download_name=f"{profile_id}.prof")
+
+
+@main_bp.post('/api/admin/profiles/arm')
+@require_oauth()
+def api_arm_profiler():
+    if not has_role("admin"):
+        return jsonify({"error": "forbidden"}), 403
+    if not profiler.enabled:
+        return jsonify({"error": "profiling desabilitado"}), 404
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        count = int(data.get("count", 1))
+    except (TypeError, ValueError):
+        return jsonify({"error": "count inválido"}), 400
+    profiler.arm(count, data.get("endpoint"))
+    return jsonify(profiler.status()), 200
+
+
+@main_bp.post('/api/admin/profiles/token')
+@require_oauth()
+def api_profile_token():
+    if not has_role("admin"):
+        return jsonify({"error": "forbidden"}), 403
+    if not profiler.enabled:
+        return jsonify({"error": "profiling desabilitado"}), 404
+    return jsonify({"header": TOKEN_HEADER, "token": profiler.make_token(),
+                    "expires_in": profiler.token_max_age}), 200
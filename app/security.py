@@ -2,14 +2,22 @@ from __future__ import annotations
 
 import os
 import json
+import time
 import base64
-from typing import Any, Dict, Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
 from collections.abc import Mapping
 
 import requests
 from authlib.integrations.flask_oauth2 import ResourceProtector, current_token
 from authlib.jose import JsonWebKey, JsonWebToken
+from authlib.jose.errors import JoseError
 from authlib.oauth2.rfc6750 import BearerTokenValidator
+from werkzeug.exceptions import ServiceUnavailable
+
+from app.metrics import metrics
 try:
     from authlib.oauth2.rfc6750.errors import InvalidTokenError
 except Exception:
@@ -23,16 +31,354 @@ def _b64url_json(segment: str) -> Dict[str, Any]:
     return json.loads(base64.urlsafe_b64decode(segment + pad))
 
 
+def _read_json(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Optional[str], data: Dict[str, Any]) -> None:
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print("[OIDC] falha ao gravar cache em", path, e, flush=True)
+
+
+class OIDCUnavailable(ServiceUnavailable):
+    description = "Provedor de identidade indisponível."
+
+
+# Discovery sob demanda: usa a última cópia boa em disco e busca a versão
+# atual em background (retry com backoff exponencial), sem travar o boot.
+class OIDCDiscovery:
+
+    def __init__(
+        self,
+        well_known_url: Optional[str],
+        timeout: int = 5,
+        cache_path: Optional[str] = None,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        debug: bool = False,
+    ):
+        self.well_known_url = well_known_url
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.debug = debug
+
+        self._doc: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._delay = backoff
+        self._next_attempt = 0.0
+
+    def after_fork(self) -> None:
+        # o lock pode ter sido copiado travado por uma thread do master
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict[str, Any]:
+        doc = self._doc
+        if doc is not None:
+            return doc
+        with self._lock:
+            if self._doc is None:
+                self._doc = _read_json(self.cache_path)
+            if self._doc is None and time.monotonic() >= self._next_attempt:
+                try:
+                    self._fetch()
+                except Exception as e:
+                    print("[OIDC] discovery indisponível:", e, flush=True)
+                    self._next_attempt = time.monotonic() + self._delay
+                    self._delay = min(self._delay * 2, self.max_backoff)
+            if self._doc is None:
+                raise OIDCUnavailable()
+            return self._doc
+
+    def refresh_in_background(
+            self, on_ready: Optional[Callable[[], None]] = None) -> None:
+        if not self.well_known_url:
+            print("[OIDC] OIDC_WELL_KNOWN não configurado", flush=True)
+            return
+
+        def run():
+            delay = self.backoff
+            while True:
+                try:
+                    self._fetch()
+                    break
+                except Exception as e:
+                    print(f"[OIDC] discovery indisponível ({e}), "
+                          f"nova tentativa em {delay:.0f}s", flush=True)
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_backoff)
+            if on_ready:
+                on_ready()
+
+        threading.Thread(target=run, name="oidc-discovery",
+                         daemon=True).start()
+
+    def _fetch(self) -> None:
+        if not self.well_known_url:
+            raise RuntimeError("OIDC_WELL_KNOWN não configurado")
+        resp = requests.get(self.well_known_url, timeout=self.timeout)
+        resp.raise_for_status()
+        doc = resp.json()
+        if "issuer" not in doc or "jwks_uri" not in doc:
+            raise ValueError("documento de discovery incompleto")
+        if self.debug:
+            print("[OIDC]", f"issuer={doc['issuer']}",
+                  f"jwks_uri={doc['jwks_uri']}", flush=True)
+        self._doc = doc
+        self._delay = self.backoff
+        self._next_attempt = 0.0
+        _write_json(self.cache_path, doc)
+
+
+# Chaves do JWKS já importadas, indexadas por kid. Renova em background ao
+# passar de refresh_ratio do TTL; kid desconhecido dispara uma única busca
+# (single-flight), no máximo uma a cada min_refetch_interval segundos. A
+# busca na rede acontece fora do lock: as outras threads esperam o evento
+# da busca em andamento.
+class JWKSKeyStore:
+
+    def __init__(
+        self,
+        jwks_uri: Any,
+        timeout: int = 5,
+        ttl: int = 300,
+        refresh_ratio: float = 0.8,
+        min_refetch_interval: int = 10,
+        debug: bool = False,
+        on_rotate: Optional[Callable[[], None]] = None,
+        cache_path: Optional[str] = None,
+    ):
+        self.jwks_uri = jwks_uri
+        self.timeout = timeout
+        self.ttl = ttl
+        self.refresh_ratio = refresh_ratio
+        self.min_refetch_interval = min_refetch_interval
+        self.debug = debug
+        self.on_rotate = on_rotate
+        self.cache_path = cache_path
+
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._inflight: Optional[threading.Event] = None
+
+    def after_fork(self) -> None:
+        # threads do master não existem no filho: lock e busca em andamento
+        # herdados ficariam travados para sempre
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._inflight = None
+
+    def get_key(self, kid: Optional[str]):
+        if not self._keys:
+            self._load_cached()
+        age = time.monotonic() - self._fetched_at
+        if not self._keys or age >= self.ttl:
+            self._refresh()
+        elif age >= self.ttl * self.refresh_ratio:
+            self._refresh_in_background()
+
+        keys = self._keys
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        key = keys.get(kid)
+        if key is None:
+            self._refresh(unknown_kid=kid)
+            key = self._keys.get(kid)
+        if key is None:
+            raise InvalidTokenError(description="unknown signing key")
+        return key
+
+    def _refresh(self, unknown_kid: Optional[str] = None) -> None:
+        seen = self._fetched_at
+        with self._lock:
+            # outra thread já renovou enquanto esperávamos o lock
+            if self._fetched_at != seen:
+                return
+            inflight = self._inflight
+            if inflight is None:
+                now = time.monotonic()
+                if unknown_kid is not None:
+                    if unknown_kid in self._keys:
+                        return
+                    if now - self._last_attempt < self.min_refetch_interval:
+                        return
+                    self._last_attempt = now
+                inflight = self._inflight = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            inflight.wait(self.timeout * 2)
+            if not self._keys:
+                raise OIDCUnavailable()
+            return
+
+        try:
+            self._install(self._fetch())
+            metrics.inc("jwks_fetches_total", result="ok")
+        except Exception as e:
+            metrics.inc("jwks_fetches_total", result="error")
+            print("[JWKS] falha ao buscar chaves:", e, flush=True)
+            if not self._keys:
+                raise OIDCUnavailable()
+            # mantém as chaves atuais e tenta de novo em background
+            self._fetched_at = (time.monotonic() - self.ttl *
+                                self.refresh_ratio +
+                                self.min_refetch_interval)
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="jwks-refresh", daemon=True).start()
+
+    def _load_cached(self) -> None:
+        with self._lock:
+            if self._keys:
+                return
+            jwks = _read_json(self.cache_path)
+            if not jwks:
+                return
+            try:
+                key_set = JsonWebKey.import_key_set(jwks)
+            except Exception:
+                return
+            self._keys = {key.kid: key for key in key_set.keys}
+            # cópia do disco: vale para já, mas renova em background
+            self._fetched_at = time.monotonic() - self.ttl * self.refresh_ratio
+
+    def _fetch(self):
+        jwks_uri = self.jwks_uri() if callable(self.jwks_uri) \
+            else self.jwks_uri
+        resp = requests.get(jwks_uri, timeout=self.timeout)
+        if self.debug:
+            print("[JWKS]", resp.status_code,
+                  "from", jwks_uri, flush=True)
+        resp.raise_for_status()
+        jwks = resp.json()
+        key_set = JsonWebKey.import_key_set(jwks)
+        _write_json(self.cache_path, jwks)
+        return key_set
+
+    def _install(self, key_set) -> None:
+        previous = self._keys
+        self._keys = {key.kid: key for key in key_set.keys}
+        self._fetched_at = time.monotonic()
+        if previous and previous.keys() != self._keys.keys() \
+                and self.on_rotate:
+            self.on_rotate()
+
+
+# LRU de claims já verificados, chaveado pelo SHA-256 do token. Cada entrada
+# vale até exp - leeway, então a assinatura é checada uma vez por token.
+class VerifiedTokenCache:
+
+    def __init__(self, maxsize: int = 10000, leeway: int = 60):
+        self.maxsize = maxsize
+        self.leeway = leeway
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[bytes, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token_string: str) -> bytes:
+        return hashlib.sha256(token_string.encode()).digest()
+
+    def get(self, token_string: str):
+        key = self._key(token_string)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, token_string: str, claims) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        expires_at = exp - self.leeway
+        if expires_at <= time.time():
+            return
+        key = self._key(token_string)
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
 class KeycloakJWTValidator(BearerTokenValidator):
 
     def __init__(
         self,
-        issuer: str,
-        jwks_uri: str,
+        issuer: Optional[str] = None,
+        jwks_uri: Optional[str] = None,
         expected_aud: Optional[str] = None,
         timeout: int = 5,
         leeway: int = 60,
         debug: bool = False,
+        jwks_ttl: int = 300,
+        jwks_min_refetch_interval: int = 10,
+        token_cache_size: int = 10000,
+        discovery: Optional[OIDCDiscovery] = None,
+        jwks_cache_path: Optional[str] = None,
     ):
         super().__init__()
         self.realm = "prodmanager-api"
@@ -42,10 +388,63 @@ class KeycloakJWTValidator(BearerTokenValidator):
         self.timeout = timeout
         self.leeway = leeway
         self.debug = debug
+        self.discovery = discovery
 
-        self._jwks_cache: Optional[Dict[str, Any]] = None
+        self.token_cache = (
+            VerifiedTokenCache(maxsize=token_cache_size, leeway=leeway)
+            if token_cache_size > 0 else None
+        )
+        self._keys = JWKSKeyStore(
+            self._jwks_uri,
+            timeout=timeout,
+            ttl=jwks_ttl,
+            min_refetch_interval=jwks_min_refetch_interval,
+            debug=debug,
+            on_rotate=self.token_cache.clear if self.token_cache else None,
+            cache_path=jwks_cache_path,
+        )
         self._jwt = JsonWebToken(["RS256"])
 
+    def _issuer(self) -> Optional[str]:
+        if self.discovery is None:
+            return self.issuer
+        return self.discovery.get()["issuer"]
+
+    def _jwks_uri(self) -> Optional[str]:
+        if self.discovery is None:
+            return self.jwks_uri
+        return self.discovery.get()["jwks_uri"]
+
+    def prefetch(self) -> None:
+        def load_keys():
+            try:
+                self._keys.get_key(None)
+            except Exception:
+                pass
+
+        if self.discovery is None:
+            threading.Thread(target=load_keys, name="jwks-prefetch",
+                             daemon=True).start()
+        else:
+            self.discovery.refresh_in_background(on_ready=load_keys)
+
+    def after_fork(self) -> None:
+        # chamado no worker logo após o fork (ver reset_after_fork)
+        if self.discovery is not None:
+            self.discovery.after_fork()
+        self._keys.after_fork()
+        if self.token_cache is not None:
+            self.token_cache.after_fork()
+
+    def warm_up(self) -> None:
+        # versão síncrona do prefetch, usada antes do worker aceitar tráfego
+        self._issuer()
+        try:
+            self._keys.get_key(None)
+        except InvalidTokenError:
+            # mais de uma chave publicada: o conjunto já foi carregado
+            pass
+
     def authenticate_token(self, token_string: str):
         if self.debug:
             try:
@@ -65,17 +464,48 @@ class KeycloakJWTValidator(BearerTokenValidator):
             except Exception:
                 pass
 
-        jwks = self._get_jwks()
+        started = time.perf_counter()
+        if self.token_cache is not None:
+            cached = self.token_cache.get(token_string)
+            if cached is not None:
+                metrics.observe("jwt_verify_duration_seconds",
+                                time.perf_counter() - started,
+                                result="cached")
+                return cached
 
-        claims = self._jwt.decode(
-            token_string,
-            JsonWebKey.import_key_set(jwks),
-            claims_options={
-                "iss": {"essential": True, "values": [self.issuer]},
-                "aud": {"essential": False},
-            },
-        )
-        claims.validate(leeway=self.leeway)
+        try:
+            claims = self._verify(token_string)
+        except Exception:
+            metrics.observe("jwt_verify_duration_seconds",
+                            time.perf_counter() - started, result="error")
+            raise
+        metrics.observe("jwt_verify_duration_seconds",
+                        time.perf_counter() - started, result="verified")
+        if self.token_cache is not None:
+            self.token_cache.put(token_string, claims)
+        return claims
+
+    def _verify(self, token_string: str):
+        try:
+            header = _b64url_json(token_string.split(".")[0])
+        except Exception:
+            raise InvalidTokenError(description="malformed token")
+        issuer = self._issuer()
+        key = self._keys.get_key(header.get("kid"))
+
+        try:
+            claims = self._jwt.decode(
+                token_string,
+                key,
+                claims_options={
+                    "iss": {"essential": True, "values": [issuer]},
+                    "aud": {"essential": False},
+                },
+            )
+            claims.validate(leeway=self.leeway)
+        except JoseError as e:
+            # assinatura inválida, token expirado, issuer errado: 401, não 500
+            raise InvalidTokenError(description=e.description or e.error)
         return claims
 
     def validate_request(self, request):
@@ -93,23 +523,8 @@ class KeycloakJWTValidator(BearerTokenValidator):
                 raise InvalidTokenError(description="invalid audience")
         return claims
 
-    def _get_jwks(self) -> Dict[str, Any]:
-        if self._jwks_cache is None:
-            resp = requests.get(self.jwks_uri, timeout=self.timeout)
-            if self.debug:
-                print("[JWKS]", resp.status_code,
-                      "from", self.jwks_uri, flush=True)
-            resp.raise_for_status()
-            self._jwks_cache = resp.json()
-        return self._jwks_cache
-
 
 def init_oauth(app) -> None:
-    wk_url = app.config["OIDC_WELL_KNOWN"]
-    wk = requests.get(wk_url, timeout=5).json()
-    issuer = wk["issuer"]
-    jwks_uri = wk["jwks_uri"]
-
     audience = app.config.get("OIDC_AUDIENCE")
     debug = str(os.getenv("OIDC_DEBUG", "")).lower() in (
         "1", "true", "yes", "on")
@@ -118,26 +533,43 @@ def init_oauth(app) -> None:
         "1", "true", "yes", "on"
     )
     expected_aud = None if disable_aud else audience
+    cache_dir = app.config.get("OIDC_CACHE_DIR") or os.path.join(
+        app.instance_path, "oidc")
 
     if debug:
         print(
             "[OIDC]",
-            f"issuer={issuer}",
-            f"jwks_uri={jwks_uri}",
+            f"well_known={app.config.get('OIDC_WELL_KNOWN')}",
             f"audience={audience}",
             f"aud_check={'OFF' if disable_aud else 'ON'}",
+            f"cache_dir={cache_dir}",
             flush=True,
         )
 
+    # nenhuma chamada de rede aqui: discovery e JWKS são resolvidos em
+    # background ou na primeira requisição /api
+    discovery = OIDCDiscovery(
+        app.config.get("OIDC_WELL_KNOWN"),
+        timeout=5,
+        cache_path=os.path.join(cache_dir, "discovery.json"),
+        debug=debug,
+    )
     validator = KeycloakJWTValidator(
-        issuer=issuer,
-        jwks_uri=jwks_uri,
         expected_aud=expected_aud,
         timeout=5,
         leeway=60,
         debug=debug,
+        jwks_ttl=app.config.get("OIDC_JWKS_TTL", 300),
+        jwks_min_refetch_interval=app.config.get(
+            "OIDC_JWKS_MIN_REFETCH_INTERVAL", 10),
+        token_cache_size=app.config.get("OIDC_TOKEN_CACHE_SIZE", 10000),
+        discovery=discovery,
+        jwks_cache_path=os.path.join(cache_dir, "jwks.json"),
     )
     require_oauth.register_token_validator(validator)
+    app.extensions["oidc_validator"] = validator
+    if app.config.get("OIDC_PREFETCH", True):
+        validator.prefetch()
 
 
 def _extract_claims_from_current_token() -> dict:
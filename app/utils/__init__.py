@@ -1,14 +1,21 @@
-from flask import Flask, session
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
 from app.security import init_oauth
-from flask import request
+from app.metrics import metrics
+from app.utils.cache import product_cache
+from app.utils.hashing import password_hasher
+from app.utils.engine import RoutingSession, configure_engines, init_engine
+from app.utils.profiling import profiler
+from app.utils.fastjson import FastJSONProvider
+from app.utils.compression import compressor
+from app.utils.ids import product_ids
 
 load_dotenv()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 
 
@@ -17,16 +24,109 @@ def create_app():
         os.getcwd(), 'app', 'templates'))
 
     print("Template folder:", app.template_folder)
+    app.json = FastJSONProvider(app)
 
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=15)
+    app.config.update(
+        SESSION_BACKEND=os.getenv('SESSION_BACKEND', 'sqlalchemy'),
+        SESSION_TOUCH_INTERVAL=int(os.getenv('SESSION_TOUCH_INTERVAL', '60')),
+        SESSION_REDIS_URL=os.getenv(
+            'SESSION_REDIS_URL', 'redis://localhost:6379/0'),
+    )
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv(
         'DATABASE_URL', 'sqlite:///produtos.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(
+        DATABASE_REPLICA_URL=os.getenv('DATABASE_REPLICA_URL'),
+        REPLICA_STICKY_SECONDS=float(
+            os.getenv('REPLICA_STICKY_SECONDS', '2')),
+        DB_POOL_SIZE=int(os.getenv('DB_POOL_SIZE', '10')),
+        DB_MAX_OVERFLOW=int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        DB_POOL_TIMEOUT=int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        DB_POOL_RECYCLE=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        DB_POOL_PRE_PING=os.getenv('DB_POOL_PRE_PING', 'true').lower() in (
+            '1', 'true', 'yes', 'on'),
+        SQLITE_JOURNAL_MODE=os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        SQLITE_SYNCHRONOUS=os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        SQLITE_BUSY_TIMEOUT=int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+        SQLITE_MMAP_SIZE=int(os.getenv('SQLITE_MMAP_SIZE', '268435456')),
+        SQLITE_CACHE_SIZE=int(os.getenv('SQLITE_CACHE_SIZE', '-65536')),
+    )
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-only-change-me')
+    app.config['BULK_BATCH_SIZE'] = int(os.getenv('BULK_BATCH_SIZE', '1000'))
+    app.config['ID_BLOCK_SIZE'] = int(os.getenv('ID_BLOCK_SIZE', '100'))
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', '300'))
+    app.config['USER_CACHE_MAXSIZE'] = int(
+        os.getenv('USER_CACHE_MAXSIZE', '10000'))
+    app.config.update(
+        PASSWORD_HASH_METHOD=os.getenv(
+            'PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        PASSWORD_HASH_WORKERS=int(os.getenv('PASSWORD_HASH_WORKERS', '2')),
+        PASSWORD_HASH_CONCURRENCY=int(
+            os.getenv('PASSWORD_HASH_CONCURRENCY', '4')),
+        PASSWORD_HASH_QUEUE_TIMEOUT=float(
+            os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '2')),
+    )
+    app.config.update(
+        PRODUCT_CACHE_BACKEND=os.getenv('PRODUCT_CACHE_BACKEND', 'memory'),
+        PRODUCT_CACHE_TTL=int(os.getenv('PRODUCT_CACHE_TTL', '60')),
+        PRODUCT_CACHE_MAXSIZE=int(os.getenv('PRODUCT_CACHE_MAXSIZE', '10000')),
+        PRODUCT_CACHE_REDIS_URL=os.getenv(
+            'PRODUCT_CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+        PRODUCT_CACHE_LOCAL_TTL=int(os.getenv('PRODUCT_CACHE_LOCAL_TTL', '5')),
+        WEB_CONCURRENCY=int(os.getenv('WEB_CONCURRENCY', '1')),
+    )
+    app.config.update(
+        COMPRESSION_ENABLED=os.getenv(
+            'COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes', 'on'),
+        COMPRESSION_MIN_SIZE=int(os.getenv('COMPRESSION_MIN_SIZE', '1024')),
+        COMPRESSION_GZIP_LEVEL=int(os.getenv('COMPRESSION_GZIP_LEVEL', '6')),
+        COMPRESSION_BR_QUALITY=int(os.getenv('COMPRESSION_BR_QUALITY', '5')),
+        COMPRESSION_ZSTD_LEVEL=int(os.getenv('COMPRESSION_ZSTD_LEVEL', '3')),
+        COMPRESSION_CACHE_SIZE=int(
+            os.getenv('COMPRESSION_CACHE_SIZE', '256')),
+    )
+    app.config.update(
+        METRICS_ENABLED=os.getenv('METRICS_ENABLED', 'false').lower() in (
+            '1', 'true', 'yes', 'on'),
+        METRICS_N_PLUS_ONE_THRESHOLD=int(
+            os.getenv('METRICS_N_PLUS_ONE_THRESHOLD', '10')),
+        METRICS_TOKEN=os.getenv('METRICS_TOKEN'),
+        METRICS_ALLOWED_NETWORKS=os.getenv(
+            'METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128'),
+    )
+    app.config.update(
+        OUTBOX_DISPATCHER_ENABLED=os.getenv(
+            'OUTBOX_DISPATCHER_ENABLED', 'false').lower() in (
+            '1', 'true', 'yes', 'on'),
+        OUTBOX_AUTOSTART=os.getenv('OUTBOX_AUTOSTART', 'true').lower() in (
+            '1', 'true', 'yes', 'on'),
+        OUTBOX_BATCH_SIZE=int(os.getenv('OUTBOX_BATCH_SIZE', '100')),
+        OUTBOX_POLL_INTERVAL=float(os.getenv('OUTBOX_POLL_INTERVAL', '1')),
+        OUTBOX_MAX_ATTEMPTS=int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5')),
+    )
+    app.config.update(
+        WARMUP_DB_CONNECTIONS=int(os.getenv('WARMUP_DB_CONNECTIONS', '4')),
+        PROFILING_ENABLED=os.getenv('PROFILING_ENABLED', 'false').lower() in (
+            '1', 'true', 'yes', 'on'),
+        PROFILING_DIR=os.getenv('PROFILING_DIR'),
+        PROFILING_SAMPLE_RATE=float(os.getenv('PROFILING_SAMPLE_RATE', '0')),
+        PROFILING_MAX_ARTIFACTS=int(
+            os.getenv('PROFILING_MAX_ARTIFACTS', '50')),
+        PROFILING_TOKEN_MAX_AGE=int(
+            os.getenv('PROFILING_TOKEN_MAX_AGE', '300')),
+    )
     app.config.update(
         OIDC_ISSUER=os.getenv('OIDC_ISSUER'),
         OIDC_WELL_KNOWN=os.getenv('OIDC_WELL_KNOWN'),
         OIDC_AUDIENCE=os.getenv('OIDC_AUDIENCE'),
+        OIDC_JWKS_TTL=int(os.getenv('OIDC_JWKS_TTL', '300')),
+        OIDC_JWKS_MIN_REFETCH_INTERVAL=int(
+            os.getenv('OIDC_JWKS_MIN_REFETCH_INTERVAL', '10')),
+        OIDC_TOKEN_CACHE_SIZE=int(os.getenv('OIDC_TOKEN_CACHE_SIZE', '10000')),
+        OIDC_CACHE_DIR=os.getenv('OIDC_CACHE_DIR'),
+        OIDC_PREFETCH=os.getenv('OIDC_PREFETCH', 'true').lower() in (
+            '1', 'true', 'yes', 'on'),
     )
     print("[CFG] OIDC_ISSUER      ->", app.config.get("OIDC_ISSUER"))
     print("[CFG] OIDC_WELL_KNOWN  ->", app.config.get("OIDC_WELL_KNOWN"))
@@ -34,25 +134,57 @@ def create_app():
 
     init_oauth(app)
 
+    configure_engines(app)
     db.init_app(app)
+    init_engine(app)
+    product_ids.init_app(app)
+    product_cache.init_app(app)
+    password_hasher.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'main.login'
 
-    from app.models.models import Product, User
+    from app.models.models import Product
+    from app.models.user_models import load_user_identity, user_cache
+    from app.utils.sessions import init_sessions
+
+    init_sessions(app)
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    user_cache.maxsize = app.config['USER_CACHE_MAXSIZE']
+
+    metrics.init_app(app)
+    profiler.init_app(app)
+    # registrado por último: roda antes dos outros after_request, então a
+    # latência medida inclui a compressão
+    compressor.init_app(app)
+    if metrics.enabled:
+        def cache_stats():
+            stats = {"products": product_cache.stats(),
+                     "users": user_cache.stats(),
+                     "compressed": compressor.stats()}
+            validator = app.extensions.get("oidc_validator")
+            if validator is not None and validator.token_cache is not None:
+                stats["tokens"] = validator.token_cache.stats()
+            return stats
+
+        for stat in ("size", "hits", "misses", "evictions"):
+            metrics.add_collector(
+                f"cache_{stat}", f"Estatística '{stat}' dos caches.",
+                lambda stat=stat: [({"cache": name}, values[stat])
+                                   for name, values in cache_stats().items()
+                                   if stat in values])
+
+    # depois de metrics.init_app: a profundidade da fila vai para /metrics
+    from app.models.outbox_models import init_outbox
+    init_outbox(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    @app.before_request
-    def before_request():
-        if request.path.startswith('/api/'):
-            return
-        session.permanent = True
-        app.permanent_session_lifetime = timedelta(minutes=15)
-        session.modified = True
+        return load_user_identity(user_id)
 
     from app.routes.routes import main_bp
     app.register_blueprint(main_bp)
 
+    from app.commands import products_cli
+    app.cli.add_command(products_cli)
+
     return app
@@ -0,0 +1,258 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Any, tuple] = OrderedDict()
+        self._counters: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def set_if_counter(self, counter_key, expected: int, key, value,
+                       ttl: Optional[int] = None) -> bool:
+        # grava só se o contador ainda vale expected (checagem + set atômicos)
+        with self._lock:
+            if self._counters.get(counter_key, 0) != expected:
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def _set(self, key, value, ttl: Optional[int]) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, *keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def counter(self, key) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache:
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: int = 60, prefix: str = "prodmanager:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(
+                "PRODUCT_CACHE_BACKEND=redis requer o pacote 'redis'.")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key) -> str:
+        return f"{self.prefix}{key}"
+
+    def get(self, key, default=None):
+        raw = self._client.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl: Optional[int] = None) -> None:
+        self._set(self._client, key, value, ttl)
+
+    def set_if_counter(self, counter_key, expected: int, key, value,
+                       ttl: Optional[int] = None) -> bool:
+        # WATCH no contador: um incr entre a leitura e o EXEC aborta o set
+        import redis
+
+        with self._client.pipeline() as pipe:
+            try:
+                pipe.watch(self._key(counter_key))
+                if int(pipe.get(self._key(counter_key)) or 0) != expected:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                self._set(pipe, key, value, ttl)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def _set(self, client, key, value, ttl: Optional[int]) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if ttl:
+            client.setex(self._key(key), ttl, raw)
+        else:
+            client.set(self._key(key), raw)
+
+    def delete(self, *keys) -> None:
+        if keys:
+            self._client.delete(*[self._key(k) for k in keys])
+
+    def counter(self, key) -> int:
+        return int(self._client.get(self._key(key)) or 0)
+
+    def incr(self, key) -> int:
+        return int(self._client.incr(self._key(key)))
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(f"{self.prefix}*"):
+            self._client.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        evicted = self._client.info("stats").get("evicted_keys", 0)
+        return {
+            "backend": self.name,
+            "size": self._client.dbsize(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": evicted,
+        }
+
+
+class ProductCache:
+    # Listas são chaveadas por uma "geração" que qualquer escrita incrementa;
+    # assim uma escrita invalida todas as páginas sem varrer as chaves.
+    # Quem lê do banco captura generation() antes da consulta e a repassa ao
+    # set: uma escrita no meio do caminho faz o resultado ir para uma geração
+    # que ninguém mais lê (listas) ou ser descartado (produto; checagem e set
+    # atômicos no backend).
+    # O backend "memory" é por processo: com vários workers, escritas de um
+    # não invalidam os outros, então o TTL fica limitado a
+    # PRODUCT_CACHE_LOCAL_TTL. Use "redis" para invalidação compartilhada.
+    GENERATION_KEY = "products:gen"
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app) -> None:
+        kind = app.config.get("PRODUCT_CACHE_BACKEND", "memory")
+        ttl = app.config.get("PRODUCT_CACHE_TTL", 60)
+        if kind == "memory":
+            if app.config.get("WEB_CONCURRENCY", 1) > 1:
+                local_ttl = app.config.get("PRODUCT_CACHE_LOCAL_TTL", 5)
+                if not ttl or ttl > local_ttl:
+                    print(f"[CACHE] backend memory com vários workers: TTL "
+                          f"limitado a {local_ttl}s (use redis)", flush=True)
+                    ttl = local_ttl
+            self.backend = LRUCache(
+                maxsize=app.config.get("PRODUCT_CACHE_MAXSIZE", 10000),
+                ttl=ttl)
+        elif kind == "redis":
+            self.backend = RedisCache(
+                app.config["PRODUCT_CACHE_REDIS_URL"], ttl=ttl)
+        elif kind in ("none", "", None):
+            self.backend = None
+        else:
+            raise RuntimeError(f"PRODUCT_CACHE_BACKEND inválido: {kind}")
+
+    def get_product(self, id_product: int):
+        if self.backend is None:
+            return None
+        return self.backend.get(f"product:{id_product}")
+
+    def generation(self) -> Optional[int]:
+        if self.backend is None:
+            return None
+        return self.backend.counter(self.GENERATION_KEY)
+
+    def set_product(self, id_product: int, value,
+                    generation: Optional[int] = None) -> None:
+        if self.backend is None:
+            return
+        key = f"product:{id_product}"
+        if generation is None:
+            self.backend.set(key, value)
+        else:
+            self.backend.set_if_counter(self.GENERATION_KEY, generation, key,
+                                        value)
+
+    def _list_key(self, parts, generation: Optional[int]) -> str:
+        if generation is None:
+            generation = self.generation()
+        return f"products:list:{generation}:" + ":".join(
+            "" if p is None else str(p) for p in parts)
+
+    def get_list(self, *parts, generation: Optional[int] = None):
+        if self.backend is None:
+            return None
+        return self.backend.get(self._list_key(parts, generation))
+
+    def set_list(self, value, *parts,
+                 generation: Optional[int] = None) -> None:
+        if self.backend is not None:
+            self.backend.set(self._list_key(parts, generation), value)
+
+    def invalidate(self, *ids: int) -> None:
+        if self.backend is None:
+            return
+        # geração antes do delete: um set_product que já passou da checagem
+        # grava antes do delete e é apagado; os seguintes são recusados
+        self.backend.incr(self.GENERATION_KEY)
+        if ids:
+            self.backend.delete(*[f"product:{i}" for i in ids])
+
+    def stats(self) -> Dict[str, Any]:
+        if self.backend is None:
+            return {"backend": "none"}
+        return self.backend.stats()
+
+
+product_cache = ProductCache()
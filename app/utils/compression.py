@@ -0,0 +1,126 @@
+import gzip
+from typing import Callable, Dict, Optional
+
+from flask import current_app, request
+
+from app.utils.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = {
+    "text/html", "text/plain", "text/css", "text/csv",
+    "application/json", "application/x-ndjson", "application/javascript",
+}
+
+
+class Compressor:
+    # Comprime respostas 200 de tipos texto acima de min_size, negociando
+    # br > zstd > gzip pelo Accept-Encoding. Respostas com ETag forte têm os
+    # bytes comprimidos guardados por (ETag, encoding): repetir a mesma
+    # página não serializa nem comprime de novo.
+
+    def __init__(self):
+        self.enabled = False
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.br_quality = 5
+        self.zstd_level = 3
+        self.cache: Optional[LRUCache] = None
+        self._codecs: Dict[str, Callable[[bytes], bytes]] = {}
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("COMPRESSION_ENABLED", True)
+        if not self.enabled:
+            return
+        self.min_size = app.config.get("COMPRESSION_MIN_SIZE", self.min_size)
+        self.gzip_level = app.config.get("COMPRESSION_GZIP_LEVEL",
+                                         self.gzip_level)
+        self.br_quality = app.config.get("COMPRESSION_BR_QUALITY",
+                                         self.br_quality)
+        self.zstd_level = app.config.get("COMPRESSION_ZSTD_LEVEL",
+                                         self.zstd_level)
+        cache_size = app.config.get("COMPRESSION_CACHE_SIZE", 256)
+        self.cache = LRUCache(maxsize=cache_size, ttl=0) \
+            if cache_size > 0 else None
+
+        # ordem = preferência do servidor quando o cliente aceita vários
+        self._codecs = {}
+        if brotli is not None:
+            self._codecs["br"] = lambda data: brotli.compress(
+                data, quality=self.br_quality)
+        if zstandard is not None:
+            self._codecs["zstd"] = lambda data: zstandard.ZstdCompressor(
+                level=self.zstd_level).compress(data)
+        self._codecs["gzip"] = lambda data: gzip.compress(
+            data, compresslevel=self.gzip_level, mtime=0)
+
+        app.after_request(self._after_request)
+
+    def negotiate(self) -> Optional[str]:
+        if not self._codecs:
+            return None
+        return request.accept_encodings.best_match(list(self._codecs))
+
+    def cached_response(self, etag: str, mimetype: str):
+        # atalho para a rota: bytes já comprimidos para este ETag
+        if not self.enabled or self.cache is None:
+            return None
+        encoding = self.negotiate()
+        if encoding is None:
+            return None
+        body = self.cache.get((etag, encoding))
+        if body is None:
+            return None
+        response = current_app.response_class(body, mimetype=mimetype)
+        return self._mark(response, encoding, etag)
+
+    @staticmethod
+    def _mark(response, encoding: str, etag: Optional[str]):
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        if etag:
+            # outra codificação = outra representação: ETag fraco (como o
+            # nginx faz); If-None-Match usa comparação fraca
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _after_request(self, response):
+        if response.status_code != 200 or response.direct_passthrough \
+                or response.is_streamed \
+                or "Content-Encoding" in response.headers \
+                or response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        body = self.cache.get(key) if key and self.cache is not None \
+            else None
+        if body is None:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            body = self._codecs[encoding](data)
+            if key and self.cache is not None:
+                self.cache.set(key, body)
+        response.set_data(body)
+        return self._mark(response, encoding, etag)
+
+    def stats(self):
+        if self.cache is None:
+            return {"backend": "none"}
+        return self.cache.stats()
+
+
+compressor = Compressor()
@@ -0,0 +1,164 @@
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = "replica"
+
+# cookie com o instante (epoch) até quando o cliente lê do primário
+REPLICA_COOKIE = "pm_primary_until"
+
+_use_replica: ContextVar[Optional[bool]] = ContextVar("use_replica",
+                                                      default=None)
+_last_write = 0.0
+_replica_sticky_seconds = 2.0
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str, config) -> Dict[str, Any]:
+    if _is_sqlite(url):
+        # pragmas são aplicados no evento "connect" (init_engine)
+        return {}
+    return {
+        "pool_size": config.get("DB_POOL_SIZE", 10),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+    }
+
+
+def configure_engines(app) -> None:
+    # chamado antes de db.init_app: monta opções do engine e o bind da réplica
+    config = app.config
+    config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(
+        config["SQLALCHEMY_DATABASE_URI"], config))
+    replica_url = config.get("DATABASE_REPLICA_URL")
+    if replica_url:
+        binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+        binds[REPLICA_BIND] = {"url": replica_url,
+                               **engine_options(replica_url, config)}
+        config["SQLALCHEMY_BINDS"] = binds
+
+
+def _sqlite_pragmas(config):
+    pragmas = (
+        ("journal_mode", config.get("SQLITE_JOURNAL_MODE", "WAL")),
+        ("synchronous", config.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT", 5000)),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE", 268435456)),
+        ("cache_size", config.get("SQLITE_CACHE_SIZE", -65536)),
+    )
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return on_connect
+
+
+def init_engine(app) -> None:
+    global _replica_sticky_seconds
+    from app.utils import db
+
+    _replica_sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS", 2.0)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_pragmas(app.config))
+    if app.config.get("DATABASE_REPLICA_URL"):
+        app.after_request(_set_primary_cookie)
+
+
+def _set_primary_cookie(response):
+    # read-your-writes por cliente: quem escreveu lê do primário nos
+    # próximos REPLICA_STICKY_SECONDS, qualquer que seja o worker
+    if g.get("db_wrote"):
+        until = time.time() + _replica_sticky_seconds
+        response.set_cookie(REPLICA_COOKIE, f"{until:.3f}",
+                            max_age=math.ceil(_replica_sticky_seconds),
+                            httponly=True, samesite="Lax")
+    return response
+
+
+def _wrote_recently() -> bool:
+    if time.monotonic() - _last_write < _replica_sticky_seconds:
+        return True
+    if not has_request_context():
+        return False
+    if g.get("db_wrote"):
+        return True
+    try:
+        return float(request.cookies.get(REPLICA_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class RoutingSession(Session):
+    # Leituras dentro de replica() vão para a réplica, salvo se a sessão tem
+    # escritas pendentes ou se houve escrita recente: deste processo (o cache
+    # seria repopulado com dado antigo) ou deste cliente, pelo cookie
+    # REPLICA_COOKIE (read-your-writes entre workers). A decisão é tomada uma
+    # vez ao entrar no bloco, então ETag e corpo saem do mesmo banco.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _use_replica.get() and not self._flushing
+                and not (self.new or self.dirty or self.deleted)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind,
+                                **kwargs)
+
+
+def _mark_write(*args) -> None:
+    global _last_write
+    _last_write = time.monotonic()
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    _mark_write()
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _after_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _mark_write()
+
+
+@contextmanager
+def replica():
+    if _use_replica.get() is not None:
+        # bloco aninhado: mantém a decisão de quem abriu o primeiro
+        yield
+        return
+    token = _use_replica.set(not _wrote_recently())
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def use_replica(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with replica():
+            return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,117 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Sequence
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _value_default(value):
+    # mesmo formato de _to_dict: datetime em ISO 8601, Decimal como número
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def encode_value(value) -> bytes:
+        return orjson.dumps(value, default=_value_default)
+else:
+    def encode_value(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"),
+                          default=_value_default).encode()
+
+
+@lru_cache(maxsize=64)
+def rows_encoder(fields: Sequence[str]) -> Callable[[Iterable], bytes]:
+    # Serializa linhas do SQLAlchemy direto em bytes, sem montar um dict por
+    # linha: um template b'{"id":%b,...}' por conjunto de campos e cada valor
+    # codificado isoladamente. row[i] deve corresponder a fields[i].
+    order = sorted(range(len(fields)), key=lambda i: fields[i])
+    template = b"{" + b",".join(
+        b'"%s":%%b' % fields[i].encode() for i in order) + b"}"
+    encode = encode_value
+
+    if orjson is not None:
+        def encode_row(row) -> bytes:
+            return template % tuple([encode(row[i]) for i in order])
+
+        def encode_rows(rows) -> bytes:
+            return b"[" + b",".join([encode_row(row) for row in rows]) + b"]"
+    else:
+        # com a stdlib uma chamada por valor custa mais que o dict: uma
+        # única dumps para a lista inteira
+        names = [fields[i] for i in order]
+
+        def as_dict(row) -> dict:
+            return {name: row[i] for name, i in zip(names, order)}
+
+        def encode_row(row) -> bytes:
+            return encode(as_dict(row))
+
+        def encode_rows(rows) -> bytes:
+            return encode([as_dict(row) for row in rows])
+
+    encode_rows.row = encode_row
+    return encode_rows
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # orjson quando instalado; senão cai no provider padrão (stdlib).
+    # Datetimes seguem o formato HTTP do Flask (OPT_PASSTHROUGH_DATETIME).
+
+    _warned = False
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.fast = orjson is not None
+        if not self.fast and not FastJSONProvider._warned:
+            FastJSONProvider._warned = True
+            print("[JSON] orjson não instalado: usando json da stdlib "
+                  "(mais lento)", flush=True)
+
+    def _options(self, indent: bool) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        if self.fast:
+            try:
+                return orjson.dumps(obj, default=self.default,
+                                    option=self._options(indent))
+            except TypeError:
+                # inteiros > 64 bits e afins: deixa a stdlib decidir
+                pass
+        kwargs = {"indent": 2} if indent else {"separators": (",", ":")}
+        return super().dumps(obj, **kwargs).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.fast and not kwargs:
+            return self.dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if self.fast and not kwargs:
+            # orjson.JSONDecodeError herda de json.JSONDecodeError
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) \
+            or self.compact is False
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash: str, password: str) -> bool:
+    return check_password_hash(pwhash, password)
+
+
+def _normalize_method(method: str) -> str:
+    # forma completa que o Werkzeug grava no hash: "scrypt" vira
+    # "scrypt:32768:8:1", "pbkdf2" vira "pbkdf2:sha256:<iterações padrão>"
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        args = ["32768", "8", "1"]
+    elif name == "pbkdf2":
+        if not args:
+            args = ["sha256"]
+        if len(args) == 1:
+            args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ":".join([name, *args])
+
+
+class PasswordHasher:
+    # scrypt/pbkdf2 rodam num pool de processos: um pico de logins ocupa no
+    # máximo `concurrency` slots e quem não conseguir slot em `queue_timeout`
+    # segundos recebe HashingBusy, em vez de travar as threads do worker.
+
+    def __init__(self):
+        self.method = "scrypt:32768:8:1"
+        self.workers = 2
+        self.concurrency = 4
+        self.queue_timeout = 2.0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.concurrency = app.config.get(
+            "PASSWORD_HASH_CONCURRENCY", max(self.workers * 2, 1))
+        self.queue_timeout = app.config.get(
+            "PASSWORD_HASH_QUEUE_TIMEOUT", self.queue_timeout)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # recria o pool depois de um fork (ex.: workers com preload). O pool
+        # nasce numa thread de requisição de um worker gthread: forkar um
+        # processo com várias threads pode travar o filho, então os
+        # processos vêm do forkserver
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("forkserver"))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            return self._executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        return self._run(_verify, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        return _normalize_method(pwhash.split("$", 1)[0]) \
+            != _normalize_method(self.method)
+
+
+password_hasher = PasswordHasher()
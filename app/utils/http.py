@@ -0,0 +1,44 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import Response, request
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def not_modified(etag: str,
+                 last_modified: Optional[datetime] = None
+                 ) -> Optional[Response]:
+    last_modified = _as_utc(last_modified)
+    if request.if_none_match:
+        # comparação fraca (RFC 9110): aceita o W/"..." das respostas
+        # comprimidas
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return set_validators(Response(status=304), etag, last_modified)
+
+
+def set_validators(response: Response, etag: Optional[str],
+                   last_modified: Optional[datetime] = None) -> Response:
+    if etag is not None:
+        response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    return response
@@ -0,0 +1,103 @@
+import os
+import threading
+from typing import List
+
+from sqlalchemy import column, func, insert, select, table, update
+from sqlalchemy.exc import IntegrityError
+
+
+class IdBlockAllocator:
+    # IDs hi/lo: cada processo reserva na tabela id_blocks um bloco de
+    # block_size IDs numa transação curta e própria, e next_id() passa a ser
+    # só um incremento em memória. O bloco nunca começa abaixo do MAX(id) da
+    # tabela, então IDs gravados por fora não colidem com blocos novos.
+    # Reserve antes de qualquer DML na sessão: no SQLite a reserva usa outra
+    # conexão e esperaria pelo lock de escrita da própria sessão.
+
+    def __init__(self, name: str, table_name: str, block_size: int = 100):
+        self.name = name
+        self._table = table(table_name, column("id"))
+        self.block_size = block_size
+        self.reservations = 0
+        self._engine = None
+        self._next = 0
+        self._end = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        from app.utils import db
+
+        self.block_size = app.config.get("ID_BLOCK_SIZE", self.block_size)
+        with app.app_context():
+            self._engine = db.engine
+        self.reset()
+
+    def reset(self) -> None:
+        # descarta o bloco local (após fork ou em testes); os IDs que
+        # sobraram ficam como buraco na sequência
+        with self._lock:
+            self._next = self._end = 0
+            self._pid = None
+
+    def _reserve(self, size: int) -> int:
+        from app.models.models import IdBlock
+
+        for _ in range(2):
+            try:
+                with self._engine.begin() as conn:
+                    # o UPDATE vem primeiro: segura o lock de escrita (SQLite)
+                    # ou da linha (PostgreSQL) antes de ler o MAX(id)
+                    moved = conn.execute(
+                        update(IdBlock).where(IdBlock.name == self.name)
+                        .values(next_value=IdBlock.next_value + size))
+                    floor = conn.scalar(select(func.coalesce(
+                        func.max(self._table.c.id), 0))) + 1
+                    if moved.rowcount == 0:
+                        conn.execute(insert(IdBlock).values(
+                            name=self.name, next_value=floor + size))
+                        start = floor
+                    else:
+                        start = conn.scalar(
+                            select(IdBlock.next_value)
+                            .where(IdBlock.name == self.name)) - size
+                        if start < floor:
+                            start = floor
+                            conn.execute(
+                                update(IdBlock)
+                                .where(IdBlock.name == self.name)
+                                .values(next_value=start + size))
+                self.reservations += 1
+                return start
+            except IntegrityError:
+                # outro processo criou a linha ao mesmo tempo: tenta de novo
+                continue
+        raise RuntimeError(f"Não foi possível reservar IDs para {self.name}.")
+
+    def take(self, count: int) -> List[int]:
+        ids: List[int] = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # bloco reservado pelo master (preload) não vale no worker
+                self._next = self._end = 0
+                self._pid = os.getpid()
+            while len(ids) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(ids))
+                    self._next = self._reserve(size)
+                    self._end = self._next + size
+                stop = min(self._end, self._next + count - len(ids))
+                ids.extend(range(self._next, stop))
+                self._next = stop
+        return ids
+
+    def next_id(self) -> int:
+        return self.take(1)[0]
+
+    def stats(self):
+        return {"block_size": self.block_size,
+                "reservations": self.reservations,
+                "remaining": max(self._end - self._next, 0)}
+
+
+product_ids = IdBlockAllocator("produtos", "produtos")
@@ -0,0 +1,238 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import secrets
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import g, has_request_context, request
+from itsdangerous import BadSignature, TimestampSigner
+from sqlalchemy import event
+
+TOKEN_HEADER = "X-Profile-Token"
+_ID_RE = re.compile(r"^[0-9]+-[0-9a-f]+$")
+
+
+class RequestProfiler:
+    # Uma requisição é perfilada quando traz X-Profile-Token assinado, quando
+    # um admin armou o profiler (opcionalmente só para um endpoint) ou pelo
+    # sorteio de PROFILING_SAMPLE_RATE. Cada perfil vira <id>.prof (pstats) +
+    # <id>.json (metadados, top funções e SQL) em PROFILING_DIR, que guarda
+    # no máximo PROFILING_MAX_ARTIFACTS perfis.
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.sample_rate = 0.0
+        self.max_artifacts = 50
+        self.token_max_age = 300
+        self._signer: Optional[TimestampSigner] = None
+        self._armed = 0
+        self._armed_endpoint: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config.get("PROFILING_ENABLED", False)
+        if not self.enabled:
+            return
+        from app.utils import db
+
+        self.directory = app.config.get("PROFILING_DIR") or os.path.join(
+            app.instance_path, "profiles")
+        self.sample_rate = app.config.get("PROFILING_SAMPLE_RATE", 0.0)
+        self.max_artifacts = app.config.get("PROFILING_MAX_ARTIFACTS", 50)
+        self.token_max_age = app.config.get("PROFILING_TOKEN_MAX_AGE", 300)
+        self._signer = TimestampSigner(app.config["SECRET_KEY"],
+                                       salt="prodmanager-profile")
+        os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute",
+                             self._before_cursor_execute)
+                event.listen(engine, "after_cursor_execute",
+                             self._after_cursor_execute)
+
+    # --- controle ---
+
+    def make_token(self) -> str:
+        return self._signer.sign(secrets.token_hex(8)).decode()
+
+    def arm(self, count: int, endpoint: Optional[str] = None) -> None:
+        with self._lock:
+            self._armed = max(count, 0)
+            self._armed_endpoint = endpoint
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "armed": self._armed,
+            "endpoint": self._armed_endpoint,
+            "sample_rate": self.sample_rate,
+            "max_artifacts": self.max_artifacts,
+        }
+
+    def _reason(self) -> Optional[str]:
+        token = request.headers.get(TOKEN_HEADER)
+        if token:
+            try:
+                self._signer.unsign(token, max_age=self.token_max_age)
+                return "header"
+            except BadSignature:
+                pass
+        if self._armed and self._armed_endpoint in (None, request.endpoint):
+            with self._lock:
+                if self._armed:
+                    self._armed -= 1
+                    return "admin"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    # --- requisição ---
+
+    def _before_request(self) -> None:
+        if request.endpoint is None or request.endpoint == "static" \
+                or request.path.startswith("/api/admin/profiles"):
+            return
+        reason = self._reason()
+        if reason is None:
+            return
+        g._profile = {"reason": reason, "sql": [],
+                      "started": time.perf_counter(),
+                      "profiler": cProfile.Profile()}
+        g._profile["profiler"].enable()
+
+    def _after_request(self, response):
+        self._finish(response.status_code)
+        return response
+
+    def _teardown_request(self, exc) -> None:
+        self._finish(500)
+
+    def _finish(self, status: int) -> None:
+        state = g.pop("_profile", None)
+        if state is None:
+            return
+        state["profiler"].disable()
+        elapsed = time.perf_counter() - state["started"]
+        try:
+            self._write(state, status, elapsed)
+        except OSError as e:
+            print("[PROFILE] falha ao gravar perfil:", e, flush=True)
+
+    # --- SQL ---
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany):
+        if context is not None and has_request_context() \
+                and "_profile" in g:
+            context._profile_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters,
+                              context, executemany):
+        started = getattr(context, "_profile_started", None)
+        if started is None or not has_request_context():
+            return
+        state = g.get("_profile")
+        if state is not None:
+            state["sql"].append({
+                "statement": statement,
+                "duration_ms": round((time.perf_counter() - started) * 1000,
+                                     3),
+                "executemany": executemany,
+            })
+
+    # --- artefatos ---
+
+    @staticmethod
+    def _top_functions(profile, limit: int = 30) -> List[Dict]:
+        stats = pstats.Stats(profile)
+        rows = []
+        for (filename, line, name), (cc, nc, tt, ct, _) in \
+                stats.stats.items():
+            rows.append({
+                "function": f"{filename}:{line}({name})",
+                "calls": nc,
+                "tottime_ms": round(tt * 1000, 3),
+                "cumtime_ms": round(ct * 1000, 3),
+            })
+        rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+        return rows[:limit]
+
+    def _write(self, state: Dict, status: int, elapsed: float) -> None:
+        profile_id = f"{int(time.time() * 1000)}-{secrets.token_hex(4)}"
+        base = os.path.join(self.directory, profile_id)
+        state["profiler"].dump_stats(base + ".prof")
+        meta = {
+            "id": profile_id,
+            "reason": state["reason"],
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": request.endpoint,
+            "status": status,
+            "duration_ms": round(elapsed * 1000, 3),
+            "created_at": time.time(),
+            "sql_count": len(state["sql"]),
+            "sql_ms": round(sum(q["duration_ms"] for q in state["sql"]), 3),
+            "sql": state["sql"],
+            "top": self._top_functions(state["profiler"]),
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._trim()
+
+    def _trim(self) -> None:
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.max_artifacts, 0)]:
+            for ext in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except OSError:
+                    pass
+
+    def _ids(self) -> List[str]:
+        # ids começam pelo timestamp em ms, então a ordem lexical é a de
+        # criação (mais antigo primeiro)
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(n[:-5] for n in names if n.endswith(".json"))
+
+    def list(self) -> List[Dict]:
+        result = []
+        for profile_id in reversed(self._ids()):
+            meta = self.load(profile_id)
+            if meta is None:
+                continue
+            meta.pop("sql", None)
+            meta.pop("top", None)
+            result.append(meta)
+        return result
+
+    def load(self, profile_id: str) -> Optional[Dict]:
+        if not _ID_RE.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + ".json"),
+                      encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id: str) -> Optional[str]:
+        if not _ID_RE.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + ".prof")
+        return path if os.path.exists(path) else None
+
+
+profiler = RequestProfiler()
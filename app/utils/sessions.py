@@ -0,0 +1,237 @@
+import hashlib
+import pickle
+import random
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+
+from app.utils import db
+from app.models.models import ServerSession
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _storage_key(sid: str) -> str:
+    # o banco/Redis guarda só o hash: um vazamento não expõe sessões ativas
+    return hashlib.sha256(sid.encode()).hexdigest()
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid: Optional[str] = None,
+                 expires_at: Optional[datetime] = None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.loaded_user_id = self.get("_user_id")
+        self.modified = False
+        self.skip = False
+
+
+class MemorySessionStore:
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[Tuple[dict, datetime]]:
+        entry = self._data.get(_storage_key(sid))
+        if entry is None:
+            return None
+        raw, expires_at = entry
+        return pickle.loads(raw), expires_at
+
+    def save(self, sid: str, data: dict, expires_at: datetime) -> None:
+        raw = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[_storage_key(sid)] = (raw, expires_at)
+            if random.random() < 0.01:
+                now = _utcnow()
+                for key in [k for k, (_, exp) in self._data.items()
+                            if exp <= now]:
+                    del self._data[key]
+
+    def touch(self, sid: str, expires_at: datetime) -> None:
+        with self._lock:
+            entry = self._data.get(_storage_key(sid))
+            if entry is not None:
+                self._data[_storage_key(sid)] = (entry[0], expires_at)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._data.pop(_storage_key(sid), None)
+
+
+class RedisSessionStore:
+
+    def __init__(self, url: str, prefix: str = "prodmanager:session:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND=redis requer o pacote 'redis'.")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, sid: str) -> str:
+        return self.prefix + _storage_key(sid)
+
+    def load(self, sid: str) -> Optional[Tuple[dict, datetime]]:
+        raw = self._client.get(self._key(sid))
+        if raw is None:
+            return None
+        return pickle.loads(raw)
+
+    def save(self, sid: str, data: dict, expires_at: datetime) -> None:
+        raw = pickle.dumps((data, expires_at),
+                           protocol=pickle.HIGHEST_PROTOCOL)
+        ttl = max(int((expires_at - _utcnow()).total_seconds()), 1)
+        self._client.setex(self._key(sid), ttl, raw)
+
+    def touch(self, sid: str, expires_at: datetime) -> None:
+        record = self.load(sid)
+        if record is not None:
+            self.save(sid, record[0], expires_at)
+
+    def delete(self, sid: str) -> None:
+        self._client.delete(self._key(sid))
+
+
+class SQLSessionStore:
+    # usa conexões próprias do engine, fora da transação de db.session
+
+    def load(self, sid: str) -> Optional[Tuple[dict, datetime]]:
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(ServerSession.data, ServerSession.expires_at)
+                .where(ServerSession.id == _storage_key(sid))).first()
+        if row is None:
+            return None
+        return pickle.loads(row.data), row.expires_at
+
+    def save(self, sid: str, data: dict, expires_at: datetime) -> None:
+        key = _storage_key(sid)
+        raw = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                update(ServerSession).where(ServerSession.id == key)
+                .values(data=raw, expires_at=expires_at))
+            if result.rowcount == 0:
+                conn.execute(insert(ServerSession).values(
+                    id=key, data=raw, expires_at=expires_at))
+            if random.random() < 0.01:
+                conn.execute(delete(ServerSession)
+                             .where(ServerSession.expires_at <= _utcnow()))
+
+    def touch(self, sid: str, expires_at: datetime) -> None:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(ServerSession)
+                .where(ServerSession.id == _storage_key(sid))
+                .values(expires_at=expires_at))
+
+    def delete(self, sid: str) -> None:
+        with db.engine.begin() as conn:
+            conn.execute(delete(ServerSession)
+                         .where(ServerSession.id == _storage_key(sid)))
+
+
+class ServerSideSessionInterface(SessionInterface):
+    # O cookie guarda só o id aleatório da sessão. Ele é regravado (store +
+    # Set-Cookie) quando a sessão muda ou, para a expiração deslizante, no
+    # máximo uma vez a cada touch_interval.
+
+    def __init__(self, store, touch_interval: timedelta,
+                 skip_prefixes: Tuple[str, ...] = ()):
+        self.store = store
+        self.touch_interval = touch_interval
+        self.skip_prefixes = skip_prefixes
+
+    def open_session(self, app, request):
+        if request.path.startswith(self.skip_prefixes):
+            session = ServerSideSession()
+            session.skip = True
+            return session
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            record = self.store.load(sid)
+            if record is not None and record[1] > _utcnow():
+                return ServerSideSession(record[0], sid=sid,
+                                         expires_at=record[1])
+        return ServerSideSession()
+
+    def save_session(self, app, session, response) -> None:
+        if session.skip:
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=secure, samesite=samesite,
+                                       httponly=httponly)
+            return
+
+        now = _utcnow()
+        lifetime = app.permanent_session_lifetime
+        if session.sid and session.get("_user_id") != session.loaded_user_id:
+            # login/logout troca o id da sessão (evita session fixation)
+            self.store.delete(session.sid)
+            session.sid = None
+        if session.sid is None or session.modified:
+            session.sid = session.sid or secrets.token_urlsafe(32)
+            session.expires_at = now + lifetime
+            self.store.save(session.sid, dict(session), session.expires_at)
+        elif session.expires_at - lifetime + self.touch_interval <= now:
+            session.expires_at = now + lifetime
+            self.store.touch(session.sid, session.expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=session.expires_at.replace(tzinfo=timezone.utc),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            samesite=samesite,
+        )
+        response.vary.add("Cookie")
+
+
+def init_sessions(app) -> None:
+    backend = app.config.get("SESSION_BACKEND", "sqlalchemy")
+    if backend == "sqlalchemy":
+        store = SQLSessionStore()
+    elif backend == "memory":
+        store = MemorySessionStore()
+    elif backend == "redis":
+        store = RedisSessionStore(app.config["SESSION_REDIS_URL"])
+    else:
+        raise RuntimeError(f"SESSION_BACKEND inválido: {backend}")
+    app.session_interface = ServerSideSessionInterface(
+        store,
+        touch_interval=timedelta(
+            seconds=app.config.get("SESSION_TOUCH_INTERVAL", 60)),
+        skip_prefixes=(app.static_url_path + "/", "/api/"),
+    )
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from sqlalchemy import text
+
+
+def reset_after_fork(app) -> None:
+    # conexões herdadas do master (preload) não podem ser usadas pelo filho
+    from app.utils import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    # locks do OIDC podem vir travados por uma thread do master
+    validator = app.extensions.get("oidc_validator")
+    if validator is not None:
+        validator.after_fork()
+
+
+def ensure_schema(app) -> None:
+    # cria tabelas que faltam (bancos novos); alterações vêm do Alembic
+    from app.utils import db
+
+    with app.app_context():
+        db.create_all()
+
+
+def _prime_pool(engine, connections: int) -> None:
+    def ping(_):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    # abre as conexões ao mesmo tempo para que o pool guarde todas
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        list(pool.map(ping, range(connections)))
+
+
+def warm_up(app) -> Dict[str, float]:
+    from app.utils import db
+
+    timings = {}
+
+    started = time.perf_counter()
+    validator = app.extensions.get("oidc_validator")
+    if validator is not None and app.config.get("OIDC_WELL_KNOWN"):
+        try:
+            validator.warm_up()
+        except Exception as e:
+            # o IdP fora do ar não impede o boot; /api responde 503 até voltar
+            print("[WARMUP] OIDC indisponível:", e, flush=True)
+    timings["oidc"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with app.app_context():
+        for engine in db.engines.values():
+            size = getattr(engine.pool, "size", lambda: 1)()
+            _prime_pool(engine, max(min(size,
+                                        app.config.get("WARMUP_DB_CONNECTIONS",
+                                                       4)), 1))
+    timings["db"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for name in app.jinja_env.list_templates():
+        if name.endswith(".html"):
+            app.jinja_env.get_template(name)
+    timings["templates"] = time.perf_counter() - started
+
+    # threads não sobrevivem ao fork: o dispatcher do outbox sobe no worker
+    dispatcher = app.extensions.get("outbox_dispatcher")
+    if dispatcher is not None:
+        dispatcher.start()
+
+    print("[WARMUP]", " ".join(f"{k}={v * 1000:.0f}ms"
+                               for k, v in timings.items()), flush=True)
+    return timings
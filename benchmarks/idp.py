@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+
+from authlib.jose import JsonWebKey, JsonWebToken
+
+
+class StubIdP:
+    # Discovery + JWKS locais: require_oauth valida RS256 de verdade, sem
+    # Keycloak. Os tokens são assinados com a mesma chave publicada no JWKS.
+
+    def __init__(self, kid: str = "bench-key"):
+        self.kid = kid
+        self.key = JsonWebKey.generate_key("RSA", 2048, is_private=True)
+        self.jwks = {"keys": [self.key.as_dict(is_private=False, kid=kid)]}
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self.issuer = f"{self.base_url}/realms/bench"
+        self.well_known = f"{self.issuer}/.well-known/openid-configuration"
+
+    def _handler(self):
+        idp = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                idp.requests += 1
+                if self.path.endswith("/openid-configuration"):
+                    body = {"issuer": idp.issuer,
+                            "jwks_uri": f"{idp.issuer}/certs"}
+                elif self.path.endswith("/certs"):
+                    body = idp.jwks
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubIdP":
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+    def mint(self, audience: str, roles: Iterable[str] = (),
+             ttl: int = 3600, subject: str = "bench") -> str:
+        now = int(time.time())
+        payload = {
+            "iss": self.issuer,
+            "aud": audience,
+            "sub": subject,
+            "iat": now,
+            "exp": now + ttl,
+            "realm_access": {"roles": list(roles)},
+        }
+        header = {"alg": "RS256", "kid": self.kid}
+        return JsonWebToken(["RS256"]).encode(
+            header, payload, self.key).decode()
@@ -0,0 +1,86 @@
+"""Micro-benchmark da serialização de listas de produtos.
+
+Uso:
+    python -m benchmarks.json_serialization --products 100000
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import create_engine, insert, select
+
+from app.models.models import Product
+from app.models.product_models import PRODUCT_FIELDS, _row_to_dict
+from app.utils.fastjson import FastJSONProvider, orjson, rows_encoder
+
+
+def load_rows(n: int):
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    start = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Product.__table__), [
+            {"id": i + 1, "name": f"Produto {i} — edição", "price": 10 + i / 7,
+             "description": f"Descrição do produto {i}", "version": 1,
+             "updated_at": start + timedelta(seconds=i, microseconds=i)}
+            for i in range(n)])
+    with engine.connect() as conn:
+        return conn.execute(select(*[getattr(Product, f)
+                                     for f in PRODUCT_FIELDS])).all()
+
+
+def timeit(fn, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    rows = load_rows(args.products)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    encode = rows_encoder(PRODUCT_FIELDS)
+
+    def baseline():
+        # caminho antigo: dict por linha + jsonify com a stdlib
+        items = [_row_to_dict(row, PRODUCT_FIELDS) for row in rows]
+        return default.dumps({"items": items},
+                             separators=(",", ":")).encode()
+
+    def fast_dicts():
+        items = [_row_to_dict(row, PRODUCT_FIELDS) for row in rows]
+        return fast.dumps_bytes({"items": items})
+
+    def row_bytes():
+        return b'{"items":%b}' % encode(rows)
+
+    reference = json.loads(baseline())
+    for fn in (fast_dicts, row_bytes):
+        assert json.loads(fn()) == reference, fn.__name__
+
+    print(f"{args.products} produtos, encoder: "
+          f"{'orjson' if orjson else 'stdlib'}, mediana de {args.repeat}")
+    base = timeit(baseline, args.repeat)
+    for name, fn in (("stdlib + dict por linha", baseline),
+                     ("FastJSONProvider + dicts", fast_dicts),
+                     ("linhas -> bytes", row_bytes)):
+        elapsed = base if fn is baseline else timeit(fn, args.repeat)
+        print(f"  {name:26} {elapsed * 1000:8.1f} ms  "
+              f"{base / elapsed:5.2f}x  {len(fn()) / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Micro-benchmark da reprecificação do catálogo em lote.
+
+Uso:
+    python -m benchmarks.pricing --products 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app import domain_services
+from app.domain_services import CachedPriceRules, PriceCalculator, ProductDTO
+
+
+class SlowRules:
+    # simula uma fonte de regras com custo por consulta (banco/serviço)
+    def __init__(self, rules: dict[str, float], cost: float):
+        self.rules = rules
+        self.cost = cost
+        self.calls = 0
+
+    def discount_for(self, product_name: str) -> float:
+        self.calls += 1
+        deadline = time.perf_counter() + self.cost
+        while time.perf_counter() < deadline:
+            pass
+        return self.rules.get(product_name, 0.0)
+
+
+def make_catalog(n: int, names: int, seed: int = 42):
+    rnd = random.Random(seed)
+    pool = [f"Produto {i}" for i in range(names)]
+    rules = {name: rnd.choice((0.05, 0.10, 0.15, 0.30, 0.50))
+             for name in pool[::3]}
+    products = [ProductDTO(id=i + 1, name=rnd.choice(pool),
+                           price=round(rnd.uniform(1, 10000), 2))
+                for i in range(n)]
+    return rules, products
+
+
+def timeit(fn, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--names", type=int, default=5000)
+    parser.add_argument("--rule-cost-us", type=float, default=5.0,
+                        help="custo simulado de cada discount_for")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rules, products = make_catalog(args.products, args.names)
+    cost = args.rule_cost_us / 1e6
+
+    def per_product():
+        calc = PriceCalculator(rules=SlowRules(rules, cost))
+        return [calc.final_price(p) for p in products]
+
+    def batch():
+        return PriceCalculator(rules=SlowRules(rules, cost)) \
+            .final_prices(products)
+
+    cached = CachedPriceRules(SlowRules(rules, cost))
+    cached_calc = PriceCalculator(rules=cached)
+    cached_calc.final_prices(products)  # aquece o cache
+
+    def batch_cached():
+        return cached_calc.final_prices(products)
+
+    reference = per_product()
+    for fn in (batch, batch_cached):
+        assert fn() == reference, fn.__name__
+
+    engine = "numpy" if domain_services.np is not None else "python puro"
+    print(f"{args.products} produtos, {args.names} nomes, regra "
+          f"{args.rule_cost_us:g} µs/consulta, motor: {engine}, "
+          f"mediana de {args.repeat}")
+    base = timeit(per_product, args.repeat)
+    for name, fn in (("final_price por produto", per_product),
+                     ("final_prices", batch),
+                     ("final_prices + cache", batch_cached)):
+        elapsed = base if fn is per_product else timeit(fn, args.repeat)
+        print(f"  {name:24} {elapsed * 1000:9.1f} ms  "
+              f"{args.products / elapsed / 1e6:6.2f} M/s  "
+              f"{base / elapsed:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""Benchmark das rotas HTML e API do ProdManager.
+
+Uso:
+    python -m benchmarks.run --products 100000 --clients 8 --requests 400
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from benchmarks.idp import StubIdP
+
+AUDIENCE = "prodmanager-api"
+BENCH_USER = ("bench", "bench@example.com", "bench-password")
+SEED_BATCH = 10000
+
+
+class Scenario:
+
+    def __init__(self, name, method, path, auth=None, body=None,
+                 expect=(200,)):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.auth = auth
+        self.body = body
+        self.expect = expect
+
+
+def build_scenarios(n_products: int, state: dict):
+    def some_id():
+        return random.randint(1, n_products)
+
+    def form(make):
+        return lambda: ("application/x-www-form-urlencoded",
+                        urlencode(make()))
+
+    def json_body(make):
+        return lambda: ("application/json", json.dumps(make()))
+
+    def new_product():
+        return {"name": f"Bench {next(state['seq'])}",
+                "price": round(random.uniform(1, 1000), 2),
+                "description": "benchmark"}
+
+    def pop_created():
+        with state["lock"]:
+            return state["created"].pop() if state["created"] else some_id()
+
+    def new_user():
+        n = next(state["seq"])
+        return {"username": f"user{n}", "email": f"user{n}@example.com",
+                "password": "senha-benchmark"}
+
+    return [
+        Scenario("html_index", "GET", lambda: "/"),
+        Scenario("html_login_form", "GET", lambda: "/login"),
+        Scenario("html_login", "POST", lambda: "/login",
+                 body=form(lambda: {"username": BENCH_USER[0],
+                                    "password": BENCH_USER[2]}),
+                 expect=(302,)),
+        Scenario("html_register", "POST", lambda: "/cadastro",
+                 body=form(new_user),
+                 expect=(302,)),
+        Scenario("html_products", "GET", lambda: "/produtos", auth="session"),
+        Scenario("html_products_search", "GET",
+                 lambda: "/produtos?q=produto+" + str(some_id() % 97),
+                 auth="session"),
+        Scenario("html_product_detail", "GET",
+                 lambda: f"/produtos/{some_id()}", auth="session"),
+        Scenario("html_product_new_form", "GET", lambda: "/produtos/novo",
+                 auth="session"),
+        Scenario("html_product_create", "POST", lambda: "/produtos/novo",
+                 auth="session",
+                 body=form(new_product),
+                 expect=(302,)),
+        Scenario("html_product_edit_form", "GET",
+                 lambda: f"/produtos/{some_id()}/editar", auth="session"),
+        Scenario("api_list", "GET", lambda: "/api/produtos?limit=50",
+                 auth="bearer"),
+        Scenario("api_list_filtered", "GET",
+                 lambda: "/api/produtos?limit=50&sort=price&min_price=100",
+                 auth="bearer"),
+        Scenario("api_get", "GET", lambda: f"/api/produtos/{some_id()}",
+                 auth="bearer"),
+        Scenario("api_search", "GET",
+                 lambda: "/api/produtos/search?q=produto+" +
+                 str(some_id() % 97),
+                 auth="bearer"),
+        Scenario("api_changes", "GET", lambda: "/api/produtos/changes",
+                 auth="bearer"),
+        Scenario("api_create", "POST", lambda: "/api/produtos",
+                 auth="bearer", body=json_body(new_product),
+                 expect=(201,)),
+        Scenario("api_update", "PUT", lambda: f"/api/produtos/{some_id()}",
+                 auth="bearer",
+                 body=json_body(new_product)),
+        Scenario("api_bulk", "POST", lambda: "/api/produtos/bulk",
+                 auth="bearer",
+                 body=json_body(lambda: [new_product() for _ in range(50)])),
+        Scenario("api_delete", "DELETE",
+                 lambda: f"/api/produtos/{pop_created()}", auth="bearer",
+                 expect=(204, 404)),
+    ]
+
+
+def seed(app, n_products: int) -> None:
+    from sqlalchemy import insert
+    from app.utils import db
+    from app.models.models import Product
+    from app.models.user_models import register_user
+
+    with app.app_context():
+        db.create_all()
+        register_user(username=BENCH_USER[0], email=BENCH_USER[1],
+                      password=BENCH_USER[2])
+        done = 0
+        while done < n_products:
+            batch = [{"name": f"Produto {i % 97} item {i}",
+                      "price": round((i * 7919) % 100000 / 100 + 1, 2),
+                      "description": f"Descrição do produto {i}"}
+                     for i in range(done, min(done + SEED_BATCH, n_products))]
+            with db.engine.begin() as conn:
+                conn.execute(insert(Product.__table__), batch)
+            done += len(batch)
+            print(f"[seed] {done}/{n_products}", end="\r", flush=True)
+        print()
+
+
+class Client:
+    # uma conexão keep-alive por cliente; cookie de sessão guardado à mão
+
+    def __init__(self, port: int, token: str):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.token = token
+        self.cookie = None
+
+    def request(self, method, path, body=None, auth=None):
+        headers = {}
+        if auth == "bearer":
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self.cookie and auth != "bearer":
+            headers["Cookie"] = self.cookie
+        payload = None
+        if body is not None:
+            content_type, payload = body()
+            headers["Content-Type"] = content_type
+        self.conn.request(method, path, body=payload, headers=headers)
+        resp = self.conn.getresponse()
+        data = resp.read()
+        cookie = resp.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        return resp.status, data
+
+    def login(self):
+        status, _ = self.request(
+            "POST", "/login",
+            body=lambda: ("application/x-www-form-urlencoded", urlencode(
+                {"username": BENCH_USER[0], "password": BENCH_USER[2]})))
+        if status != 302:
+            raise RuntimeError(f"login do benchmark falhou: {status}")
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def run_scenario(scenario, clients, total: int, warmup: int,
+                 state: dict) -> dict:
+    def worker(client, count, latencies, errors):
+        for _ in range(count):
+            start = time.perf_counter()
+            status, data = client.request(scenario.method, scenario.path(),
+                                          scenario.body, scenario.auth)
+            latencies.append(time.perf_counter() - start)
+            if status not in scenario.expect:
+                errors.append(status)
+            elif scenario.name == "api_create":
+                with state["lock"]:
+                    state["created"].append(json.loads(data)["id"])
+
+    # aquecimento (não entra nas métricas)
+    worker(clients[0], warmup, [], [])
+
+    per_client = [total // len(clients)] * len(clients)
+    for i in range(total % len(clients)):
+        per_client[i] += 1
+    latencies, errors = [], []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        for fut in [pool.submit(worker, c, n, latencies, errors)
+                    for c, n in zip(clients, per_client)]:
+            fut.result()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = 1000.0
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_statuses": sorted(set(errors)),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * ms, 3),
+        "p90_ms": round(percentile(latencies, 90) * ms, 3),
+        "p99_ms": round(percentile(latencies, 99) * ms, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * ms, 3),
+        "max_ms": round(latencies[-1] * ms, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    base = baseline.get("results", {})
+    print(f"\n{'cenário':28} {'p50':>16} {'p99':>16} {'req/s':>16}")
+    for name, cur in results["results"].items():
+        old = base.get(name)
+        if old is None:
+            continue
+        row = []
+        for key, worse in (("p50_ms", 1), ("p99_ms", 1),
+                           ("throughput_rps", -1)):
+            delta = (cur[key] - old[key]) / old[key] if old[key] else 0.0
+            row.append(f"{cur[key]:>8} ({delta:+.0%})")
+            if delta * worse > threshold:
+                regressions.append(f"{name}.{key}: {old[key]} -> {cur[key]}")
+        print(f"{name:28} " + " ".join(f"{c:>16}" for c in row))
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1000,
+                        help="produtos semeados (ex.: 1000, 100000, 1000000)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requisições medidas por cenário")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", action="append", default=[],
+                        help="roda só cenários cujo nome contém o texto")
+    parser.add_argument("--out", help="arquivo JSON de resultados")
+    parser.add_argument("--baseline", help="compara com este resultado")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="piora relativa tolerada (0.15 = 15%%)")
+    parser.add_argument("--save-baseline",
+                        help="grava o resultado também como baseline")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    workdir = tempfile.mkdtemp(prefix="prodmanager-bench-")
+    idp = StubIdP().start()
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "OIDC_WELL_KNOWN": idp.well_known,
+        "OIDC_AUDIENCE": AUDIENCE,
+        "OIDC_CACHE_DIR": os.path.join(workdir, "oidc"),
+        "OIDC_PREFETCH": "true",
+    })
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app.utils import create_app
+
+    app = create_app()
+    seed(app, args.products)
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True,
+                         request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    token = idp.mint(AUDIENCE, roles=["products:write"])
+    clients = [Client(port, token) for _ in range(args.clients)]
+    for client in clients:
+        client.login()
+
+    state = {"seq": itertools.count(), "created": [],
+             "lock": threading.Lock()}
+    scenarios = [s for s in build_scenarios(args.products, state)
+                 if not args.only or any(o in s.name for o in args.only)]
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "products": args.products,
+            "clients": args.clients,
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": {},
+    }
+    for scenario in scenarios:
+        stats = run_scenario(scenario, clients, args.requests, args.warmup,
+                             state)
+        results["results"][scenario.name] = stats
+        print(f"[bench] {scenario.name:28} p50={stats['p50_ms']:>9}ms "
+              f"p99={stats['p99_ms']:>9}ms {stats['throughput_rps']:>8} "
+              f"req/s erros={stats['errors']}", flush=True)
+    results["meta"]["idp_requests"] = idp.requests
+
+    server.shutdown()
+    idp.stop()
+
+    out = args.out or os.path.join(
+        os.path.dirname(__file__), "results",
+        datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    for path in filter(None, (out, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"[bench] resultados em {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("products") != args.products:
+            print("[bench] aviso: baseline com outro número de produtos")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n[bench] regressões acima de "
+                  f"{args.threshold:.0%}:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\n[bench] sem regressões")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
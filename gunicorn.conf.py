@@ -0,0 +1,59 @@
+# Configuração de produção: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Com preload_app a aplicação é importada uma vez no master e compartilhada
+# com os workers (copy-on-write). Reload gracioso de código: `kill -USR2
+# <master>` sobe um novo master com o código novo; depois `kill -TERM` no
+# master antigo. `kill -HUP` recicla os workers (reaproveita o código
+# carregado quando preload está ligado).
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS",
+                        multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# a aplicação usa para saber se caches em memória são compartilhados
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "gthread" if threads > 1 else "sync"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in (
+    "1", "true", "yes", "on")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+
+if preload_app:
+    # sem threads de prefetch do OIDC no master: um fork no meio da busca
+    # copiaria locks travados. Cada worker carrega discovery e JWKS em
+    # post_worker_init (warm_up).
+    os.environ.setdefault("OIDC_PREFETCH", "false")
+    # idem para o dispatcher do outbox: sobe em cada worker (warm_up)
+    os.environ.setdefault("OUTBOX_AUTOSTART", "false")
+
+
+create_schema = os.getenv("GUNICORN_CREATE_SCHEMA", "true").lower() in (
+    "1", "true", "yes", "on")
+
+
+def when_ready(server):
+    # uma vez no master, antes de subir os workers
+    if create_schema:
+        from app.utils.warmup import ensure_schema
+
+        ensure_schema(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    from app.utils.warmup import reset_after_fork
+
+    reset_after_fork(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    # roda no worker antes de ele aceitar conexões
+    from app.utils.warmup import warm_up
+
+    warm_up(worker.wsgi)
@@ -0,0 +1,43 @@
+"""produtos.version e produtos.updated_at
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    # bancos criados por db.create_all() já podem ter as colunas
+    columns = _columns("produtos")
+    if "version" not in columns:
+        op.add_column("produtos", sa.Column(
+            "version", sa.Integer(), nullable=False, server_default="1"))
+    if "updated_at" not in columns:
+        op.add_column("produtos", sa.Column(
+            "updated_at", sa.DateTime(), nullable=True))
+        op.execute("UPDATE produtos SET updated_at = CURRENT_TIMESTAMP")
+        with op.batch_alter_table("produtos") as batch:
+            batch.alter_column(
+                "updated_at", existing_type=sa.DateTime(), nullable=False,
+                server_default=sa.func.current_timestamp())
+        op.create_index("ix_produtos_updated_at", "produtos", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_produtos_updated_at", table_name="produtos")
+    with op.batch_alter_table("produtos") as batch:
+        batch.drop_column("updated_at")
+        batch.drop_column("version")
@@ -0,0 +1,60 @@
+"""índice de busca em produtos (FTS5 no SQLite, GIN no PostgreSQL)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5("
+    "name, description, content='produtos', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS produtos_fts_ai AFTER INSERT ON produtos "
+    "BEGIN INSERT INTO produtos_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_fts_ad AFTER DELETE ON produtos "
+    "BEGIN INSERT INTO produtos_fts(produtos_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS produtos_fts_au "
+    "AFTER UPDATE OF name, description ON produtos "
+    "BEGIN INSERT INTO produtos_fts(produtos_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO produtos_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild')",
+]
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS produtos_fts_au",
+    "DROP TRIGGER IF EXISTS produtos_fts_ad",
+    "DROP TRIGGER IF EXISTS produtos_fts_ai",
+    "DROP TABLE IF EXISTS produtos_fts",
+]
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_produtos_search ON produtos "
+            "USING gin (to_tsvector('simple', "
+            "name || ' ' || coalesce(description, '')))")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_produtos_search")
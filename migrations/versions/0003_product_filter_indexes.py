@@ -0,0 +1,26 @@
+"""índices em produtos.price e produtos.name
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_produtos_price", "produtos", ["price"],
+                    if_not_exists=True)
+    op.create_index("ix_produtos_name", "produtos", ["name"],
+                    if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_produtos_name", table_name="produtos")
+    op.drop_index("ix_produtos_price", table_name="produtos")
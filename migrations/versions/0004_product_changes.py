@@ -0,0 +1,35 @@
+"""produtos_changes: log de alterações para o feed incremental
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "produtos_changes",
+        sa.Column("seq", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=10), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=False),
+        sqlite_autoincrement=True,
+        if_not_exists=True,
+    )
+    op.create_index("ix_produtos_changes_product_id", "produtos_changes",
+                    ["product_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_produtos_changes_product_id",
+                  table_name="produtos_changes")
+    op.drop_table("produtos_changes")
@@ -0,0 +1,41 @@
+"""outbox: notificações pendentes de entrega
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("subject", sa.String(length=200), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("key", sa.String(length=200), nullable=True),
+        sa.Column("status", sa.String(length=10), nullable=False,
+                  server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False,
+                  server_default="0"),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sqlite_autoincrement=True,
+        if_not_exists=True,
+    )
+    op.create_index("ix_outbox_status_available_at", "outbox",
+                    ["status", "available_at"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_status_available_at", table_name="outbox")
+    op.drop_table("outbox")
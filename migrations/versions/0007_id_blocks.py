@@ -0,0 +1,28 @@
+"""id_blocks: reserva de IDs em blocos (hi/lo)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "id_blocks",
+        sa.Column("name", sa.String(length=50), primary_key=True),
+        sa.Column("next_value", sa.BigInteger(), nullable=False),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("id_blocks")
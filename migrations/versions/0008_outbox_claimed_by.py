@@ -0,0 +1,34 @@
+"""outbox.claimed_by: claim atômico com UPDATE + token
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    # bancos criados por db.create_all() já podem ter a coluna
+    if "claimed_by" not in _columns("outbox"):
+        op.add_column("outbox", sa.Column(
+            "claimed_by", sa.String(length=32), nullable=True))
+    op.create_index("ix_outbox_claimed_by", "outbox", ["claimed_by"],
+                    if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_outbox_claimed_by", table_name="outbox")
+    with op.batch_alter_table("outbox") as batch:
+        batch.drop_column("claimed_by")
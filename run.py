@@ -1,10 +1,15 @@
+import os
+
 from app.utils import create_app, db
 from app.models.models import User
 
 app = create_app()
 
-with app.app_context():
-    db.create_all()
-
+# servidor de desenvolvimento; em produção use
+# gunicorn -c gunicorn.conf.py wsgi:app
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    with app.app_context():
+        db.create_all()
+    app.run(host="0.0.0.0", port=5000,
+            debug=os.getenv('FLASK_DEBUG', 'true').lower() in (
+                '1', 'true', 'yes', 'on'))
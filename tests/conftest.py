@@ -0,0 +1,77 @@
+import pytest
+
+from benchmarks.idp import StubIdP
+
+AUDIENCE = "prodmanager-api"
+
+
+@pytest.fixture(scope="session")
+def idp():
+    # discovery + JWKS locais: require_oauth valida RS256 de verdade
+    stub = StubIdP(kid="test-key").start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch, idp):
+    # cada teste ganha um SQLite próprio; env sobrescreve a configuração
+    def factory(**env):
+        settings = {
+            "DATABASE_URL": f"sqlite:///{tmp_path / 'test.db'}",
+            "SECRET_KEY": "test-secret",
+            "OIDC_WELL_KNOWN": idp.well_known,
+            "OIDC_AUDIENCE": AUDIENCE,
+            "OIDC_CACHE_DIR": str(tmp_path / "oidc"),
+            "OIDC_PREFETCH": "false",
+            "PASSWORD_HASH_WORKERS": "0",
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+            "PROFILING_DIR": str(tmp_path / "profiles"),
+            **env,
+        }
+        for key, value in settings.items():
+            monkeypatch.setenv(key, str(value))
+
+        from app.utils import create_app, db
+
+        app = create_app()
+        app.config["TESTING"] = True
+        with app.app_context():
+            # db é global: binds de apps anteriores (ex.: réplica) continuam
+            # registrados em db.metadatas
+            db.create_all(bind_key=None)
+        return app
+
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(idp):
+    def headers(*roles, ttl=3600):
+        token = idp.mint(AUDIENCE, roles, ttl=ttl)
+        return {"Authorization": f"Bearer {token}"}
+
+    return headers
+
+
+@pytest.fixture
+def login(client):
+    # cadastro já autentica: a sessão fica no cookie do client
+    def register(username="maria", password="segredo123"):
+        response = client.post("/cadastro", data={
+            "username": username, "email": f"{username}@example.com",
+            "password": password})
+        assert response.status_code == 302
+        return client
+
+    return register
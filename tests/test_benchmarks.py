@@ -0,0 +1,50 @@
+import itertools
+import random
+import threading
+
+from benchmarks.run import (
+    BENCH_USER, build_scenarios, compare, percentile, seed
+)
+
+
+def test_every_scenario_gets_an_expected_status(app, client, auth):
+    random.seed(1)
+    seed(app, 50)
+    assert client.post("/login", data={
+        "username": BENCH_USER[0],
+        "password": BENCH_USER[2]}).status_code == 302
+    bearer = auth("products:write")
+    state = {"seq": itertools.count(), "created": [],
+             "lock": threading.Lock()}
+
+    for scenario in build_scenarios(50, state):
+        kwargs = {"headers": bearer if scenario.auth == "bearer" else {}}
+        if scenario.body is not None:
+            content_type, kwargs["data"] = scenario.body()
+            kwargs["content_type"] = content_type
+        response = client.open(scenario.path(), method=scenario.method,
+                               **kwargs)
+        assert response.status_code in scenario.expect, scenario.name
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 99) == 0.0
+
+
+def test_compare_reports_only_regressions_above_threshold():
+    old = {"p50_ms": 10.0, "p99_ms": 20.0, "throughput_rps": 100.0}
+    baseline = {"results": {"api_list": old, "api_get": old}}
+    results = {"results": {
+        "api_list": {"p50_ms": 11.0, "p99_ms": 21.0, "throughput_rps": 95.0},
+        "api_get": {"p50_ms": 10.0, "p99_ms": 30.0, "throughput_rps": 70.0},
+        "api_novo": old,
+    }}
+
+    assert compare(results, baseline, threshold=0.15) == [
+        "api_get.p99_ms: 20.0 -> 30.0",
+        "api_get.throughput_rps: 100.0 -> 70.0",
+    ]
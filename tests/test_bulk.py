@@ -0,0 +1,109 @@
+from app.models.models import Product, ProductChange
+from app.models.product_models import bulk_upsert_products, create_product
+from app.utils import db
+from app.utils.ids import product_ids
+
+
+def test_bulk_rejects_unknown_id_inside_reserved_block(app):
+    with app.app_context():
+        first = create_product({"name": "Primeiro", "price": 1.0})
+        # o próximo ID do bloco deste processo, escolhido pelo cliente
+        result = bulk_upsert_products(
+            [{"id": first["id"] + 1, "name": "Intruso", "price": 2.0}])
+
+        assert result["created"] == 0
+        assert result["results"][0]["status"] == "error"
+
+        second = create_product({"name": "Segundo", "price": 3.0})
+        assert second["id"] == first["id"] + 1
+        assert Product.query.count() == 2
+
+
+def test_bulk_creates_with_allocated_ids(app):
+    with app.app_context():
+        existing = create_product({"name": "Existente", "price": 1.0})
+        result = bulk_upsert_products([
+            {"name": "Novo A", "price": 2.0},
+            {"name": "Novo B", "price": 3.0},
+        ])
+
+        created = [r["id"] for r in result["results"]]
+        assert result["created"] == 2
+        assert existing["id"] not in created
+        assert len(set(created)) == 2
+        assert product_ids.stats()["reservations"] >= 1
+
+
+def test_bulk_reports_each_item(app):
+    with app.app_context():
+        keep = create_product({"name": "Mantido", "price": 1.0})
+        edit = create_product({"name": "Editado", "price": 2.0})
+        gone = create_product({"name": "Removido", "price": 3.0})
+
+        result = bulk_upsert_products([
+            {"name": "Criado", "price": 4.0},
+            {"id": edit["id"], "price": 2.5},
+            {"op": "delete", "id": gone["id"]},
+            {"id": keep["id"]},
+            {"name": "Sem preço"},
+            {"id": edit["id"], "name": "Repetido"},
+            {"op": "delete"},
+            "lixo",
+        ])
+
+        statuses = [r["status"] for r in result["results"]]
+        assert statuses == ["created", "updated", "deleted", "unchanged",
+                            "error", "error", "error", "error"]
+        assert (result["created"], result["updated"], result["unchanged"],
+                result["deleted"], result["errors"]) == (1, 1, 1, 1, 4)
+        assert db.session.get(Product, edit["id"]).price == 2.5
+        assert db.session.get(Product, gone["id"]) is None
+
+
+def test_bulk_id_only_item_emits_no_change(app):
+    with app.app_context():
+        product = create_product({"name": "Parado", "price": 1.0})
+        before = ProductChange.query.count()
+
+        result = bulk_upsert_products([{"id": product["id"]}])
+
+        assert result["results"][0]["status"] == "unchanged"
+        assert ProductChange.query.count() == before
+        assert db.session.get(Product, product["id"]).version == 1
+
+
+def test_bulk_endpoint_requires_write_role(client, auth):
+    body = {"items": [{"name": "X", "price": 1.0}]}
+
+    assert client.post("/api/produtos/bulk", json=body).status_code == 401
+    assert client.post("/api/produtos/bulk", json=body,
+                       headers=auth("products:read")).status_code == 403
+    assert client.post("/api/produtos/bulk", json={"items": 1},
+                       headers=auth("products:write")).status_code == 400
+
+    response = client.post("/api/produtos/bulk", json=body,
+                           headers=auth("products:write"))
+    assert response.status_code == 200
+    assert response.get_json()["created"] == 1
+
+
+def test_bulk_rejects_bad_types_per_item(app, client, auth):
+    response = client.post("/api/produtos/bulk",
+                           headers=auth("products:write"), json={"items": [
+                               {"name": "Válido", "price": 1.0},
+                               {"op": 5, "name": "Op numérica", "price": 1.0},
+                               {"name": 123, "price": 1.0},
+                               {"name": "Descrição objeto", "price": 1.0,
+                                "description": {"texto": "x"}},
+                               {"name": "Outro válido", "price": 2.0,
+                                "description": "ok"},
+                           ]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r["status"] for r in body["results"]] == [
+        "created", "error", "error", "error", "created"]
+    assert [r.get("error") for r in body["results"][1:4]] == [
+        "Operação inválida.", "Nome inválido.", "Descrição inválida."]
+    with app.app_context():
+        assert Product.query.count() == 2
@@ -0,0 +1,82 @@
+import threading
+
+from app.utils.cache import LRUCache, ProductCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_product_cache_invalidation_drops_item_and_lists():
+    cache = ProductCache()
+    cache.backend = LRUCache(maxsize=100, ttl=60)
+    cache.set_product(1, {"id": 1, "name": "A"})
+    cache.set_list([{"id": 1}], "page", 50, None, None)
+
+    cache.invalidate(1)
+
+    assert cache.get_product(1) is None
+    assert cache.get_list("page", 50, None, None) is None
+
+
+def test_list_set_after_write_goes_to_old_generation():
+    cache = ProductCache()
+    cache.backend = LRUCache(maxsize=100, ttl=60)
+    generation = cache.generation()
+    # uma escrita termina entre a consulta e o set
+    cache.invalidate(1)
+    cache.set_list([{"id": 1, "name": "antigo"}], "page", 50,
+                   generation=generation)
+
+    assert cache.get_list("page", 50) is None
+
+
+def test_product_set_after_write_is_discarded():
+    cache = ProductCache()
+    cache.backend = LRUCache(maxsize=100, ttl=60)
+    generation = cache.generation()
+    cache.invalidate(1)
+    cache.set_product(1, {"id": 1, "name": "antigo"}, generation=generation)
+
+    assert cache.get_product(1) is None
+
+
+def test_memory_backend_ttl_is_capped_with_several_workers():
+    class App:
+        config = {"PRODUCT_CACHE_BACKEND": "memory", "PRODUCT_CACHE_TTL": 60,
+                  "PRODUCT_CACHE_LOCAL_TTL": 5, "WEB_CONCURRENCY": 4}
+
+    cache = ProductCache()
+    cache.init_app(App)
+
+    assert cache.backend.ttl == 5
+
+
+def test_write_racing_a_product_set_never_leaves_it_stale(monkeypatch):
+    cache = ProductCache()
+    cache.backend = LRUCache(maxsize=100, ttl=60)
+    generation = cache.generation()
+    store = cache.backend._set
+    writer = threading.Thread(target=cache.invalidate, args=(1,))
+
+    def set_while_writing(*args):
+        # o commit termina e invalida no meio do set
+        writer.start()
+        store(*args)
+
+    monkeypatch.setattr(cache.backend, "_set", set_while_writing)
+    cache.set_product(1, {"id": 1, "name": "antigo"}, generation=generation)
+    writer.join()
+
+    assert cache.get_product(1) is None
+    assert not cache.backend.set_if_counter(
+        cache.GENERATION_KEY, generation, "product:1", {"id": 1})
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from app.models.product_models import (
+    create_product, delete_product, update_product
+)
+
+
+def _changes(client, auth, **params):
+    response = client.get("/api/produtos/changes", headers=auth(),
+                          query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_feed_replays_writes_in_order(app, client, auth):
+    with app.app_context():
+        kept = create_product({"name": "Mantido", "price": 1.0})
+        gone = create_product({"name": "Removido", "price": 2.0})
+        update_product(kept["id"], {"name": "Mantido", "price": 1.5})
+        delete_product(gone["id"])
+
+    first = _changes(client, auth, limit=3)
+    assert [c["op"] for c in first["changes"]] == ["upsert"] * 3
+    assert first["has_more"] is True
+    # o feed traz o estado atual do produto, não o da época da escrita
+    assert first["changes"][0]["product"]["price"] == 1.5
+
+    rest = _changes(client, auth, since=first["next"])
+    assert [(c["op"], c["id"], c["product"]) for c in rest["changes"]] == [
+        ("delete", gone["id"], None)]
+    assert rest["has_more"] is False
+    assert _changes(client, auth, since=rest["next"])["changes"] == []
+
+
+def test_export_token_starts_the_feed_after_the_snapshot(app, client, auth):
+    with app.app_context():
+        create_product({"name": "Antes", "price": 1.0})
+    token = client.get("/api/produtos/export",
+                       headers=auth()).headers["X-Change-Token"]
+    with app.app_context():
+        after = create_product({"name": "Depois", "price": 1.0})
+
+    changes = _changes(client, auth, since=token)["changes"]
+    assert [c["id"] for c in changes] == [after["id"]]
+
+
+def test_long_poll_wakes_up_on_commit(app, client, auth):
+    token = _changes(client, auth)["next"]
+
+    def write():
+        time.sleep(0.3)
+        with app.app_context():
+            create_product({"name": "Novo", "price": 1.0})
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    started = time.monotonic()
+    feed = _changes(client, auth, since=token, wait=10)
+    writer.join()
+
+    assert [c["product"]["name"] for c in feed["changes"]] == ["Novo"]
+    assert time.monotonic() - started < 5
+
+
+def test_invalid_since_is_rejected(client, auth):
+    response = client.get("/api/produtos/changes?since=lixo", headers=auth())
+    assert response.status_code == 400
+    assert "error" in response.get_json()
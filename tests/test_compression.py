@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(COMPRESSION_MIN_SIZE="0", PRODUCT_CACHE_BACKEND="none")
+
+
+def _list(client, headers):
+    return client.get("/api/produtos",
+                      headers={**headers, "Accept-Encoding": "gzip"})
+
+
+def test_cache_hit_keeps_the_weak_etag(client, auth):
+    client.post("/api/produtos", headers=auth("products:write"),
+                json={"name": "Comprimido", "price": 1.0})
+
+    miss = _list(client, auth())
+    hit = _list(client, auth())
+
+    assert miss.headers["Content-Encoding"] == "gzip"
+    assert hit.headers["Content-Encoding"] == "gzip"
+    assert miss.headers["ETag"].startswith('W/"')
+    assert hit.headers["ETag"] == miss.headers["ETag"]
+    assert hit.headers["Last-Modified"] == miss.headers["Last-Modified"]
+    assert hit.data == miss.data
+
+
+def test_matching_weak_etag_returns_304(client, auth):
+    etag = _list(client, auth()).headers["ETag"]
+
+    response = client.get("/api/produtos",
+                          headers={**auth(), "If-None-Match": etag,
+                                   "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 304
+
+
+def test_identity_response_is_not_compressed(client, auth):
+    response = client.get("/api/produtos",
+                          headers={**auth(), "Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_gzip_body_decodes_to_the_identity_body(client, auth):
+    client.post("/api/produtos", headers=auth("products:write"),
+                json={"name": "Comprimido", "price": 1.0})
+
+    plain = client.get("/api/produtos", headers=auth())
+    packed = _list(client, auth())
+
+    assert json.loads(gzip.decompress(packed.data)) == plain.get_json()
+
+
+def test_small_and_streamed_responses_are_sent_as_is(make_app, auth):
+    client = make_app(COMPRESSION_MIN_SIZE="100000").test_client()
+
+    assert "Content-Encoding" not in _list(client, auth()).headers
+    export = client.get("/api/produtos/export",
+                        headers={**auth(), "Accept-Encoding": "gzip"})
+    assert export.is_streamed
+    assert "Content-Encoding" not in export.headers
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from app.models.models import Product, ProductChange, _utcnow
+from app.models.product_models import create_product, delete_product
+from app.utils import db
+
+
+def test_product_etag_returns_304_until_updated(app, client, auth):
+    with app.app_context():
+        product = create_product({"name": "Cadeira", "price": 10.0})
+    url = f"/api/produtos/{product['id']}"
+
+    first = client.get(url, headers=auth())
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Last-Modified"]
+
+    cached = client.get(url, headers={**auth(), "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.get_data() == b""
+
+    updated = client.put(url, headers=auth("products:write"),
+                         json={"name": "Cadeira", "price": 12.0})
+    assert updated.status_code == 200
+    changed = client.get(url, headers={**auth(), "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_list_etag_depends_on_query_and_catalog(app, client, auth):
+    with app.app_context():
+        create_product({"name": "Mesa", "price": 50.0})
+
+    etag = client.get("/api/produtos", headers=auth()).headers["ETag"]
+    assert client.get("/api/produtos", headers={
+        **auth(), "If-None-Match": etag}).status_code == 304
+    assert client.get("/api/produtos?limit=1", headers={
+        **auth(), "If-None-Match": etag}).status_code == 200
+
+    with app.app_context():
+        create_product({"name": "Banco", "price": 20.0})
+    assert client.get("/api/produtos", headers={
+        **auth(), "If-None-Match": etag}).status_code == 200
+
+
+def test_if_modified_since_uses_last_modified(app, client, auth):
+    with app.app_context():
+        product = create_product({"name": "Sofá", "price": 900.0})
+    url = f"/api/produtos/{product['id']}"
+
+    last_modified = client.get(url, headers=auth()).headers["Last-Modified"]
+    assert client.get(url, headers={
+        **auth(), "If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={
+        **auth(), "If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT",
+    }).status_code == 200
+
+
+def test_list_last_modified_moves_on_delete(app, client, auth):
+    with app.app_context():
+        older = create_product({"name": "Antigo", "price": 1.0})
+        create_product({"name": "Recente", "price": 2.0})
+        # escritas de uma hora atrás: o delete cai em outro segundo
+        an_hour_ago = _utcnow() - timedelta(hours=1)
+        db.session.execute(update(Product).values(updated_at=an_hour_ago))
+        db.session.execute(
+            update(ProductChange).values(changed_at=an_hour_ago))
+        db.session.commit()
+
+    last_modified = client.get("/api/produtos",
+                               headers=auth()).headers["Last-Modified"]
+    with app.app_context():
+        delete_product(older["id"])
+
+    response = client.get("/api/produtos", headers={
+        **auth(), "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert [p["name"] for p in response.get_json()["items"]] == ["Recente"]
@@ -1,7 +1,9 @@
 import math
+import pytest
 from app.domain_services import (
-    ProductDTO, PriceCalculator, PriceRulesProvider,
-    CreateProductUseCase, ProductRepo, Notifier
+    ProductDTO, PriceCalculator, PriceRulesProvider, CachedPriceRules,
+    CreateProductUseCase, ProductRepo, Notifier,
+    InMemoryOutbox, OutboxDispatcher
 )
 
 
@@ -13,6 +15,16 @@ class PriceRulesStub(PriceRulesProvider):
         return self.rules.get(product_name, 0.0)
 
 
+class PriceRulesSpy(PriceRulesStub):
+    def __init__(self, fixed_rules: dict[str, float]):
+        super().__init__(fixed_rules)
+        self.calls = 0
+
+    def discount_for(self, product_name: str) -> float:
+        self.calls += 1
+        return super().discount_for(product_name)
+
+
 def test_price_calculator_with_stub():
     rules = PriceRulesStub(
         {"Notebook AVM": 0.15, "AdegaDigital Premium": 0.30})
@@ -25,6 +37,50 @@ def test_price_calculator_with_stub():
     assert math.isclose(calc.final_price(p2), 100.00,  rel_tol=0, abs_tol=1e-9)
 
 
+def test_final_prices_matches_final_price():
+    rules = PriceRulesSpy({"A": 0.15, "B": 0.333, "C": 1.5, "D": -0.2})
+    calc = PriceCalculator(rules=rules)
+    prices = [0.125, 2.675, 1.005, 5000.0, 19.99, 1e9 / 3, 0.0]
+    products = [ProductDTO(id=None, name=name, price=price)
+                for name in "ABCDE" for price in prices]
+
+    expected = [calc.final_price(p) for p in products]
+    rules.calls = 0
+    assert calc.final_prices(products) == expected
+    assert rules.calls == 5  # uma consulta por nome distinto
+    assert calc.final_prices([]) == []
+
+
+def test_round2_matches_builtin_round():
+    pytest.importorskip("numpy")
+    import random
+    from app.domain_services import _round2, np
+
+    rnd = random.Random(7)
+    values = [rnd.randint(0, 10 ** 7) / 1000 for _ in range(20000)] + \
+        [rnd.uniform(0, 1e12) for _ in range(2000)] + [-2.675, float("inf")]
+    assert _round2(np.array(values)).tolist() == \
+        [round(v, 2) for v in values]
+
+
+def test_cached_price_rules_invalidate():
+    rules = PriceRulesSpy({"Notebook AVM": 0.15})
+    cached = CachedPriceRules(rules)
+
+    assert cached.discount_for("Notebook AVM") == 0.15
+    assert cached.discount_for("Notebook AVM") == 0.15
+    assert rules.calls == 1
+
+    rules.rules["Notebook AVM"] = 0.40
+    assert cached.discount_for("Notebook AVM") == 0.15
+    cached.invalidate("Notebook AVM")
+    assert cached.discount_for("Notebook AVM") == 0.40
+    cached.invalidate()
+    assert cached.discounts_for(["Notebook AVM", "Outro"]) == \
+        {"Notebook AVM": 0.40, "Outro": 0.0}
+    assert rules.calls == 4
+
+
 class ProductRepoFake(ProductRepo):
     def __init__(self):
         self._store: dict[int, ProductDTO] = {}
@@ -70,3 +126,89 @@ def test_create_product_use_case_with_fake_and_spy():
     assert spy.was_called_once_with_subject("Produto #1")
     assert "R$ 199,90" in f"R$ {created.price:.2f}".replace(
         ".", ",")
+
+
+def test_create_product_use_case_with_outbox_batches_delivery():
+    repo = ProductRepoFake()
+    spy = NotifierSpy()
+    outbox = InMemoryOutbox()
+    usecase = CreateProductUseCase(repo=repo, notifier=spy, outbox=outbox)
+
+    for i in range(10):
+        usecase.execute(name=f"SKU-{i}", price=10.0 + i)
+
+    assert spy.sent == []  # nada entregue durante o execute
+    assert outbox.depth() == 10
+
+    dispatcher = OutboxDispatcher(outbox, spy, batch_size=100)
+    assert dispatcher.drain() == 10
+    assert len(spy.sent) == 1
+    assert "10 notificações" in spy.sent[0][0]
+    assert "Produto #10 criado" in spy.sent[0][1]
+    assert outbox.depth() == 0
+
+
+class FlakyNotifier(Notifier):
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.sent: list[tuple[str, str]] = []
+
+    def send(self, subject: str, body: str) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SMTP fora do ar")
+        self.sent.append((subject, body))
+
+
+def test_outbox_dispatcher_retries_with_backoff_then_dead_letters():
+    outbox = InMemoryOutbox()
+    usecase = CreateProductUseCase(repo=ProductRepoFake(),
+                                   notifier=FlakyNotifier(0), outbox=outbox)
+    usecase.execute(name="SKU-ABC", price=199.90)
+
+    notifier = FlakyNotifier(failures=1)
+    dispatcher = OutboxDispatcher(outbox, notifier, backoff_base=0.0,
+                                  max_attempts=2)
+    assert dispatcher.dispatch_once() == 0
+    assert dispatcher.retries == 1 and outbox.depth() == 1
+    assert dispatcher.dispatch_once() == 1
+    assert notifier.sent[0][0] == "Produto #1 criado"
+
+    usecase.execute(name="SKU-DEF", price=10.0)
+    dispatcher.notifier = FlakyNotifier(failures=5)
+    dispatcher.drain()
+    dispatcher.drain()
+    assert dispatcher.dead == 1
+    assert outbox.depth() == 0 and len(outbox.failed) == 1
+
+
+def test_create_product_use_case_execute_many():
+    repo = ProductRepoFake()
+    outbox = InMemoryOutbox()
+    usecase = CreateProductUseCase(repo=repo, notifier=NotifierSpy(),
+                                   outbox=outbox)
+
+    created = usecase.execute_many(
+        [{"name": f"SKU-{i}", "price": 1.0 + i} for i in range(3)])
+
+    assert [p.id for p in created] == [1, 2, 3]
+    assert repo.get(3).name == "SKU-2"
+    assert outbox.depth() == 3
+
+
+class FailingRepo(ProductRepoFake):
+    def save(self, product: ProductDTO) -> ProductDTO:
+        raise RuntimeError("banco fora do ar")
+
+
+def test_failed_save_leaves_nothing_in_the_outbox():
+    outbox = InMemoryOutbox()
+    usecase = CreateProductUseCase(repo=FailingRepo(),
+                                   notifier=NotifierSpy(), outbox=outbox)
+    dispatcher = OutboxDispatcher(outbox, NotifierSpy())
+
+    with pytest.raises(RuntimeError):
+        usecase.execute(name="SKU-ABC", price=1.0)
+
+    assert outbox.depth() == 0
+    assert dispatcher.drain() == 0
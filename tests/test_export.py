@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+
+from app.models.product_models import (
+    create_product, export_products_csv, export_products_ndjson
+)
+
+
+def _seed(app, count):
+    with app.app_context():
+        for i in range(count):
+            create_product({"name": f"Item {i}", "price": i + 0.5,
+                            "description": "linha, com \"aspas\""})
+
+
+def test_ndjson_export_streams_every_product(app, client, auth):
+    _seed(app, 5)
+
+    response = client.get("/api/produtos/export", headers=auth())
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["X-Change-Token"]
+
+    rows = [json.loads(line) for line in response.get_data().splitlines()]
+    assert [row["name"] for row in rows] == [f"Item {i}" for i in range(5)]
+    assert set(rows[0]) == {"id", "name", "price", "description"}
+
+
+def test_csv_export_round_trips(app, client, auth):
+    _seed(app, 3)
+
+    response = client.get("/api/produtos/export?format=csv", headers=auth())
+    assert response.status_code == 200
+    assert "produtos.csv" in response.headers["Content-Disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 3
+    assert rows[2]["description"] == "linha, com \"aspas\""
+    assert float(rows[2]["price"]) == 2.5
+
+
+def test_export_yields_one_chunk_per_batch(app):
+    _seed(app, 5)
+
+    with app.app_context():
+        assert len(list(export_products_ndjson(chunk_size=2))) == 3
+        chunks = list(export_products_csv(chunk_size=2))
+        assert len(chunks) == 3
+        assert chunks[0].startswith("id,name,price,description")
+
+
+def test_export_rejects_unknown_format(client, auth):
+    response = client.get("/api/produtos/export?format=xml", headers=auth())
+    assert response.status_code == 400
+    assert client.get("/api/produtos/export").status_code == 401
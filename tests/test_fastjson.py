@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from app.utils import fastjson
+from app.utils.fastjson import FastJSONProvider, encode_value, rows_encoder
+
+
+def test_rows_encoder_matches_value_encoder():
+    rows = [(1, "Café", 9.9, None), (2, "Chá", 1.5, "quente")]
+    fields = ("id", "name", "price", "description")
+
+    encoded = rows_encoder(fields)(rows)
+
+    assert json.loads(encoded) == [dict(zip(fields, row)) for row in rows]
+
+
+def test_datetimes_use_iso_format():
+    value = datetime(2026, 10, 17, 12, 30)
+
+    assert encode_value({"updated_at": value}) == \
+        b'{"updated_at":"2026-10-17T12:30:00"}'
+
+
+def test_jsonify_round_trip(app):
+    with app.test_request_context():
+        response = app.json.response({"name": "Pão", "price": 2.5})
+
+    assert app.json.loads(response.get_data()) == {"name": "Pão",
+                                                   "price": 2.5}
+
+
+def test_provider_falls_back_to_stdlib_once(app, monkeypatch, capsys):
+    monkeypatch.setattr(fastjson, "orjson", None)
+    monkeypatch.setattr(FastJSONProvider, "_warned", False)
+
+    providers = [FastJSONProvider(app), FastJSONProvider(app)]
+
+    assert not providers[0].fast
+    assert capsys.readouterr().out.count("orjson não instalado") == 1
+    assert providers[1].loads(providers[1].dumps({"big": 2 ** 70})) == {
+        "big": 2 ** 70}
+
+
+def test_big_integers_fall_back_to_stdlib(app):
+    with app.test_request_context():
+        response = app.json.response({"id": 2 ** 70})
+
+    assert json.loads(response.get_data()) == {"id": 2 ** 70}
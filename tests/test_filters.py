@@ -0,0 +1,52 @@
+from app.models.product_models import create_product
+
+
+def _seed(app, items):
+    with app.app_context():
+        return [create_product({"name": name, "price": price})["id"]
+                for name, price in items]
+
+
+def _get(client, auth, **params):
+    response = client.get("/api/produtos", headers=auth(),
+                          query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_filters_combine_price_range_and_name_prefix(app, client, auth):
+    _seed(app, [("Cabo USB", 10.0), ("Cabo HDMI", 30.0), ("Capa", 20.0),
+                ("Mouse", 25.0)])
+
+    page = _get(client, auth, min_price=15, max_price=30, name_prefix="Ca")
+    assert [item["name"] for item in page["items"]] == ["Cabo HDMI", "Capa"]
+
+
+def test_sort_by_price_pages_through_ties(app, client, auth):
+    ids = _seed(app, [("A", 5.0), ("B", 1.0), ("C", 5.0), ("D", 1.0),
+                      ("E", 3.0)])
+
+    seen, cursor = [], None
+    while True:
+        page = _get(client, auth, sort="price", limit=2,
+                    **({"after": cursor} if cursor else {}))
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [ids[1], ids[3], ids[4], ids[0], ids[2]]
+
+
+def test_fields_projection_always_includes_id(app, client, auth):
+    _seed(app, [("Lápis", 1.5)])
+
+    page = _get(client, auth, fields="name")
+    assert page["items"] == [{"id": page["items"][0]["id"], "name": "Lápis"}]
+
+
+def test_invalid_filters_are_rejected(client, auth):
+    for params in ({"sort": "description"}, {"fields": "senha"},
+                   {"min_price": "barato"}):
+        response = client.get("/api/produtos", headers=auth(),
+                              query_string=params)
+        assert response.status_code == 400
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.models.models import User
+from app.utils.hashing import HashingBusy, PasswordHasher, password_hasher
+
+
+def test_short_method_matches_full_hash_prefix():
+    hasher = PasswordHasher()
+    hasher.method = "pbkdf2"
+    pwhash = generate_password_hash("segredo", method="pbkdf2")
+
+    assert not hasher.needs_rehash(pwhash)
+    hasher.method = "pbkdf2:sha256"
+    assert not hasher.needs_rehash(pwhash)
+
+
+def test_scrypt_defaults_are_normalized():
+    hasher = PasswordHasher()
+    hasher.method = "scrypt"
+
+    assert not hasher.needs_rehash("scrypt:32768:8:1$salt$hash")
+    assert hasher.needs_rehash("scrypt:16384:8:1$salt$hash")
+
+
+def test_different_method_needs_rehash():
+    hasher = PasswordHasher()
+    hasher.method = "scrypt:32768:8:1"
+    pwhash = generate_password_hash("segredo", method="pbkdf2:sha256:1000")
+
+    assert hasher.needs_rehash(pwhash)
+
+
+def test_pool_hashes_and_verifies_out_of_process():
+    hasher = PasswordHasher()
+    hasher.method = "pbkdf2:sha256:1000"
+    hasher.workers = 1
+
+    pwhash = hasher.hash("segredo")
+    assert hasher.verify(pwhash, "segredo")
+    assert not hasher.verify(pwhash, "outra")
+    assert hasher._pool is not None
+    hasher._pool.shutdown()
+
+
+def test_full_queue_raises_busy():
+    hasher = PasswordHasher()
+    hasher.workers = 0
+    hasher.queue_timeout = 0.01
+    hasher._slots = threading.BoundedSemaphore(1)
+    hasher._slots.acquire()
+
+    with pytest.raises(HashingBusy):
+        hasher.hash("segredo")
+
+
+def test_login_answers_503_when_hashing_is_busy(
+        client, login, monkeypatch):
+    login("ana")
+
+    def busy(*args):
+        raise HashingBusy()
+
+    monkeypatch.setattr(password_hasher, "verify", busy)
+    response = client.post("/login", data={"username": "ana",
+                                           "password": "segredo123"})
+    assert response.status_code == 503
+
+
+def test_login_upgrades_outdated_hash(app, client, login, monkeypatch):
+    login("rui")
+    monkeypatch.setattr(password_hasher, "method", "pbkdf2:sha256:2000")
+
+    assert client.post("/login", data={
+        "username": "rui", "password": "segredo123"}).status_code == 302
+    with app.app_context():
+        user = User.query.filter_by(username="rui").one()
+        assert user.password_hash.startswith("pbkdf2:sha256:2000$")
+
+
+def test_pool_processes_do_not_fork_the_worker():
+    hasher = PasswordHasher()
+    hasher.workers = 1
+
+    pool = hasher._executor()
+    assert pool._mp_context.get_start_method() == "forkserver"
+    pool.shutdown()
+
+
+def test_user_password_methods_use_the_configured_hasher(app):
+    with app.app_context():
+        user = User(username="u", email="u@example.com")
+        user.set_password("segredo")
+
+    assert user.password_hash.startswith("pbkdf2:sha256:1000$")
+    assert user.check_password("segredo")
+    assert not user.check_password("outra")
@@ -0,0 +1,123 @@
+import io
+import json
+import pytest
+from app.models.import_models import (
+    ProductImportError, clean_record, detect_format, iter_records
+)
+
+
+def test_iter_records_csv_and_clean_record():
+    data = io.StringIO(
+        'name,price,description\n'
+        'Notebook AVM,5000,"Tela 14"", 16GB"\n'
+        ',10,sem nome\n'
+        'Mouse,abc,\n')
+    records = list(iter_records(data, "csv"))
+    assert clean_record(records[0][1]) == {
+        "name": "Notebook AVM", "price": 5000.0,
+        "description": 'Tela 14", 16GB'}
+    for _, record in records[1:]:
+        with pytest.raises(ValueError):
+            clean_record(record)
+
+    with pytest.raises(ProductImportError):
+        list(iter_records(io.StringIO("nome,preco\nx,1\n"), "csv"))
+
+
+def test_iter_records_ndjson_reports_bad_lines():
+    data = io.StringIO('{"name": "A", "price": 1}\n{ruim\n[1]\n')
+    records = list(iter_records(data, "ndjson"))
+    assert clean_record(records[0][1])["name"] == "A"
+    assert [number for number, r in records if isinstance(r, str)] == [2, 3]
+    assert detect_format("catalogo.jsonl.gz") == "ndjson"
+
+
+def _write_csv(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("﻿name,price,description\n")
+        for i in range(count):
+            # descrição com quebra de linha: um registro, duas linhas
+            f.write(f'Produto {i},{i + 1},"linha 1\nlinha 2"\n')
+
+
+def _imported_names(app):
+    from app.models.models import Product
+    from app.utils import db
+
+    with app.app_context():
+        return sorted(db.session.scalars(db.select(Product.name)))
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.mark.parametrize("crash_after_commit", [False, True])
+def test_interrupted_import_resumes_without_gaps_or_duplicates(
+        app, tmp_path, monkeypatch, crash_after_commit):
+    from app.models import import_models
+    from app.models.import_models import ProductImporter
+
+    path = str(tmp_path / "catalogo.csv")
+    _write_csv(path, 25)
+    insert = ProductImporter._insert
+    save_state = ProductImporter._save_state
+    batches = []
+
+    def flaky_insert(conn, rows, ids):
+        batches.append(len(rows))
+        if len(batches) == 3 and not crash_after_commit:
+            raise Crash()
+        insert(conn, rows, ids)
+
+    def flaky_save_state(self):
+        # cai logo depois do commit do 3º lote, antes do checkpoint
+        if len(batches) == 3 and crash_after_commit \
+                and self.state["pending"] is None:
+            raise Crash()
+        save_state(self)
+
+    monkeypatch.setattr(ProductImporter, "_insert", staticmethod(flaky_insert))
+    monkeypatch.setattr(ProductImporter, "_save_state", flaky_save_state)
+    with app.app_context(), pytest.raises(Crash):
+        ProductImporter(path, batch_size=5, report=lambda line: None).run()
+
+    monkeypatch.setattr(ProductImporter, "_insert", staticmethod(insert))
+    monkeypatch.setattr(ProductImporter, "_save_state", save_state)
+    parsed = []
+    clean = import_models.clean_record
+    monkeypatch.setattr(import_models, "clean_record",
+                        lambda record: parsed.append(record) or clean(record))
+    with app.app_context():
+        result = ProductImporter(path, batch_size=5,
+                                 report=lambda line: None).run()
+
+    assert _imported_names(app) == sorted(f"Produto {i}" for i in range(25))
+    assert result["imported"] == 25 and result["records"] == 25
+    # o que já estava gravado não é lido de novo
+    assert parsed[0]["name"] == ("Produto 15" if crash_after_commit
+                                 else "Produto 10")
+    assert parsed[0]["description"] == "linha 1\nlinha 2"
+
+
+def test_rows_with_wrong_types_go_to_the_rejects_file(app, tmp_path):
+    from app.models.import_models import ProductImporter
+
+    path = tmp_path / "catalogo.ndjson"
+    path.write_text(
+        '{"name": "Bom", "price": 1}\n'
+        '{"name": 123, "price": 1}\n'
+        '{"name": "Descrição objeto", "price": 1, "description": {"a": 1}}\n'
+        '{"name": "Também bom", "price": 2, "description": "ok"}\n',
+        encoding="utf-8")
+
+    with app.app_context():
+        result = ProductImporter(str(path), batch_size=10,
+                                 report=lambda line: None).run()
+
+    assert (result["imported"], result["rejected"]) == (2, 2)
+    assert _imported_names(app) == ["Bom", "Também bom"]
+    rejects = [json.loads(line) for line in
+               open(result["rejects_file"], encoding="utf-8")]
+    assert [r["error"] for r in rejects] == ["Nome inválido.",
+                                             "Descrição inválida."]
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from app.models.models import Product
+from app.utils import db
+
+
+def _series(body, name, label=""):
+    return [line for line in body.splitlines()
+            if line.startswith(name + "{") and label in line]
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(METRICS_ENABLED="true", METRICS_TOKEN="scrape-secret")
+
+
+def test_metrics_disabled_returns_404(make_app):
+    app = make_app(METRICS_ENABLED="false")
+    assert app.test_client().get("/metrics").status_code == 404
+
+
+def test_metrics_access_requires_token_or_allowed_network(client):
+    remote = {"REMOTE_ADDR": "203.0.113.7"}
+
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_base=remote).status_code == 403
+    assert client.get("/metrics", environ_base=remote, headers={
+        "Authorization": "Bearer errado"}).status_code == 403
+    assert client.get("/metrics", environ_base=remote, headers={
+        "Authorization": "Bearer scrape-secret"}).status_code == 200
+
+
+def test_series_are_labelled_with_the_worker_pid(client, auth):
+    client.get("/api/produtos", headers=auth())
+
+    body = client.get("/metrics").get_data(as_text=True)
+
+    pid = f'pid="{os.getpid()}"'
+    requests = [line for line in body.splitlines()
+                if line.startswith("prodmanager_http_requests_total{")]
+    assert requests and all(pid in line for line in requests)
+    assert 'endpoint="main.api_list_products"' in body
+
+
+def test_sql_auth_and_template_timings_are_recorded(client, auth):
+    client.get("/api/produtos", headers=auth())
+    client.get("/login")
+
+    body = client.get("/metrics").get_data(as_text=True)
+
+    assert _series(body, "prodmanager_db_queries_per_request_count",
+                   'endpoint="main.api_list_products"')
+    assert _series(body, "prodmanager_jwt_verify_duration_seconds_count")
+    assert 'template="user/login.html"' in body
+    assert 'le="+Inf"' in body
+
+
+def test_repeated_statement_counts_as_n_plus_one(make_app):
+    app = make_app(METRICS_ENABLED="true", METRICS_N_PLUS_ONE_THRESHOLD="3")
+
+    @app.get("/n-mais-um")
+    def n_plus_one():
+        for product_id in range(3):
+            db.session.get(Product, product_id)
+        return ""
+
+    client = app.test_client()
+    client.get("/n-mais-um")
+
+    body = client.get("/metrics").get_data(as_text=True)
+    assert _series(body, "prodmanager_db_n_plus_one_total",
+                   'endpoint="n_plus_one"')
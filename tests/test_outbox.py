@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from app.domain_services import CreateProductUseCase
+from app.metrics import metrics
+from app.models.models import OutboxEntry, Product
+from app.models.outbox_models import SqlAlchemyOutbox
+from app.models.product_models import SqlAlchemyProductRepo
+from app.utils import db
+from app.utils.warmup import warm_up
+
+
+def _gauge(body, name):
+    line, = [line for line in body.splitlines()
+             if line.startswith(name + "{") and 'outbox="products"' in line]
+    return float(line.rsplit(" ", 1)[1])
+
+
+class Notifier:
+    def send(self, subject: str, body: str) -> None:
+        pass
+
+
+def _usecase():
+    return CreateProductUseCase(repo=SqlAlchemyProductRepo(),
+                                notifier=Notifier(),
+                                outbox=SqlAlchemyOutbox())
+
+
+def test_message_is_committed_with_the_product(app):
+    with app.app_context():
+        created = _usecase().execute(name="SKU-1", price=1.0)
+        db.session.remove()
+
+        assert db.session.get(Product, created.id) is not None
+        entry = db.session.scalars(db.select(OutboxEntry)).one()
+        assert entry.key == f"produto:{created.id}:criado"
+
+
+def test_failed_save_writes_no_message(app):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            _usecase().execute(name="", price=1.0)
+        db.session.remove()
+
+        assert OutboxEntry.query.count() == 0
+        assert Product.query.count() == 0
+
+
+def test_concurrent_claims_do_not_overlap(app):
+    with app.app_context():
+        _usecase().execute_many(
+            [{"name": f"SKU-{i}", "price": 1.0} for i in range(5)])
+        first, second = SqlAlchemyOutbox(), SqlAlchemyOutbox()
+
+        a = first.claim(3)
+        b = second.claim(3)
+
+        assert len(a) == 3 and len(b) == 2
+        assert not {m.id for m in a} & {m.id for m in b}
+        assert second.claim(3) == []
+
+
+def test_expired_lease_can_be_claimed_again(app):
+    with app.app_context():
+        _usecase().execute(name="SKU-1", price=1.0)
+        outbox = SqlAlchemyOutbox(lease=-1)
+
+        first = outbox.claim(10)
+        again = outbox.claim(10)
+
+        assert [m.id for m in again] == [m.id for m in first]
+        outbox.ack(again)
+        assert outbox.depth() == 0
+
+
+def test_dispatcher_is_off_by_default(app):
+    assert "outbox_dispatcher" not in app.extensions
+
+
+def test_app_dispatcher_delivers_and_reports_depth(make_app, monkeypatch):
+    # collectors são globais: não deixar este dispatcher no /metrics de outros
+    monkeypatch.setattr(metrics, "_collectors", dict(metrics._collectors))
+    app = make_app(OUTBOX_DISPATCHER_ENABLED="true", OUTBOX_AUTOSTART="false",
+                   METRICS_ENABLED="true",
+                   OUTBOX_POLL_INTERVAL="0.05")
+    dispatcher = app.extensions["outbox_dispatcher"]
+    sent = []
+    dispatcher.notifier = type("Spy", (), {
+        "send": lambda self, subject, body: sent.append(subject)})()
+    with app.app_context():
+        _usecase().execute(name="SKU-1", price=1.0)
+
+    body = app.test_client().get("/metrics").get_data(as_text=True)
+    assert _gauge(body, "prodmanager_outbox_depth") == 1
+
+    # como num worker do gunicorn (preload): a thread sobe no warm_up
+    warm_up(app)
+    try:
+        deadline = time.monotonic() + 5
+        while not sent and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        dispatcher.stop()
+
+    assert len(sent) == 1
+    body = app.test_client().get("/metrics").get_data(as_text=True)
+    assert _gauge(body, "prodmanager_outbox_depth") == 0
+    assert _gauge(body, "prodmanager_outbox_delivered") == 1
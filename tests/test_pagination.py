@@ -0,0 +1,69 @@
+from app.models.product_models import create_product, delete_product
+
+
+def _seed(app, count):
+    with app.app_context():
+        return [create_product({"name": f"Produto {i:02d}",
+                                "price": i + 1.0})["id"]
+                for i in range(count)]
+
+
+def _page(client, auth, **params):
+    response = client.get("/api/produtos", headers=auth(),
+                          query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_cursor_walks_every_product_once(app, client, auth):
+    ids = _seed(app, 7)
+
+    seen, cursor = [], None
+    while True:
+        page = _page(client, auth, limit=3,
+                     **({"after": cursor} if cursor else {}))
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ids
+
+    last = _page(client, auth, limit=3, after=_page(
+        client, auth, limit=6)["next_cursor"])
+    back = _page(client, auth, limit=3, before=last["prev_cursor"])
+    assert [item["id"] for item in back["items"]] == ids[3:6]
+
+
+def test_next_page_survives_deletes_before_the_cursor(app, client, auth):
+    ids = _seed(app, 4)
+    first = _page(client, auth, limit=2)
+
+    # com OFFSET, apagar um item já visto pularia ids[2]
+    with app.app_context():
+        delete_product(ids[0])
+    second = _page(client, auth, limit=2, after=first["next_cursor"])
+    assert [item["id"] for item in second["items"]] == ids[2:]
+
+
+def test_invalid_cursor_is_rejected(app, client, auth):
+    _seed(app, 2)
+    cursor = _page(client, auth, limit=1)["next_cursor"]
+
+    for params in ({"after": "lixo"}, {"before": "bm90LWpzb24"},
+                   {"after": cursor, "before": cursor}):
+        response = client.get("/api/produtos", headers=auth(),
+                              query_string=params)
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+
+def test_html_list_links_to_next_page(app, client, login):
+    _seed(app, 3)
+    login()
+
+    html = client.get("/produtos?limit=2").get_data(as_text=True)
+    assert "Produto 01" in html and "Produto 02" not in html
+    assert "after=" in html
+
+    response = client.get("/produtos?after=lixo")
+    assert response.status_code == 302
@@ -0,0 +1,58 @@
+import math
+
+from sqlalchemy import event
+
+from app.domain_services import ProductDTO
+from app.models.models import Product
+from app.models.product_models import SqlAlchemyProductRepo
+from app.utils import db
+from app.utils.ids import IdBlockAllocator
+
+
+def _count_queries(app):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_next_id_reserves_one_block_per_block_size(app):
+    allocator = IdBlockAllocator("teste", "produtos")
+    allocator.init_app(app)
+    allocator.block_size = 10
+
+    ids = [allocator.next_id() for _ in range(25)]
+
+    assert allocator.reservations == math.ceil(25 / 10)
+    assert len(set(ids)) == 25
+    assert allocator.stats()["remaining"] == 5
+
+
+def test_get_after_save_does_not_query(app):
+    with app.app_context():
+        repo = SqlAlchemyProductRepo()
+        saved = repo.save(ProductDTO(id=None, name="SKU-1", price=1.0))
+        statements = _count_queries(app)
+
+        assert repo.get(saved.id) is saved
+        assert statements == []
+
+
+def test_save_many_updates_existing_ids(app):
+    with app.app_context():
+        first, second = SqlAlchemyProductRepo().save_many([
+            ProductDTO(id=None, name="SKU-1", price=1.0),
+            ProductDTO(id=None, name="SKU-2", price=2.0),
+        ])
+
+        # repo novo: os IDs só existem no banco, não no mapa de identidade
+        SqlAlchemyProductRepo().save_many([
+            ProductDTO(id=first.id, name="SKU-1b", price=1.5),
+            ProductDTO(id=second.id, name="SKU-2b", price=2.5),
+        ])
+        db.session.remove()
+
+        assert Product.query.count() == 2
+        assert db.session.get(Product, first.id).name == "SKU-1b"
+        assert db.session.get(Product, second.id).price == 2.5
@@ -0,0 +1,72 @@
+import pstats
+
+import pytest
+
+from app.models.product_models import create_product
+from app.utils.profiling import TOKEN_HEADER, profiler
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(PROFILING_ENABLED="true", PROFILING_MAX_ARTIFACTS="2")
+    yield app
+    profiler.arm(0)
+
+
+def _profiles(client, auth):
+    response = client.get("/api/admin/profiles", headers=auth("admin"))
+    assert response.status_code == 200
+    return response.get_json()["items"]
+
+
+def test_signed_header_profiles_one_request(app, client, auth, tmp_path):
+    token = client.post("/api/admin/profiles/token",
+                        headers=auth("admin")).get_json()["token"]
+
+    client.get("/api/produtos", headers={**auth(), TOKEN_HEADER: token})
+    client.get("/api/produtos", headers={**auth(), TOKEN_HEADER: "forjado"})
+    client.get("/api/produtos", headers=auth())
+
+    [item] = _profiles(client, auth)
+    assert (item["reason"], item["endpoint"]) == (
+        "header", "main.api_list_products")
+    detail = client.get(f"/api/admin/profiles/{item['id']}",
+                        headers=auth("admin")).get_json()
+    assert detail["sql_count"] >= 1 and detail["top"]
+
+    dump = client.get(f"/api/admin/profiles/{item['id']}/pstats",
+                      headers=auth("admin"))
+    path = tmp_path / "perfil.prof"
+    path.write_bytes(dump.get_data())
+    assert pstats.Stats(str(path)).total_calls > 0
+
+
+def test_armed_profiler_waits_for_its_endpoint(app, client, auth):
+    with app.app_context():
+        product = create_product({"name": "Perfilado", "price": 1.0})
+    armed = client.post("/api/admin/profiles/arm", headers=auth("admin"),
+                        json={"count": 1, "endpoint": "main.api_get_product"})
+    assert armed.get_json()["armed"] == 1
+
+    client.get("/api/produtos", headers=auth())
+    for _ in range(2):
+        client.get(f"/api/produtos/{product['id']}", headers=auth())
+
+    assert [p["endpoint"] for p in _profiles(client, auth)] == [
+        "main.api_get_product"]
+
+
+def test_artifacts_are_trimmed_to_the_limit(app, client, auth):
+    client.post("/api/admin/profiles/arm", headers=auth("admin"),
+                json={"count": 3})
+    for _ in range(3):
+        client.get("/api/produtos", headers=auth())
+
+    assert len(_profiles(client, auth)) == 2
+
+
+def test_admin_endpoints_require_admin_role(app, client, auth):
+    for url in ("/api/admin/profiles/token", "/api/admin/profiles/arm"):
+        assert client.post(url, headers=auth()).status_code == 403
+    assert client.get("/api/admin/profiles/nao-existe",
+                      headers=auth("admin")).status_code == 404
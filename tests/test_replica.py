@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.models.models import Product
+from app.utils import db, engine
+from app.utils.engine import REPLICA_BIND, REPLICA_COOKIE
+from app.utils.http import make_etag
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    app = make_app(DATABASE_REPLICA_URL=f"sqlite:///{tmp_path / 'replica.db'}",
+                   REPLICA_STICKY_SECONDS="30", PRODUCT_CACHE_BACKEND="none")
+    with app.app_context():
+        replica = db.engines[REPLICA_BIND]
+        db.metadata.create_all(replica)
+        with replica.begin() as conn:
+            conn.execute(insert(Product).values(name="Na réplica", price=1.0))
+    engine._last_write = 0.0
+    yield app
+    engine._last_write = 0.0
+
+
+def _names(response):
+    return [item["name"] for item in response.get_json()["items"]]
+
+
+def test_list_etag_comes_from_the_replica(app, client, auth):
+    response = client.get("/api/produtos", headers=auth())
+
+    with app.app_context():
+        with db.engines[REPLICA_BIND].connect() as conn:
+            count, last_modified = conn.execute(select(
+                func.count(Product.id), func.max(Product.updated_at))).one()
+    assert _names(response) == ["Na réplica"]
+    assert response.headers["ETag"] == '"%s"' % make_etag(
+        "produtos", count, last_modified, "")
+
+
+def test_writer_reads_from_primary_on_any_worker(app, client, auth):
+    created = client.post("/api/produtos", headers=auth("products:write"),
+                          json={"name": "No primário", "price": 2.0})
+    assert REPLICA_COOKIE in created.headers["Set-Cookie"]
+
+    # outro worker: o processo não escreveu, só o cookie do cliente conta
+    engine._last_write = 0.0
+    assert _names(client.get("/api/produtos", headers=auth())) == [
+        "No primário"]
+
+    other = app.test_client()
+    assert _names(other.get("/api/produtos", headers=auth())) == [
+        "Na réplica"]
+
+
+def test_sqlite_connections_get_the_pragmas(make_app):
+    app = make_app(SQLITE_BUSY_TIMEOUT="1234", SQLITE_SYNCHRONOUS="FULL")
+    with app.app_context():
+        with db.engine.connect() as conn:
+            values = {name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                      for name in ("journal_mode", "busy_timeout",
+                                   "synchronous")}
+    assert values == {"journal_mode": "wal", "busy_timeout": 1234,
+                      "synchronous": 2}  # 2 = FULL
+
+
+def test_server_engines_get_pool_options():
+    options = engine.engine_options("postgresql://db/prodmanager",
+                                    {"DB_POOL_SIZE": 5})
+
+    assert options["pool_size"] == 5
+    assert options["pool_pre_ping"] is True
+    assert engine.engine_options("sqlite:///x.db", {}) == {}
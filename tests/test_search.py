@@ -0,0 +1,80 @@
+import pytest
+
+from app.models.product_models import (
+    create_product, delete_product, search_products, update_product
+)
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app(PRODUCT_CACHE_BACKEND="none")
+
+
+def _ids(page):
+    return [item["id"] for item in page["items"]]
+
+
+def test_search_pages_by_rank_and_id(app):
+    with app.app_context():
+        for i in range(7):
+            create_product({"name": f"Notebook {i}", "price": 1.0 + i})
+        create_product({"name": "Mouse", "price": 1.0})
+
+        everything = _ids(search_products("note", limit=50))
+        first = search_products("note", limit=3)
+        second = search_products("note", limit=3,
+                                 cursor=first["next_cursor"])
+        third = search_products("note", limit=3,
+                                cursor=second["next_cursor"])
+
+        assert len(everything) == 7
+        assert _ids(first) + _ids(second) + _ids(third) == everything
+        assert third["next_cursor"] is None
+        back = search_products("note", limit=3, cursor=second["prev_cursor"])
+        assert _ids(back) == _ids(first)
+
+
+def test_insert_between_pages_does_not_repeat_rows(app):
+    with app.app_context():
+        for i in range(4):
+            create_product({"name": f"Cabo {i}", "price": 1.0})
+        first = search_products("cabo", limit=2)
+        # com OFFSET, um item novo no topo empurraria o 2º para a página 2
+        create_product({"name": "Cabo", "price": 1.0})
+        second = search_products("cabo", limit=2,
+                                 cursor=first["next_cursor"])
+
+        assert not set(_ids(first)) & set(_ids(second))
+
+
+def test_triggers_keep_the_index_in_sync(app):
+    with app.app_context():
+        product = create_product({"name": "Teclado", "price": 1.0})
+        update_product(product["id"], {"name": "Monitor", "price": 1.0})
+
+        assert _ids(search_products("teclado")) == []
+        assert _ids(search_products("monitor")) == [product["id"]]
+        delete_product(product["id"])
+        assert _ids(search_products("monitor")) == []
+
+
+def test_search_endpoint_validates_input(client, auth):
+    assert client.get("/api/produtos/search?q=",
+                      headers=auth()).status_code == 400
+    response = client.get("/api/produtos/search?q=x&after=lixo",
+                          headers=auth())
+    assert response.status_code == 400
+    assert client.get("/api/produtos/search?q=x").status_code == 401
+
+
+def test_name_matches_rank_above_description_matches(app):
+    with app.app_context():
+        in_description = create_product({
+            "name": "Suporte", "price": 1.0,
+            "description": "Compatível com notebook gamer"})
+        in_name = create_product({"name": "Notebook Gamer", "price": 1.0})
+        create_product({"name": "Notebook Office", "price": 1.0})
+
+        assert _ids(search_products("gam note")) == [
+            in_name["id"], in_description["id"]]
+        assert _ids(search_products("compat")) == [in_description["id"]]
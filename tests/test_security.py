@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from authlib.jose import JsonWebKey, JsonWebToken
+
+from app.security import (
+    InvalidTokenError, JWKSKeyStore, OIDCDiscovery, OIDCUnavailable,
+    VerifiedTokenCache,
+)
+
+
+def _counting_uri(idp, calls):
+    def jwks_uri():
+        calls.append(1)
+        return f"{idp.issuer}/certs"
+
+    return jwks_uri
+
+
+def test_api_rejects_invalid_tokens_with_401(client, auth, idp):
+    forger = JsonWebKey.generate_key("RSA", 2048, is_private=True)
+    now = int(time.time())
+    forged = JsonWebToken(["RS256"]).encode(
+        {"alg": "RS256", "kid": idp.kid},
+        {"iss": idp.issuer, "aud": "prodmanager-api",
+         "iat": now, "exp": now + 60},
+        forger).decode()
+
+    for headers in (auth(ttl=-3600),
+                    {"Authorization": f"Bearer {forged}"},
+                    {"Authorization": "Bearer a.b.c"},
+                    {"Authorization": "Bearer " + idp.mint("outra-api", ())}):
+        response = client.get("/api/produtos", headers=headers)
+        assert response.status_code == 401
+        assert response.get_json()["error"] == "invalid_token"
+
+    assert client.get("/api/produtos", headers=auth()).status_code == 200
+
+
+def test_jwks_keys_are_cached_until_ttl(idp):
+    calls = []
+    store = JWKSKeyStore(_counting_uri(idp, calls), ttl=300)
+
+    assert store.get_key("test-key") is store.get_key("test-key")
+    assert len(calls) == 1
+
+    store._fetched_at -= 300
+    store.get_key("test-key")
+    assert len(calls) == 2
+
+
+def test_unknown_kid_refetch_is_throttled(idp):
+    calls = []
+    store = JWKSKeyStore(_counting_uri(idp, calls), min_refetch_interval=60)
+
+    for _ in range(3):
+        with pytest.raises(InvalidTokenError):
+            store.get_key("rotated-key")
+    # carga inicial + uma única nova busca pelo kid desconhecido
+    assert len(calls) == 2
+
+
+def test_verified_token_cache_skips_signature_check(app, auth, monkeypatch):
+    validator = app.extensions["oidc_validator"]
+    token = auth()["Authorization"].split()[1]
+    verified = []
+    verify = validator._verify
+    monkeypatch.setattr(validator, "_verify",
+                        lambda t: verified.append(t) or verify(t))
+
+    first = validator.authenticate_token(token)
+    assert validator.authenticate_token(token) is first
+    assert verified == [token]
+
+
+def test_verified_token_cache_honours_exp_and_maxsize():
+    cache = VerifiedTokenCache(maxsize=2, leeway=60)
+    now = time.time()
+
+    cache.put("quase-expirado", {"exp": now + 30})
+    assert cache.get("quase-expirado") is None
+
+    for name in ("a", "b", "c"):
+        cache.put(name, {"exp": now + 3600})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"exp": now + 3600}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_discovery_unavailable_backs_off(tmp_path):
+    discovery = OIDCDiscovery("http://127.0.0.1:1/.well-known",
+                              timeout=1, cache_path=str(tmp_path / "d.json"))
+
+    with pytest.raises(OIDCUnavailable):
+        discovery.get()
+    retry_at = discovery._next_attempt
+    with pytest.raises(OIDCUnavailable):
+        discovery.get()
+    # dentro do backoff: nenhuma nova tentativa na rede
+    assert discovery._next_attempt == retry_at
+    assert discovery._delay == 2.0
+
+
+def test_discovery_uses_last_good_copy_on_disk(idp, tmp_path):
+    path = str(tmp_path / "discovery.json")
+    assert OIDCDiscovery(idp.well_known, cache_path=path).get()["issuer"] \
+        == idp.issuer
+
+    offline = OIDCDiscovery("http://127.0.0.1:1/.well-known", timeout=1,
+                            cache_path=path)
+    assert offline.get()["jwks_uri"] == f"{idp.issuer}/certs"
+
+
+def test_app_boots_and_serves_html_without_idp(make_app, tmp_path):
+    started = time.monotonic()
+    app = make_app(OIDC_WELL_KNOWN="http://127.0.0.1:1/.well-known",
+                   OIDC_CACHE_DIR=str(tmp_path / "vazio"))
+
+    assert time.monotonic() - started < 5
+    assert app.test_client().get("/login").status_code == 200
@@ -0,0 +1,112 @@
+from datetime import timedelta
+
+import pytest
+
+from app.models.models import ServerSession
+from app.utils import db, sessions
+from app.utils.sessions import _storage_key
+
+
+@pytest.fixture(params=["sqlalchemy", "memory"])
+def app(make_app, request):
+    return make_app(SESSION_BACKEND=request.param, SESSION_TOUCH_INTERVAL="60")
+
+
+@pytest.fixture
+def writes(app, monkeypatch):
+    store = app.session_interface.store
+    calls = []
+
+    def spy(name, method):
+        def wrapper(*args):
+            calls.append(name)
+            return method(*args)
+        return wrapper
+
+    for name in ("save", "touch", "delete"):
+        monkeypatch.setattr(store, name, spy(name, getattr(store, name)))
+    return calls
+
+
+def _login(login):
+    client = login()
+    client.get("/")  # consome o flash do cadastro (altera a sessão)
+    return client
+
+
+def _load(app, sid):
+    with app.app_context():
+        return app.session_interface.store.load(sid)
+
+
+def _sid(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def test_cookie_carries_only_an_opaque_id(app, client, login):
+    login()
+    sid = _sid(client)
+
+    assert sid and "maria" not in sid
+    data, _ = _load(app, sid)
+    assert data["_user_id"]
+    if app.config["SESSION_BACKEND"] == "sqlalchemy":
+        with app.app_context():
+            assert db.session.get(ServerSession, _storage_key(sid))
+            assert db.session.get(ServerSession, sid) is None
+
+
+def test_reads_within_touch_interval_do_not_write(client, login, writes):
+    _login(login)
+    writes.clear()
+
+    response = client.get("/produtos")
+    assert response.status_code == 200
+    assert "Set-Cookie" not in response.headers
+    assert writes == []
+
+
+def test_sliding_expiry_touches_once_interval_passes(
+        client, login, writes, monkeypatch):
+    _login(login)
+    writes.clear()
+    later = sessions._utcnow() + timedelta(seconds=90)
+    monkeypatch.setattr(sessions, "_utcnow", lambda: later)
+
+    response = client.get("/produtos")
+    assert writes == ["touch"]
+    assert "Set-Cookie" in response.headers
+
+
+def test_expired_session_is_anonymous(client, login, monkeypatch):
+    login()
+    later = sessions._utcnow() + timedelta(minutes=16)
+    monkeypatch.setattr(sessions, "_utcnow", lambda: later)
+
+    assert client.get("/produtos").status_code == 302
+
+
+def test_login_and_logout_rotate_the_session_id(app, client, login):
+    client.post("/login", data={"username": "ninguem", "password": "x"})
+    anonymous = _sid(client)
+    assert anonymous
+
+    login()
+    authenticated = _sid(client)
+    assert authenticated != anonymous
+    assert _load(app, anonymous) is None
+
+    client.get("/logout")
+    assert _sid(client) != authenticated
+    assert _load(app, authenticated) is None
+
+
+def test_api_requests_skip_the_session(client, auth, login, writes):
+    _login(login)
+    writes.clear()
+
+    response = client.get("/api/produtos", headers=auth())
+    assert response.status_code == 200
+    assert "Set-Cookie" not in response.headers
+    assert writes == []
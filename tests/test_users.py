@@ -0,0 +1,49 @@
+from sqlalchemy import event
+
+from app.models.models import User
+from app.models.user_models import (
+    load_user_identity, register_user, user_cache
+)
+from app.utils import db
+
+
+def _count_queries(app):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_user_loader_hits_the_database_once(app):
+    with app.app_context():
+        user = register_user("joana", "segredo123", "joana@example.com")
+        statements = _count_queries(app)
+
+        first = load_user_identity(str(user.id))
+        second = load_user_identity(user.id)
+
+    assert second is first
+    assert len(statements) == 1
+    assert "password_hash" not in statements[0]
+    assert not hasattr(first, "password_hash")
+    assert first.username == "joana"
+
+
+def test_user_loader_ignores_bad_and_unknown_ids(app):
+    with app.app_context():
+        assert load_user_identity("abc") is None
+        assert load_user_identity(None) is None
+        assert load_user_identity(999) is None
+        assert user_cache.get(999) is None
+
+
+def test_logout_drops_the_cached_identity(app, client, login):
+    login("pedro")
+    with app.app_context():
+        user_id = User.query.filter_by(username="pedro").one().id
+    client.get("/produtos")
+    assert user_cache.get(user_id).username == "pedro"
+
+    client.get("/logout")
+    assert user_cache.get(user_id) is None
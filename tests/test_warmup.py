@@ -0,0 +1,91 @@
+import os
+import runpy
+import threading
+
+from app.security import JWKSKeyStore
+from app.utils.warmup import reset_after_fork, warm_up
+
+
+def test_jwks_fetch_runs_outside_the_lock(idp):
+    seen = []
+
+    def jwks_uri():
+        seen.append(store._lock.locked())
+        return f"{idp.issuer}/certs"
+
+    store = JWKSKeyStore(jwks_uri)
+    assert store.get_key("test-key") is not None
+    assert seen == [False]
+
+
+def test_concurrent_refresh_fetches_once(idp):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def jwks_uri():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return f"{idp.issuer}/certs"
+
+    store = JWKSKeyStore(jwks_uri)
+    first = threading.Thread(target=store.get_key, args=("test-key",))
+    first.start()
+    started.wait(5)
+    second = threading.Thread(target=store.get_key, args=("test-key",))
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(calls) == 1
+    assert "test-key" in store._keys
+
+
+def test_worker_warm_up_after_fork_with_locks_held(make_app):
+    app = make_app(OIDC_PREFETCH="false")
+    validator = app.extensions["oidc_validator"]
+    # estado copiado de um master cuja thread de prefetch estava na rede
+    validator.discovery._lock.acquire()
+    validator._keys._lock.acquire()
+    validator._keys._inflight = threading.Event()
+
+    reset_after_fork(app)
+    done = threading.Thread(target=warm_up, args=(app,), daemon=True)
+    done.start()
+    done.join(10)
+
+    assert not done.is_alive()
+    assert "test-key" in validator._keys._keys
+
+
+def test_warm_up_loads_keys_pool_and_templates(app):
+    timings = warm_up(app)
+
+    assert set(timings) == {"oidc", "db", "templates"}
+    assert "test-key" in app.extensions["oidc_validator"]._keys._keys
+    assert app.jinja_env.cache
+
+
+def test_warm_up_tolerates_idp_outage(make_app, tmp_path):
+    app = make_app(OIDC_WELL_KNOWN="http://127.0.0.1:1/.well-known",
+                   OIDC_CACHE_DIR=str(tmp_path / "vazio"))
+
+    assert warm_up(app)["oidc"] < 10
+
+
+def test_gunicorn_config_exports_worker_count(monkeypatch):
+    for key, value in {"GUNICORN_WORKERS": "3", "GUNICORN_THREADS": "1",
+                       "WEB_CONCURRENCY": "", "OIDC_PREFETCH": ""}.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.delenv("OIDC_PREFETCH")
+    monkeypatch.delenv("GUNICORN_PRELOAD", raising=False)
+
+    config = runpy.run_path(os.path.join(
+        os.path.dirname(__file__), "..", "gunicorn.conf.py"))
+
+    assert (config["workers"], config["worker_class"]) == (3, "sync")
+    assert config["preload_app"] is True
+    assert os.environ["WEB_CONCURRENCY"] == "3"
+    assert os.environ["OIDC_PREFETCH"] == "false"
@@ -0,0 +1,3 @@
+from app.utils import create_app
+
+app = create_app()